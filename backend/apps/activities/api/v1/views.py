@@ -3,15 +3,21 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiResponse
-from ...services.log_activity import log_event
+from ...services import activity_buffer
 from .serializers import ActivityIn, ActivityBulkIn
 from apps.recommendations.services import recommendation_engine
 
+# Largest batch accepted by create_activity_bulk
+MAX_BULK_EVENTS = 500
+
 @extend_schema(
     summary="Create one activity (requires login)",
     tags=["Activities"],
     request=ActivityIn,
-    responses={201: OpenApiResponse(description="Created, returns id")}
+    responses={
+        202: OpenApiResponse(description="Accepted, written in the background"),
+        503: OpenApiResponse(description="Tracking backlog full, retry later"),
+    }
 )
 @api_view(["POST"])
 @permission_classes([AllowAny])  # TODO: Change back to IsAuthenticated after testing
@@ -38,13 +44,16 @@ def create_activity(request):
     if hasattr(request, "session") and request.session.session_key is None:
         request.session.create()
 
-    ua = log_event(
-        customer_id=customer_id,
-        book_id=serializer.validated_data["book_id"],
-        action=serializer.validated_data["action"],
-        session_id=request.session.session_key if hasattr(request, "session") else None,
-        when=serializer.validated_data["activity_time"],
-    )
+    # Write-behind: queued here, inserted in batches by the activity buffer
+    accepted = activity_buffer.record([{
+        "customer_id": customer_id,
+        "book_id": serializer.validated_data["book_id"],
+        "action": serializer.validated_data["action"],
+        "activity_time": serializer.validated_data["activity_time"],
+        "session_id": request.session.session_key if hasattr(request, "session") else None,
+    }])
+    if not accepted:
+        return _busy()
     
     # Update recommendation engine
     try:
@@ -56,14 +65,17 @@ def create_activity(request):
         logger = logging.getLogger(__name__)
         logger.error(f"Error updating recommendations: {e}")
     
-    return Response({"id": ua.ActivityID}, status=status.HTTP_201_CREATED)
+    return Response({"queued": 1}, status=status.HTTP_202_ACCEPTED)
 
 
 @extend_schema(
     summary="Create many activities in bulk (requires login)",
     tags=["Activities"],
     request=ActivityBulkIn,
-    responses={201: OpenApiResponse(description="Created count")}
+    responses={
+        202: OpenApiResponse(description="Accepted count, written in the background"),
+        503: OpenApiResponse(description="Tracking backlog full, retry later"),
+    }
 )
 @api_view(["POST"])
 @permission_classes([AllowAny])  # TODO: Change back to IsAuthenticated after testing  
@@ -80,6 +92,11 @@ def create_activity_bulk(request):
     if customer_id is None:
         return Response({"detail": "Login required"}, status=status.HTTP_401_UNAUTHORIZED)
 
+    # Reject oversized batches before validating them
+    events = request.data.get("events") if hasattr(request.data, "get") else None
+    if isinstance(events, list) and len(events) > MAX_BULK_EVENTS:
+        return Response({"detail": "Too many events"}, status=status.HTTP_400_BAD_REQUEST)
+
     serializer = ActivityBulkIn(data=request.data)
     serializer.is_valid(raise_exception=True)
 
@@ -88,32 +105,21 @@ def create_activity_bulk(request):
         request.session.create()
     sid = request.session.session_key if hasattr(request, "session") else None
 
-    items = serializer.validated_data["events"]
-    if len(items) > 500:
-        return Response({"detail": "Too many events"}, status=status.HTTP_400_BAD_REQUEST)
-
-    created = 0
     # Note: recommendation engine updates handled automatically
-    
-    for e in items:
-        log_event(
-            customer_id=customer_id,
-            book_id=e["book_id"],
-            action=e["action"],
-            session_id=sid,
-            when=e["activity_time"],
-        )
-        
-        # Update recommendation engine for each event
-        try:
-            # Using singleton instance - no explicit update needed 
-            pass  # recommendation_engine handles cache automatically
-        except Exception as ex:
-            # Log error but continue processing
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error updating recommendations for bulk event: {ex}")
-        
-        created += 1
+    events = [
+        {**e, "customer_id": customer_id, "session_id": sid}
+        for e in serializer.validated_data["events"]
+    ]
+    if not activity_buffer.record(events):
+        return _busy()
+
+    return Response({"created": len(events)}, status=status.HTTP_202_ACCEPTED)
 
-    return Response({"created": created}, status=status.HTTP_201_CREATED)
+
+def _busy():
+    """Backpressure response when the activity buffer and spool are full"""
+    return Response(
+        {"detail": "Activity tracking is busy, retry later"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"},
+    )
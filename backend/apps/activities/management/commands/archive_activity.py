@@ -0,0 +1,93 @@
+"""
+Management command to archive old raw user activity
+Usage: python manage.py archive_activity [--days 180] [--dir /path/to/archive]
+                                         [--batch-size 10000] [--dry-run]
+
+Moves useractivity rows older than --days to gzip-compressed CSV files
+(useractivity-<first id>-<last id>.csv.gz), one file per batch, then deletes
+them. Only rows at or below the rollup high-water mark are archived; the mark
+waits ACTIVITY_ROLLUP_GAP_GRACE seconds for late inserts, so those rows are
+aggregated first and the rollups keep their counts.
+"""
+import csv
+import gzip
+import io
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.activities.models import UserActivity
+from apps.activities.services.rollups import high_water_mark
+
+FIELDS = ['ActivityID', 'CustomerID', 'BookID', 'Action', 'ActivityTime', 'SessionID', 'EventCount']
+
+
+class Command(BaseCommand):
+    help = 'Archive raw user activity older than the retention period to compressed files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'ACTIVITY_RETENTION_DAYS', 180),
+            help='Keep raw rows newer than this many days',
+        )
+        parser.add_argument(
+            '--dir',
+            default=getattr(settings, 'ACTIVITY_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'var' / 'activity_archive'),
+            help='Directory receiving the archive files',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per archive file')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows without archiving them')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        rows = UserActivity.objects.filter(ActivityTime__lt=cutoff, ActivityID__lte=high_water_mark())
+        if options['dry_run']:
+            self.stdout.write(f'📦 {rows.count()} rows older than {options["days"]} days would be archived')
+            return
+
+        directory = Path(options['dir'])
+        directory.mkdir(parents=True, exist_ok=True)
+        archived = files = 0
+        after_id = 0
+        while True:
+            batch = list(
+                rows.filter(ActivityID__gt=after_id).order_by('ActivityID').values_list(*FIELDS)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            path = self._write(directory, batch)
+            ids = [row[0] for row in batch]
+            with transaction.atomic():
+                UserActivity.objects.filter(ActivityID__in=ids).delete()
+            archived += len(batch)
+            files += 1
+            after_id = ids[-1]
+            self.stdout.write(f'   💾 {len(batch)} rows -> {path.name}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Archived {archived} activity rows to {files} files in {directory}'))
+
+    @staticmethod
+    def _write(directory: Path, batch) -> Path:
+        """Write one batch as a gzip CSV, durably, before its rows are deleted"""
+        path = directory / f'useractivity-{batch[0][0]}-{batch[-1][0]}.csv.gz'
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+                text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(FIELDS)
+                for row in batch:
+                    writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+                text.flush()
+                text.detach()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        return path
@@ -0,0 +1,51 @@
+"""
+Management command to maintain the daily activity rollups
+Usage: python manage.py rollup_activity [--batch-size 5000] [--loop --interval 60]
+
+Aggregates useractivity rows above the high-water mark into useractivity_daily
+and book_activity_daily (see apps.activities.services.rollups).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.activities.services import rollups
+
+
+class Command(BaseCommand):
+    help = 'Aggregate new user activity into the daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Raw rows aggregated per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a background worker',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between runs with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            aggregated = rollups.roll_up_all(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - start
+            if aggregated or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'✅ Rolled up {aggregated} activity rows in {elapsed:.2f}s '
+                        f'(high-water mark {rollups.high_water_mark()})'
+                    )
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
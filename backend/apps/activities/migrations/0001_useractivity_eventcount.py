@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "ALTER TABLE useractivity ADD COLUMN EventCount INT NOT NULL DEFAULT 1;",
+            reverse_sql="ALTER TABLE useractivity DROP COLUMN EventCount;"
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0001_useractivity_eventcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivity',
+            fields=[
+                ('ActivityID', models.AutoField(db_column='ActivityID', primary_key=True, serialize=False)),
+                ('CustomerID', models.IntegerField(db_column='CustomerID')),
+                ('BookID', models.IntegerField(db_column='BookID')),
+                ('Action', models.CharField(db_column='Action', max_length=20)),
+                ('ActivityTime', models.DateTimeField(db_column='ActivityTime')),
+                ('SessionID', models.CharField(blank=True, db_column='SessionID', max_length=50, null=True)),
+                ('EventCount', models.IntegerField(db_column='EventCount', default=1)),
+            ],
+            options={
+                'db_table': 'useractivity',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityRollupState',
+            fields=[
+                ('Name', models.CharField(db_column='Name', max_length=50, primary_key=True, serialize=False)),
+                ('LastActivityID', models.BigIntegerField(db_column='LastActivityID', default=0)),
+                ('CeilingActivityID', models.BigIntegerField(db_column='CeilingActivityID', default=0)),
+                ('UpdatedAt', models.DateTimeField(auto_now=True, db_column='UpdatedAt')),
+            ],
+            options={
+                'db_table': 'activity_rollup_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityDaily',
+            fields=[
+                ('RollupID', models.BigAutoField(db_column='RollupID', primary_key=True, serialize=False)),
+                ('Day', models.DateField(db_column='Day')),
+                ('CustomerID', models.IntegerField(db_column='CustomerID')),
+                ('BookID', models.IntegerField(db_column='BookID')),
+                ('Action', models.CharField(db_column='Action', max_length=20)),
+                ('EventCount', models.IntegerField(db_column='EventCount', default=0)),
+            ],
+            options={
+                'db_table': 'useractivity_daily',
+                'constraints': [models.UniqueConstraint(fields=('CustomerID', 'Day', 'BookID', 'Action'), name='activity_daily_key_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookActivityDaily',
+            fields=[
+                ('RollupID', models.BigAutoField(db_column='RollupID', primary_key=True, serialize=False)),
+                ('Day', models.DateField(db_column='Day')),
+                ('BookID', models.IntegerField(db_column='BookID')),
+                ('Action', models.CharField(db_column='Action', max_length=20)),
+                ('EventCount', models.IntegerField(db_column='EventCount', default=0)),
+            ],
+            options={
+                'db_table': 'book_activity_daily',
+                'constraints': [models.UniqueConstraint(fields=('Day', 'BookID', 'Action'), name='book_activity_daily_key_uniq')],
+            },
+        ),
+    ]
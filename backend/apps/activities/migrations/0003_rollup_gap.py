@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0002_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityrollupstate',
+            name='GapActivityID',
+            field=models.BigIntegerField(blank=True, db_column='GapActivityID', null=True),
+        ),
+        migrations.AddField(
+            model_name='activityrollupstate',
+            name='GapSince',
+            field=models.DateTimeField(blank=True, db_column='GapSince', null=True),
+        ),
+    ]
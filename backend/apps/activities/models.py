@@ -11,6 +11,8 @@ class UserActivity(models.Model):
     Action = models.CharField(db_column="Action", max_length=20)
     ActivityTime = models.DateTimeField(db_column="ActivityTime")
     SessionID = models.CharField(db_column="SessionID", max_length=50, null=True, blank=True)
+    # Number of identical events coalesced into this row (migration 0001 adds the column)
+    EventCount = models.IntegerField(db_column="EventCount", default=1)
 
     class Meta:
         managed = False  # Không tạo bảng mới, chỉ mapping với bảng có sẵn
@@ -18,3 +20,54 @@ class UserActivity(models.Model):
 
     def __str__(self):
         return f"Activity {self.ActivityID} - Customer {self.CustomerID} - {self.Action}"
+
+
+class ActivityDaily(models.Model):
+    """Daily rollup of useractivity per (customer, book, action), maintained by `rollup_activity`"""
+    RollupID = models.BigAutoField(primary_key=True, db_column="RollupID")
+    Day = models.DateField(db_column="Day")
+    CustomerID = models.IntegerField(db_column="CustomerID")
+    BookID = models.IntegerField(db_column="BookID")
+    Action = models.CharField(db_column="Action", max_length=20)
+    EventCount = models.IntegerField(db_column="EventCount", default=0)
+
+    class Meta:
+        db_table = "useractivity_daily"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["CustomerID", "Day", "BookID", "Action"], name="activity_daily_key_uniq"
+            ),
+        ]
+
+
+class BookActivityDaily(models.Model):
+    """Daily per-book event counters, maintained by `rollup_activity`"""
+    RollupID = models.BigAutoField(primary_key=True, db_column="RollupID")
+    Day = models.DateField(db_column="Day")
+    BookID = models.IntegerField(db_column="BookID")
+    Action = models.CharField(db_column="Action", max_length=20)
+    EventCount = models.IntegerField(db_column="EventCount", default=0)
+
+    class Meta:
+        db_table = "book_activity_daily"
+        constraints = [
+            models.UniqueConstraint(fields=["Day", "BookID", "Action"], name="book_activity_daily_key_uniq"),
+        ]
+
+
+class ActivityRollupState(models.Model):
+    """
+    High-water mark of the rollups: rows up to LastActivityID are aggregated.
+    CeilingActivityID is the highest id seen by the previous run; a run only
+    aggregates up to it, so rows committed late with a lower id are not skipped.
+    """
+    Name = models.CharField(primary_key=True, max_length=50, db_column="Name")
+    LastActivityID = models.BigIntegerField(default=0, db_column="LastActivityID")
+    CeilingActivityID = models.BigIntegerField(default=0, db_column="CeilingActivityID")
+    # First missing ActivityID the mark is held below, and since when (see rollups.roll_up)
+    GapActivityID = models.BigIntegerField(null=True, blank=True, db_column="GapActivityID")
+    GapSince = models.DateTimeField(null=True, blank=True, db_column="GapSince")
+    UpdatedAt = models.DateTimeField(auto_now=True, db_column="UpdatedAt")
+
+    class Meta:
+        db_table = "activity_rollup_state"
@@ -0,0 +1,348 @@
+"""
+Write-behind buffer for activity tracking.
+
+`create_activity` / `create_activity_bulk` append events to a bounded
+in-process buffer and return without touching the database. In the buffer,
+repeated (customer, book, action) events are coalesced into one row per
+ACTIVITY_COALESCE_WINDOW (see `coalescing`). A background thread writes the
+rows whose window has closed with `bulk_insert` when ACTIVITY_BUFFER_FLUSH_SIZE
+rows are ready or every ACTIVITY_BUFFER_FLUSH_INTERVAL seconds.
+
+Events go to the on-disk spool (JSON-lines files in ACTIVITY_SPOOL_DIR) when
+the buffer is full, when a flush fails and when the process exits, so a slow
+or unavailable database, or a restart, does not lose them. A kill that skips
+the exit hook (SIGKILL, OOM, worker timeout) is covered by a snapshot of the
+buffer the flush thread rewrites in the spool directory every
+ACTIVITY_BUFFER_CHECKPOINT_INTERVAL seconds: once it stops being refreshed it
+is adopted as a spool file, so such a kill loses at most the events accepted
+since the last snapshot (and may insert rows flushed since then twice).
+Spooled files are inserted again by the flush thread once the database accepts writes, or by
+`manage.py flush_activity_spool --loop` as a separate worker. When the spool
+reaches ACTIVITY_SPOOL_MAX_BYTES as well, `add()` refuses the events and the
+endpoints answer 503 so clients retry later (backpressure).
+
+Delivery is at-least-once: a crash between inserting a spool file and
+deleting it inserts that file again.
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+from .coalescing import Coalescer, coalesce, coalesce_window
+from .log_activity import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+
+class ActivitySpool:
+    """
+    Directory of JSON-lines files, one per spilled batch. Files are written
+    under a temporary name and renamed into place, and claimed by renaming
+    before they are inserted, so several processes can share a spool.
+    """
+
+    SUFFIX = '.jsonl'
+    CLAIMED = '.claimed'
+    CHECKPOINT = '.checkpoint'
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._seq = itertools.count()
+
+    def _files(self, suffix: str) -> List[Path]:
+        try:
+            return sorted(self.directory.glob(f'*{suffix}'))
+        except OSError:
+            return []
+
+    def size(self) -> int:
+        total = 0
+        for path in self._files(self.SUFFIX):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass  # Claimed meanwhile
+        return total
+
+    def has_files(self) -> bool:
+        return bool(self._files(self.SUFFIX))
+
+    @staticmethod
+    def _encode(events: List[dict]) -> bytes:
+        return ''.join(
+            json.dumps({
+                **e,
+                'activity_time': e['activity_time'].isoformat() if e.get('activity_time') else None,
+            }) + '\n'
+            for e in events
+        ).encode()
+
+    def _write_file(self, path: Path, lines: bytes):
+        """Write `path` durably under a temporary name"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _new_name(self) -> str:
+        return f'{time.time_ns()}-{os.getpid()}-{next(self._seq)}{self.SUFFIX}'
+
+    def append(self, events: List[dict], force: bool = False) -> bool:
+        """Write events as one spool file; False if the spool is full (unless `force`)"""
+        lines = self._encode(events)
+        if not force and self.size() + len(lines) > self.max_bytes:
+            return False
+        self._write_file(self.directory / self._new_name(), lines)
+        return True
+
+    def checkpoint(self, owner: str, events: List[dict]):
+        """Replace `owner`'s snapshot of its buffered rows (removed when there are none)"""
+        path = self.directory / f'{owner}{self.CHECKPOINT}'
+        if not events:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return
+        self._write_file(path, self._encode(events))
+
+    def adopt_checkpoints(self, older_than: float):
+        """Turn snapshots not refreshed for `older_than` seconds (their process died) into spool files"""
+        cutoff = time.time() - older_than
+        for path in self._files(self.CHECKPOINT):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    os.replace(path, self.directory / self._new_name())
+                    logger.warning(f"Activity spool: adopted buffer snapshot {path.name} of a dead process")
+            except OSError:
+                pass  # Refreshed, removed or adopted meanwhile
+
+    def release_stale_claims(self, older_than: float = 300):
+        """Put back files claimed by a drainer that died before finishing"""
+        cutoff = time.time() - older_than
+        for path in self._files(self.CLAIMED):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    os.replace(path, path.with_name(path.name.rsplit('.', 2)[0]))
+            except OSError:
+                pass
+
+    def drain(self, max_files: Optional[int] = None) -> int:
+        """Insert spooled files oldest first; returns the number of rows written"""
+        written = 0
+        for path in self._files(self.SUFFIX)[:max_files]:
+            claimed = path.with_name(f'{path.name}.{os.getpid()}{self.CLAIMED}')
+            try:
+                os.replace(path, claimed)
+                os.utime(claimed)  # Claim age, see release_stale_claims
+            except OSError:
+                continue  # Another process took it
+            try:
+                with open(claimed, encoding='utf-8') as f:
+                    events = [json.loads(line) for line in f if line.strip()]
+                for e in events:
+                    e['activity_time'] = parse_datetime(e['activity_time']) if e.get('activity_time') else None
+                written += bulk_insert(events)
+            except Exception:
+                os.replace(claimed, path)  # Retry later
+                raise
+            claimed.unlink()
+        return written
+
+
+class ActivityBuffer:
+    """Bounded in-memory set of coalesced activity rows flushed by one background thread"""
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._rows = Coalescer()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._checkpointed_at = 0.0
+        self._owner = None
+        self.spool = None
+
+    @property
+    def max_events(self) -> int:
+        return getattr(settings, 'ACTIVITY_BUFFER_MAX_EVENTS', 10000)
+
+    @property
+    def flush_size(self) -> int:
+        return getattr(settings, 'ACTIVITY_BUFFER_FLUSH_SIZE', 500)
+
+    @property
+    def flush_interval(self) -> float:
+        return getattr(settings, 'ACTIVITY_BUFFER_FLUSH_INTERVAL', 1.0)
+
+    @property
+    def checkpoint_interval(self) -> float:
+        return getattr(settings, 'ACTIVITY_BUFFER_CHECKPOINT_INTERVAL', 5.0)
+
+    @property
+    def pending(self) -> int:
+        """Rows buffered, open or ready to write"""
+        return len(self._rows)
+
+    def _start(self):
+        """Start the flush thread on first use (again after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._rows.clear()
+        self._pid = os.getpid()
+        self._owner = f'{socket.gethostname()}-{self._pid}-{time.time_ns()}'
+        self._stopping = False
+        self.spool = get_spool()
+        self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, events: List[dict]) -> bool:
+        """
+        Queue events ({customer_id, book_id, action, activity_time, session_id}).
+        All or nothing; False when both the buffer and the spool are full.
+        """
+        window = coalesce_window()
+        with self._lock:
+            self._start()
+            if len(self._rows) + self._rows.rows_needed(events, window) <= self.max_events:
+                now = time.monotonic()
+                for event in events:
+                    self._rows.add(event, window, now)
+                if self._rows.ready >= self.flush_size:
+                    self._lock.notify()
+                return True
+        # Buffer full: the database is not keeping up, spill instead of growing
+        try:
+            spilled = self.spool.append(coalesce(events, window))
+        except OSError as e:
+            logger.error(f"Activity spool write failed: {e}")
+            spilled = False
+        if not spilled:
+            logger.warning(f"Activity buffer and spool full, rejected {len(events)} events")
+        return spilled
+
+    def _take(self, force: bool = False) -> List[dict]:
+        """Next batch of closed rows (all rows with `force`); call with the lock held"""
+        self._rows.close(coalesce_window(), time.monotonic(), force=force)
+        return self._rows.take(self.flush_size)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._rows.ready < self.flush_size and not self._stopping:
+                    self._lock.wait(self.flush_interval)
+                if self._stopping:
+                    return
+                batch = self._take()
+            if batch:
+                self._write(batch)
+            else:
+                self._drain_spool()
+            self._checkpoint()
+
+    def _checkpoint(self, force: bool = False):
+        """Rewrite this process's buffer snapshot every checkpoint_interval seconds"""
+        now = time.monotonic()
+        if not force and now - self._checkpointed_at < self.checkpoint_interval:
+            return
+        self._checkpointed_at = now
+        with self._lock:
+            rows = self._rows.snapshot()
+        try:
+            self.spool.checkpoint(self._owner, rows)
+        except OSError as e:
+            logger.error(f"Activity buffer snapshot failed: {e}")
+
+    def _write(self, batch: List[dict]):
+        close_old_connections()
+        try:
+            bulk_insert(batch)
+        except Exception as e:
+            logger.error(f"Activity flush of {len(batch)} events failed, spilling to disk: {e}")
+            self._spill(batch)
+        finally:
+            close_old_connections()
+
+    def _spill(self, batch: List[dict]):
+        try:
+            self.spool.append(batch, force=True)
+        except OSError as e:
+            logger.error(f"Activity spool write failed, {len(batch)} events lost: {e}")
+
+    def _drain_spool(self):
+        self.spool.release_stale_claims()
+        self.spool.adopt_checkpoints(stale_checkpoint_age())
+        if not self.spool.has_files():
+            return
+        close_old_connections()
+        try:
+            written = self.spool.drain(max_files=10)
+            if written:
+                logger.info(f"Activity spool: inserted {written} rows")
+        except Exception as e:
+            logger.warning(f"Activity spool drain failed, will retry: {e}")
+        finally:
+            close_old_connections()
+
+    def flush(self) -> int:
+        """Write everything buffered now on the calling thread; returns the number of rows"""
+        written = 0
+        while True:
+            with self._lock:
+                batch = self._take(force=True)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def close(self):
+        """Stop the thread and persist what is left (database, else spool)"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._lock.notify()
+        self._thread.join(timeout=max(self.flush_interval, 1) * 5)
+        self._thread = None
+        self.flush()
+        self._checkpoint(force=True)  # Empty now: removes the snapshot
+
+
+def stale_checkpoint_age() -> float:
+    """Age after which a buffer snapshot belongs to a process that is gone"""
+    return max(getattr(settings, 'ACTIVITY_BUFFER_CHECKPOINT_INTERVAL', 5.0) * 6, 30)
+
+
+def get_spool() -> ActivitySpool:
+    return ActivitySpool(
+        getattr(settings, 'ACTIVITY_SPOOL_DIR', Path(settings.BASE_DIR) / 'var' / 'activity_spool'),
+        getattr(settings, 'ACTIVITY_SPOOL_MAX_BYTES', 256 * 1024 * 1024),
+    )
+
+
+# Singleton instance
+activity_buffer = ActivityBuffer()
+
+
+def record(events: List[dict]) -> bool:
+    """Queue events when write-behind is on, else insert them now; False means retry later"""
+    if getattr(settings, 'ACTIVITY_WRITE_BEHIND', True):
+        return activity_buffer.add(events)
+    bulk_insert(coalesce(events))
+    return True
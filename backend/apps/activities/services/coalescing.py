@@ -0,0 +1,121 @@
+"""
+Coalescing of repeated activity events.
+
+The frontend reports the same (customer, book, action) many times within
+seconds (scrolls, re-renders). Events of one key whose times fall within
+ACTIVITY_COALESCE_WINDOW seconds of the first are stored as a single
+`useractivity` row: the first event's time and session, with `EventCount`
+holding the number of events. A window of 0 stores every event as its own row.
+"""
+from collections import deque
+from typing import Iterable, List
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def coalesce_window() -> float:
+    return getattr(settings, 'ACTIVITY_COALESCE_WINDOW', 10)
+
+
+def _key(event: dict) -> tuple:
+    return event['customer_id'], event['book_id'], event['action']
+
+
+def _row(event: dict) -> dict:
+    return {
+        **event,
+        'activity_time': event.get('activity_time') or timezone.now(),
+        'count': event.get('count', 1),
+    }
+
+
+def _in_window(row: dict, event: dict, window: float) -> bool:
+    when = event.get('activity_time') or timezone.now()
+    return abs((when - row['activity_time']).total_seconds()) <= window
+
+
+def coalesce(events: Iterable[dict], window: float = None) -> List[dict]:
+    """Collapse one batch of events into rows with a 'count'"""
+    window = coalesce_window() if window is None else window
+    rows, open_rows = [], {}
+    for event in events:
+        row = open_rows.get(_key(event)) if window else None
+        if row is not None and _in_window(row, event, window):
+            row['count'] += event.get('count', 1)
+            continue
+        row = _row(event)
+        open_rows[_key(event)] = row
+        rows.append(row)
+    return rows
+
+
+class Coalescer:
+    """
+    Rows still collecting events, keyed by (customer, book, action). A row is
+    closed `window` seconds after it was opened (server clock) and then queued
+    for writing; closed rows come out in the order they were opened.
+    """
+
+    def __init__(self):
+        self._open = {}  # key -> (opened_at, row), oldest first
+        self._ready = deque()
+
+    def __len__(self):
+        return len(self._open) + len(self._ready)
+
+    @property
+    def ready(self) -> int:
+        return len(self._ready)
+
+    def clear(self):
+        self._open.clear()
+        self._ready.clear()
+
+    def rows_needed(self, events: List[dict], window: float) -> int:
+        """Number of new rows adding `events` would open (replays add() on row start times)"""
+        if not window:
+            return len(events)
+        needed, starts = 0, {}
+        for event in events:
+            key = _key(event)
+            row = starts.get(key)
+            if row is None and key in self._open:
+                row = self._open[key][1]
+            if row is None or not _in_window(row, event, window):
+                starts[key] = {'activity_time': event.get('activity_time') or timezone.now()}
+                needed += 1
+        return needed
+
+    def add(self, event: dict, window: float, now: float):
+        key = _key(event)
+        current = self._open.get(key) if window else None
+        if current is not None:
+            if _in_window(current[1], event, window):
+                current[1]['count'] += event.get('count', 1)
+                return
+            del self._open[key]
+            self._ready.append(current[1])
+        if window:
+            self._open[key] = (now, _row(event))
+        else:
+            self._ready.append(_row(event))
+
+    def close(self, window: float, now: float, force: bool = False):
+        """Queue rows opened at least `window` seconds ago (all rows with `force`)"""
+        while self._open:
+            key, (opened_at, row) = next(iter(self._open.items()))
+            if not force and now - opened_at < window:
+                break
+            del self._open[key]
+            self._ready.append(row)
+
+    def snapshot(self) -> List[dict]:
+        """Copies of every buffered row, open or ready"""
+        return [dict(row) for _, row in self._open.values()] + [dict(row) for row in self._ready]
+
+    def take(self, limit: int) -> List[dict]:
+        batch = []
+        while self._ready and len(batch) < limit:
+            batch.append(self._ready.popleft())
+        return batch
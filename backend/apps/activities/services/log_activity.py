@@ -1,17 +1,31 @@
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from ..models import UserActivity
-from typing import Optional
+from typing import Iterable
 
-def log_event(*, customer_id: Optional[int], book_id: int, action: str, session_id: Optional[str], when=None) -> UserActivity:
-    if customer_id is None:
-        raise ValueError("Login required to log activity")
-    ua = UserActivity(
-        CustomerID=customer_id,
-        BookID=book_id,
-        Action=action,
-        ActivityTime=when or timezone.now(),
-        SessionID=session_id,
-    )
-    # force_insert ensures an INSERT is executed (no migrations/manipulation of schema)
-    ua.save(force_insert=True)
-    return ua
+
+def bulk_insert(events: Iterable[dict]) -> int:
+    """
+    Insert activity dicts ({customer_id, book_id, action, activity_time, session_id},
+    optional coalesced 'count') in one transaction, ACTIVITY_BULK_BATCH_SIZE rows
+    per INSERT statement; returns the number of rows.
+    """
+    now = timezone.now()
+    rows = [
+        UserActivity(
+            CustomerID=e["customer_id"],
+            BookID=e["book_id"],
+            Action=e["action"],
+            ActivityTime=e.get("activity_time") or now,
+            SessionID=e.get("session_id"),
+            EventCount=e.get("count", 1),
+        )
+        for e in events
+    ]
+    if not rows:
+        return 0
+    batch_size = getattr(settings, 'ACTIVITY_BULK_BATCH_SIZE', 500)
+    with transaction.atomic():
+        UserActivity.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
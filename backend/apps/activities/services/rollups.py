@@ -0,0 +1,220 @@
+"""
+Daily activity rollups.
+
+`useractivity` rows are aggregated into `useractivity_daily` (per customer,
+book, action and day) and `book_activity_daily` (per book, action and day)
+incrementally: each run reads only rows above the high-water mark kept in
+`activity_rollup_state` and adds their EventCount to the existing aggregates.
+The mark never moves past a missing ActivityID (an insert whose transaction has
+not committed yet) until it has been missing for ACTIVITY_ROLLUP_GAP_GRACE
+seconds; only then is the id taken for a rollback and skipped, with a warning.
+A row committing later than that is never aggregated (and `archive_activity`
+later deletes it), so the grace must exceed the longest insert transaction.
+
+Readers combine the rollups with the raw rows above the mark (`customer_activity`),
+so results are current even between runs. Driven by `manage.py rollup_activity`;
+`manage.py archive_activity` moves rolled-up raw rows older than the retention
+period to compressed files.
+"""
+import logging
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from ..models import ActivityDaily, ActivityRollupState, BookActivityDaily, UserActivity
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = 'daily'
+
+
+def _day(when) -> date:
+    if timezone.is_naive(when):
+        return when.date()
+    return timezone.localtime(when).date()
+
+
+def high_water_mark() -> int:
+    """Highest ActivityID already included in the rollups"""
+    return (
+        ActivityRollupState.objects.filter(Name=STATE_NAME)
+        .values_list('LastActivityID', flat=True)
+        .first()
+    ) or 0
+
+
+def _add_counts(model, key_fields: List[str], counts: Counter):
+    """Add `counts` ({key tuple: events}) to the aggregates of `model`"""
+    if not counts:
+        return
+    lookup = {
+        f'{field}__in': {key[index] for key in counts}
+        for index, field in enumerate(key_fields) if field != 'Action'
+    }
+    existing = {
+        tuple(getattr(row, field) for field in key_fields): row
+        for row in model.objects.filter(**lookup)
+        if tuple(getattr(row, field) for field in key_fields) in counts
+    }
+    for key, row in existing.items():
+        row.EventCount += counts[key]
+    model.objects.bulk_update(existing.values(), ['EventCount'], batch_size=1000)
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key)), EventCount=count) for key, count in counts.items() if key not in existing],
+        batch_size=1000,
+    )
+
+
+def _contiguous(rows, state) -> list:
+    """
+    Leading rows of `rows` with no missing ActivityID before them. A gap holds
+    the mark back (recorded in state.GapActivityID/GapSince) until it is filled
+    or older than ACTIVITY_ROLLUP_GAP_GRACE.
+    """
+    grace = timedelta(seconds=getattr(settings, 'ACTIVITY_ROLLUP_GAP_GRACE', 300))
+    now = timezone.now()
+    expected, taken = state.LastActivityID + 1, 0
+    for row in rows:
+        activity_id = row[0]
+        if activity_id != expected:
+            if state.GapActivityID != expected:
+                state.GapActivityID, state.GapSince = expected, now
+                break
+            if now - state.GapSince < grace:
+                break
+            logger.warning(
+                f"Activity rollup: ActivityID {expected}-{activity_id - 1} missing for {grace}, skipping"
+            )
+        expected = activity_id + 1
+        taken += 1
+    if state.GapActivityID is not None and state.GapActivityID < expected:
+        state.GapActivityID = state.GapSince = None  # Filled or skipped
+    return rows[:taken]
+
+
+def roll_up(batch_size: int = 5000) -> Tuple[int, int, int]:
+    """
+    Aggregate one batch of new raw rows; returns (rows aggregated, high-water mark, ceiling).
+    Concurrent runs serialize on the state row.
+    """
+    with transaction.atomic():
+        ActivityRollupState.objects.get_or_create(Name=STATE_NAME)
+        state = ActivityRollupState.objects.select_for_update().get(Name=STATE_NAME)
+        rows = list(
+            UserActivity.objects.filter(
+                ActivityID__gt=state.LastActivityID, ActivityID__lte=state.CeilingActivityID
+            )
+            .order_by('ActivityID')
+            .values_list('ActivityID', 'CustomerID', 'BookID', 'Action', 'ActivityTime', 'EventCount')[:batch_size]
+        )
+        if not rows:
+            # Caught up to the previous ceiling; raise it to what exists now
+            state.CeilingActivityID = UserActivity.objects.aggregate(top=Max('ActivityID'))['top'] or 0
+            state.save(update_fields=['CeilingActivityID', 'UpdatedAt'])
+            return 0, state.LastActivityID, state.CeilingActivityID
+
+        rows = _contiguous(rows, state)
+        if not rows:
+            state.save(update_fields=['GapActivityID', 'GapSince', 'UpdatedAt'])
+            return 0, state.LastActivityID, state.CeilingActivityID
+
+        per_customer, per_book = Counter(), Counter()
+        for _, customer_id, book_id, action, when, events in rows:
+            day = _day(when)
+            per_customer[(day, customer_id, book_id, action)] += events
+            per_book[(day, book_id, action)] += events
+        _add_counts(ActivityDaily, ['Day', 'CustomerID', 'BookID', 'Action'], per_customer)
+        _add_counts(BookActivityDaily, ['Day', 'BookID', 'Action'], per_book)
+
+        state.LastActivityID = rows[-1][0]
+        state.save(update_fields=['LastActivityID', 'GapActivityID', 'GapSince', 'UpdatedAt'])
+    return len(rows), state.LastActivityID, state.CeilingActivityID
+
+
+def roll_up_all(batch_size: int = 5000, settle: float = 2.0) -> int:
+    """
+    Run batches until caught up; returns the number of raw rows aggregated.
+    After raising the ceiling, waits `settle` seconds for in-flight inserts
+    below it to commit and drains once more.
+    """
+    total, raised = 0, False
+    while True:
+        count, mark, ceiling = roll_up(batch_size)
+        total += count
+        if count:
+            continue
+        if raised or ceiling <= mark:
+            return total
+        if total:
+            logger.info(f"Activity rollup: aggregated {total} rows up to ActivityID {mark}")
+        raised = True
+        time.sleep(settle)
+
+
+def _day_start(day: date) -> datetime:
+    start = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def customer_activity(customer_id: int, since: date, attempts: int = 3) -> Dict[Tuple[date, int, str], int]:
+    """
+    Events per (day, book, action) for a customer since `since`: rollups plus unrolled raw rows.
+
+    A rollup batch committing between the reads would count its rows in both,
+    so the mark is read again afterwards and the reads are repeated if it moved.
+    """
+    for _ in range(attempts):
+        with transaction.atomic():
+            mark = high_water_mark()
+            rolled = list(
+                ActivityDaily.objects.filter(CustomerID=customer_id, Day__gte=since)
+                .values_list('Day', 'BookID', 'Action', 'EventCount')
+            )
+            raw = list(
+                UserActivity.objects.filter(
+                    CustomerID=customer_id, ActivityID__gt=mark, ActivityTime__gte=_day_start(since)
+                )
+                .values_list('ActivityID', 'ActivityTime', 'BookID', 'Action', 'EventCount')
+            )
+            latest = high_water_mark()
+        if latest == mark:
+            break
+
+    counts = Counter()
+    for day, book_id, action, events in rolled:
+        counts[(day, book_id, action)] += events
+    for activity_id, when, book_id, action, events in raw:
+        if activity_id <= latest:
+            continue  # Rolled up meanwhile (only when every attempt raced a rollup)
+        day = _day(when)
+        if day >= since:
+            counts[(day, book_id, action)] += events
+    return counts
+
+
+def activity_stats(recent_days: int = 7) -> dict:
+    """Admin totals from the rollups (events, active customers, recent events, busiest customer)"""
+    recent_since = timezone.localdate() - timedelta(days=recent_days)
+    totals = BookActivityDaily.objects.aggregate(events=Sum('EventCount'))
+    recent = BookActivityDaily.objects.filter(Day__gte=recent_since).aggregate(events=Sum('EventCount'))
+    top = (
+        ActivityDaily.objects.values('CustomerID')
+        .annotate(events=Sum('EventCount'))
+        .order_by('-events')
+        .first()
+    )
+    return {
+        'events': totals['events'] or 0,
+        'customers': ActivityDaily.objects.values('CustomerID').distinct().count(),
+        'recent_events': recent['events'] or 0,
+        'top_customer': (top['CustomerID'], top['events']) if top else None,
+        'high_water_mark': high_water_mark(),
+        'unrolled_rows': UserActivity.objects.filter(ActivityID__gt=high_water_mark()).count(),
+    }
@@ -0,0 +1,43 @@
+import os
+import time
+import pytest
+from django.utils import timezone
+from apps.activities.models import UserActivity
+from apps.activities.services.activity_buffer import ActivityBuffer, ActivitySpool
+
+
+@pytest.mark.django_db
+def test_snapshot_of_a_killed_worker_is_adopted_and_inserted(tmp_path):
+    spool = ActivitySpool(tmp_path, 1024 * 1024)
+    buffer = ActivityBuffer()
+    buffer.spool = spool
+    buffer._owner = 'web-1'
+    now = time.monotonic()
+    for book_id in (11, 12):
+        buffer._rows.add({
+            'customer_id': 901, 'book_id': book_id, 'action': 'view',
+            'activity_time': timezone.now(), 'session_id': None,
+        }, 60, now)
+
+    buffer._checkpoint(force=True)  # The worker is then killed without running atexit
+    (snapshot,) = tmp_path.glob('*.checkpoint')
+
+    spool.adopt_checkpoints(older_than=30)
+    assert snapshot.exists()  # Still being refreshed as far as the drainer can tell
+
+    stale = time.time() - 60
+    os.utime(snapshot, (stale, stale))
+    spool.adopt_checkpoints(older_than=30)
+
+    assert not snapshot.exists()
+    assert spool.drain() == 2
+    assert sorted(UserActivity.objects.filter(CustomerID=901).values_list('BookID', flat=True)) == [11, 12]
+
+
+def test_empty_buffer_removes_its_snapshot(tmp_path):
+    spool = ActivitySpool(tmp_path, 1024 * 1024)
+    spool.checkpoint('web-1', [{'customer_id': 901, 'book_id': 11, 'action': 'view', 'activity_time': None}])
+
+    spool.checkpoint('web-1', [])
+
+    assert not list(tmp_path.iterdir())
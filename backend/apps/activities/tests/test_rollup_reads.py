@@ -0,0 +1,91 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.test import override_settings
+from django.utils import timezone
+from apps.activities.models import ActivityDaily, ActivityRollupState, UserActivity
+from apps.activities.services import rollups
+
+
+def _activity(book_id, when, events=1, activity_id=None):
+    return UserActivity.objects.create(
+        ActivityID=activity_id, CustomerID=901, BookID=book_id, Action='view', ActivityTime=when, EventCount=events
+    )
+
+
+def _rolled_up(book_id):
+    return sum(ActivityDaily.objects.filter(CustomerID=901, BookID=book_id).values_list('EventCount', flat=True))
+
+
+@pytest.mark.django_db
+def test_rollup_committing_during_a_read_is_not_counted_twice():
+    now = timezone.now()
+    today = timezone.localdate()
+    _activity(11, now, events=3)
+    _activity(12, now)
+    rollups.roll_up()  # Raise the ceiling over the rows above
+
+    high_water_mark = rollups.high_water_mark
+    calls = []
+
+    def racing_mark():
+        mark = high_water_mark()
+        if not calls:
+            rollups.roll_up()  # Another worker rolls up right after the first mark read
+        calls.append(mark)
+        return mark
+
+    with mock.patch.object(rollups, 'high_water_mark', side_effect=racing_mark):
+        counts = rollups.customer_activity(901, today)
+
+    assert counts == {(today, 11, 'view'): 3, (today, 12, 'view'): 1}
+    assert len(calls) > 2  # The moved mark forced a second read
+
+
+@pytest.mark.django_db
+def test_reads_combine_rollups_and_newer_raw_rows_since_the_given_day():
+    now = timezone.now()
+    today = timezone.localdate()
+    _activity(11, now - timedelta(days=10), events=5)
+    _activity(11, now, events=2)
+    rollups.roll_up()
+    rollups.roll_up()
+    _activity(11, now)  # Not rolled up yet
+
+    counts = rollups.customer_activity(901, today)
+
+    assert counts == {(today, 11, 'view'): 3}
+
+
+@pytest.mark.django_db
+def test_mark_waits_below_an_id_whose_insert_commits_late():
+    now = timezone.now()
+    _activity(13, now, activity_id=1)
+    _activity(13, now, activity_id=3)  # Id 2 is still being inserted elsewhere
+    rollups.roll_up()  # Raise the ceiling
+    rollups.roll_up()
+    assert rollups.high_water_mark() == 1
+
+    _activity(13, now, events=4, activity_id=2)  # The late transaction commits
+    rollups.roll_up()
+
+    assert rollups.high_water_mark() == 3
+    assert _rolled_up(13) == 6
+    assert ActivityRollupState.objects.get(Name=rollups.STATE_NAME).GapActivityID is None
+
+
+@pytest.mark.django_db
+@override_settings(ACTIVITY_ROLLUP_GAP_GRACE=60)
+def test_gap_older_than_the_grace_is_skipped():
+    now = timezone.now()
+    _activity(14, now, activity_id=1)
+    _activity(14, now, activity_id=3)  # Id 2 was rolled back
+    rollups.roll_up()
+    rollups.roll_up()
+    assert rollups.high_water_mark() == 1
+
+    ActivityRollupState.objects.filter(Name=rollups.STATE_NAME).update(GapSince=now - timedelta(seconds=61))
+    rollups.roll_up()
+
+    assert rollups.high_water_mark() == 3
+    assert _rolled_up(14) == 2
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from apps.catalog.models import Book
+from apps.cart.services import price_table
 
 
 class CartItemSerializer(serializers.Serializer):
@@ -21,8 +22,8 @@ class CartItemSerializer(serializers.Serializer):
         return data
     
     def validate_book_id(self, value):
-        # Use a lightweight existence check to avoid selecting all columns (some DBs may have missing columns)
-        if not Book.objects.filter(BookID=value).exists():
+        # Validated against the cached price table (no query on a hit)
+        if not price_table.get_prices([value]):
             raise serializers.ValidationError("Book not found")
         return value
 
@@ -68,3 +69,24 @@ class AddToCartSerializer(serializers.Serializer):
 
 class UpdateCartItemSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=0)  # 0 means remove
+
+
+class CartBatchItemSerializer(serializers.Serializer):
+    book_id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)  # Absolute, 0 removes
+    delta = serializers.IntegerField(required=False)  # Relative change
+
+    def validate(self, data):
+        if data.get('book_id') is None:
+            if data.get('product_id') is None:
+                raise serializers.ValidationError("Either book_id or product_id is required")
+            data['book_id'] = data['product_id']
+        data.pop('product_id', None)
+        if ('quantity' in data) == ('delta' in data):
+            raise serializers.ValidationError("Provide exactly one of quantity or delta")
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartBatchItemSerializer(many=True, allow_empty=False, max_length=100)
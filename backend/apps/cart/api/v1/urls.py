@@ -5,6 +5,7 @@ from .views import (
     update_cart_item, 
     remove_from_cart, 
     clear_cart,
+    batch_update_cart,
     add_item
 )
 
@@ -12,6 +13,7 @@ urlpatterns = [
     path('', get_cart, name='get-cart'),
     path('add/', add_to_cart, name='add-to-cart'),  # Legacy URL
     path('items/', add_item, name='add-item'),       # New URL for POST /api/v1/cart/items/
+    path('items/batch/', batch_update_cart, name='batch-update-cart'),
     path('items/<int:book_id>/', update_cart_item, name='update-cart-item'),
     path('items/<int:book_id>/remove/', remove_from_cart, name='remove-from-cart'),
     path('clear/', clear_cart, name='clear-cart'),
@@ -2,14 +2,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
-from decimal import Decimal
 import logging
 
-from apps.cart.services.cart_service import get_or_create_cart_order, update_cart_total
-from apps.orders.models import Order, OrderDetail
-from apps.catalog.models import Book
-from .serializers import CartItemSerializer, CartResponseSerializer
+from apps.cart.services.cart_engine import cart_engine
+from apps.cart.services.cart_service import (
+    get_or_create_cart_order, get_cart_order, get_cart_summary
+)
+from apps.cart.services import price_table
+from .serializers import CartItemSerializer, CartResponseSerializer, CartBatchSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -17,37 +17,20 @@ logger = logging.getLogger(__name__)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_cart(request):
-    """Get current cart contents from Orders table (status='cart')"""
+    """Get current cart contents from Orders table (status='cart')
+
+    Pass ?summary=1 for a totals-only payload (cart badge refreshes).
+    """
     try:
-        cart_order = get_or_create_cart_order(request)
-        cart_items = OrderDetail.objects.filter(OrderID=cart_order.OrderID)
-        
-        items_data = []
-        total_amount = Decimal('0.00')
-        total_items = 0
-        
-        for cart_item in cart_items:
-            # Get book info
-            try:
-                book = Book.objects.get(BookID=cart_item.BookID)
-                subtotal = cart_item.Price * cart_item.Quantity
-                items_data.append({
-                    'book_id': cart_item.BookID,
-                    'title': book.Title,
-                    'price': cart_item.Price,
-                    'quantity': cart_item.Quantity,
-                    'subtotal': subtotal
-                })
-                total_amount += subtotal
-                total_items += cart_item.Quantity
-            except Book.DoesNotExist:
-                continue  # Skip items with missing books
+        cart_order = get_cart_order(request)
+        summary_only = request.query_params.get('summary') in ('1', 'true')
+        summary = get_cart_summary(cart_order, include_items=not summary_only)
         
         return Response({
             'status': 'success',
-            'items': items_data,
-            'total_items': total_items,
-            'total_amount': total_amount
+            'items': summary['items'],
+            'total_items': summary['total_items'],
+            'total_amount': summary['total_amount']
         })
     
     except Exception as e:
@@ -74,47 +57,34 @@ def add_to_cart(request):
         book_id = serializer.validated_data['book_id']
         quantity = serializer.validated_data['quantity']
         
-        # Get book
-        try:
-            book = Book.objects.get(BookID=book_id)
-        except Book.DoesNotExist:
+        # Only the price is needed (for a new line); served from the cached price table.
+        # product_id skips the serializer's existence check, so the book may be missing
+        entry = price_table.get_prices([book_id]).get(book_id)
+        if entry is None:
             return Response({
                 'status': 'error',
-                'message': 'Book not found'
+                'message': f'Book with ID {book_id} not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        price = entry['price']
         
         # Get or create cart order
         cart_order = get_or_create_cart_order(request)
         
-        with transaction.atomic():
-            # Get or create cart item (OrderDetail)
-            try:
-                cart_item = OrderDetail.objects.get(
-                    OrderID=cart_order.OrderID,
-                    BookID=book_id
-                )
-                # Item already exists, increase quantity
-                cart_item.Quantity += quantity
-                cart_item.save()
-            except OrderDetail.DoesNotExist:
-                # Create new cart item
-                cart_item = OrderDetail.objects.create(
-                    OrderID=cart_order.OrderID,
-                    BookID=book_id,
-                    Quantity=quantity,
-                    Price=book.Price
-                )
-            
-            # Update cart total
-            update_cart_total(cart_order)
+        # Atomic increment + incremental total, no read-modify-write
+        new_quantity = cart_engine.add(cart_order, book_id, quantity, price)
         
         return Response({
             'status': 'success',
             'message': 'Item added to cart successfully',
             'book_id': book_id,
-            'quantity': cart_item.Quantity
+            'quantity': new_quantity
         })
         
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error adding to cart: {str(e)}")
         return Response({
@@ -128,34 +98,30 @@ def add_to_cart(request):
 def update_cart_item(request, book_id):
     """Update cart item quantity in Orders table"""
     try:
-        quantity = request.data.get('quantity', 1)
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
         if quantity < 1:
             return Response({
                 'status': 'error',
                 'message': 'Quantity must be at least 1'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        cart_order = get_or_create_cart_order(request)
+        cart_order = get_cart_order(request)
         
-        try:
-            cart_item = OrderDetail.objects.get(OrderID=cart_order.OrderID, BookID=book_id)
-            cart_item.Quantity = quantity
-            cart_item.save()
-            
-            # Update cart total
-            update_cart_total(cart_order)
-            
-            return Response({
-                'status': 'success',
-                'message': 'Cart item updated successfully',
-                'book_id': book_id,
-                'quantity': quantity
-            })
-        except OrderDetail.DoesNotExist:
+        if cart_order is None or cart_engine.set_quantity(cart_order, book_id, quantity) is None:
             return Response({
                 'status': 'error',
                 'message': 'Item not found in cart'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'status': 'success',
+            'message': 'Cart item updated successfully',
+            'book_id': book_id,
+            'quantity': quantity
+        })
             
     except Exception as e:
         logger.error(f"Error updating cart item: {str(e)}")
@@ -170,25 +136,19 @@ def update_cart_item(request, book_id):
 def remove_from_cart(request, book_id):
     """Remove item from cart (Orders table)"""
     try:
-        cart_order = get_or_create_cart_order(request)
+        cart_order = get_cart_order(request)
         
-        try:
-            cart_item = OrderDetail.objects.get(OrderID=cart_order.OrderID, BookID=book_id)
-            cart_item.delete()
-            
-            # Update cart total
-            update_cart_total(cart_order)
-            
-            return Response({
-                'status': 'success',
-                'message': 'Item removed from cart successfully',
-                'book_id': book_id
-            })
-        except OrderDetail.DoesNotExist:
+        if cart_order is None or not cart_engine.remove(cart_order, book_id):
             return Response({
                 'status': 'error',
                 'message': 'Item not found in cart'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'status': 'success',
+            'message': 'Item removed from cart successfully',
+            'book_id': book_id
+        })
             
     except Exception as e:
         logger.error(f"Error removing from cart: {str(e)}")
@@ -203,12 +163,8 @@ def remove_from_cart(request, book_id):
 def clear_cart(request):
     """Clear all items from cart (Orders table)"""
     try:
-        cart_order = get_or_create_cart_order(request)
-        deleted_count = OrderDetail.objects.filter(OrderID=cart_order.OrderID).delete()[0]
-        
-        # Update cart total to 0
-        cart_order.TotalAmount = 0
-        cart_order.save()
+        cart_order = get_cart_order(request)
+        deleted_count = cart_engine.clear(cart_order) if cart_order is not None else 0
         
         return Response({
             'status': 'success',
@@ -223,5 +179,69 @@ def clear_cart(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch_update_cart(request):
+    """Apply many line changes in one transaction
+
+    Body: {"items": [{"book_id": 1, "quantity": 2}, {"book_id": 5, "delta": -1}, ...]}
+    `quantity` sets the line (0 removes it), `delta` adds to it.
+    """
+    try:
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'message': 'Invalid data',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = serializer.validated_data['items']
+        book_ids = {item['book_id'] for item in items}
+        
+        # Validate every book against the cached price table (one query for misses)
+        prices = {
+            book_id: entry['price']
+            for book_id, entry in price_table.get_prices(book_ids).items()
+        }
+        missing = sorted(book_ids - prices.keys())
+        if missing:
+            return Response({
+                'status': 'error',
+                'message': 'Book not found',
+                'book_ids': missing
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        changes = [
+            (item['book_id'], 'set', item['quantity']) if 'quantity' in item
+            else (item['book_id'], 'add', item['delta'])
+            for item in items
+        ]
+        
+        cart_order = get_or_create_cart_order(request)
+        quantities = cart_engine.apply(cart_order, changes, prices)
+        
+        return Response({
+            'status': 'success',
+            'message': 'Cart updated successfully',
+            'items': [
+                {'book_id': book_id, 'quantity': quantity}
+                for book_id, quantity in quantities.items()
+            ]
+        })
+        
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error applying cart batch: {str(e)}")
+        return Response({
+            'status': 'error',
+            'message': f'Error updating cart: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # Alias for add_to_cart to support both URLs
 add_item = add_to_cart
@@ -0,0 +1,306 @@
+"""
+Single cart engine shared by the cart API and the order-backed cart endpoints.
+
+A customer's cart is an `orders` row with Status='cart'. Guest carts live in
+the signed-cookie session (SessionCart) and are only written to the database
+when the guest logs in; with CART_ANONYMOUS_BACKEND='database' each session
+gets its own order row instead, its id kept in the session. The
+customer -> cart id mapping and each cart's summary are cached and rewritten
+after every mutation (write-through), so cart reads skip the database. This
+needs a CART_CACHE_ALIAS shared by every worker: with a per-process cache
+(LocMem) another worker would keep serving a checked-out cart or an old
+summary, so nothing is cached and every read goes to the database.
+"""
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from apps.cart.services import cart_mutations, price_table
+from apps.cart.services.cart_mutations import CART_STATUS
+from apps.cart.services.session_cart import SessionCart
+from apps.catalog.models import Book
+from apps.orders.models import Order, OrderDetail
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'cart_order_id'
+
+
+def build_summary(cart_order) -> dict:
+    """
+    Build the cart payload with a single query: lines are joined with the book
+    title through a correlated subquery and subtotals are computed in SQL.
+    Lines whose book no longer exists are skipped.
+    """
+    summary = {'items': [], 'total_items': 0, 'total_amount': Decimal('0.00')}
+    if cart_order is None:
+        return summary
+
+    lines = (
+        OrderDetail.objects.filter(OrderID=cart_order.OrderID)
+        .annotate(
+            title=Subquery(Book.objects.filter(BookID=OuterRef('BookID')).values('Title')[:1]),
+            subtotal=F('Price') * F('Quantity'),
+        )
+        .filter(title__isnull=False)
+        .order_by('OrderDetailID')
+        .values('BookID', 'title', 'Price', 'Quantity', 'subtotal')
+    )
+
+    for line in lines:
+        summary['total_items'] += line['Quantity']
+        summary['total_amount'] += line['subtotal']
+        summary['items'].append({
+            'book_id': line['BookID'],
+            'title': line['title'],
+            'price': line['Price'],
+            'quantity': line['Quantity'],
+            'subtotal': line['subtotal'],
+        })
+    return summary
+
+
+class CartEngine:
+    """
+    Cart lookup, cached reads and cache-refreshing mutations.
+
+    Orders returned from a cache hit only carry OrderID/CustomerID/Status;
+    call `refresh_from_db()` before saving one. Mutations re-check the status
+    under a row lock; when a cached customer cart turns out to be checked out
+    (by another process), the entry is dropped and the mutation is applied to
+    the customer's current cart, which the passed order is repointed to.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = alias or getattr(settings, 'CART_CACHE_ALIAS', 'default')
+        self.timeout = timeout if timeout is not None else getattr(settings, 'CART_CACHE_TIMEOUT', 300)
+        self.anonymous_backend = getattr(settings, 'CART_ANONYMOUS_BACKEND', 'session')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def shared(self) -> bool:
+        """Whether the cache is seen by every worker; per-process caches are not used"""
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    @staticmethod
+    def _owner_key(customer_id) -> str:
+        return f'cart:owner:{customer_id}'
+
+    @staticmethod
+    def _summary_key(order_id) -> str:
+        return f'cart:summary:{order_id}'
+
+    # ----------------------------------------------------------------- lookup
+
+    def for_customer(self, customer_id: int, create: bool = False) -> Optional[Order]:
+        order_id = self.cache.get(self._owner_key(customer_id)) if self.shared else None
+        if order_id:
+            return Order(OrderID=order_id, CustomerID=customer_id, Status=CART_STATUS)
+
+        order = (
+            Order.objects.filter(CustomerID=customer_id, Status=CART_STATUS)
+            .order_by('OrderID')
+            .first()
+        )
+        if order is None:
+            if not create:
+                return None
+            order = Order.objects.create(
+                CustomerID=customer_id, Status=CART_STATUS,
+                OrderDate=timezone.now(), TotalAmount=0
+            )
+        if self.shared:
+            self.cache.set(self._owner_key(customer_id), order.OrderID, self.timeout)
+        return order
+
+    def for_session(self, request, create: bool = False) -> Optional[Order]:
+        session = getattr(request, 'session', None)
+        if session is None:
+            return None
+
+        order_id = session.get(SESSION_KEY)
+        if order_id:
+            if self.shared and self.cache.get(self._summary_key(order_id)) is not None:
+                return Order(OrderID=order_id, CustomerID=None, Status=CART_STATUS)
+            order = Order.objects.filter(
+                OrderID=order_id, Status=CART_STATUS, CustomerID__isnull=True
+            ).first()
+            if order is not None:
+                return order
+            session.pop(SESSION_KEY, None)  # Checked out or purged
+
+        if not create:
+            return None
+        order = Order.objects.create(
+            CustomerID=None, Status=CART_STATUS, OrderDate=timezone.now(), TotalAmount=0
+        )
+        session[SESSION_KEY] = order.OrderID
+        return order
+
+    def current(self, request, create: bool = False):
+        """Cart of the authenticated customer, or of the anonymous session"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return self.for_customer(user.id, create=create)
+        if self.anonymous_backend == 'session':
+            session = getattr(request, 'session', None)
+            return SessionCart(session) if session is not None else None
+        return self.for_session(request, create=create)
+
+    # ------------------------------------------------------------------ reads
+
+    def summary(self, cart_order, include_items: bool = True) -> dict:
+        if cart_order is None:
+            return build_summary(None)
+        if isinstance(cart_order, SessionCart):
+            data = cart_order.summary()
+            return data if include_items else {**data, 'items': []}
+        data = self.cache.get(self._summary_key(cart_order.OrderID)) if self.shared else None
+        if data is None:
+            data = self.refresh(cart_order)
+        if not include_items:
+            data = {**data, 'items': []}
+        return data
+
+    def refresh(self, cart_order) -> dict:
+        """Recompute and store the cached summary (write-through after mutations)"""
+        data = build_summary(cart_order)
+        if self.shared:
+            self.cache.set(self._summary_key(cart_order.OrderID), data, self.timeout)
+        return data
+
+    def forget(self, cart_order):
+        """Drop cached state once a cart is checked out or deleted"""
+        if isinstance(cart_order, SessionCart) or not self.shared:
+            return
+        keys = [self._summary_key(cart_order.OrderID)]
+        if cart_order.CustomerID:
+            keys.append(self._owner_key(cart_order.CustomerID))
+        self.cache.delete_many(keys)
+
+    # -------------------------------------------------------------- mutations
+
+    def _mutate(self, cart_order, mutation, *args):
+        """Run a cart_mutations function, retrying once on the current cart if this one is stale"""
+        try:
+            return mutation(cart_order, *args)
+        except cart_mutations.StaleCart:
+            self.forget(cart_order)
+            if not cart_order.CustomerID:
+                raise  # Anonymous carts are re-resolved from the session on the next request
+            current = self.for_customer(cart_order.CustomerID, create=True)
+            for field in Order._meta.concrete_fields:
+                setattr(cart_order, field.attname, getattr(current, field.attname))
+            logger.info(f"Cart for customer {cart_order.CustomerID} was stale, now {cart_order.OrderID}")
+            return mutation(cart_order, *args)
+
+    def add(self, cart_order, book_id: int, quantity: int, price) -> int:
+        if isinstance(cart_order, SessionCart):
+            return cart_order.add(book_id, quantity)
+        new_quantity = self._mutate(cart_order, cart_mutations.add_quantity, book_id, quantity, price)
+        self.refresh(cart_order)
+        return new_quantity
+
+    def set_quantity(self, cart_order, book_id: int, quantity: int) -> Optional[int]:
+        if isinstance(cart_order, SessionCart):
+            return cart_order.set_quantity(book_id, quantity)
+        result = self._mutate(cart_order, cart_mutations.set_quantity, book_id, quantity)
+        if result is not None:
+            self.refresh(cart_order)
+        return result
+
+    def remove(self, cart_order, book_id: int) -> bool:
+        return self.set_quantity(cart_order, book_id, 0) is not None
+
+    def apply(self, cart_order, changes: Iterable[Tuple[int, str, int]],
+              prices: Dict[int, Decimal]) -> Dict[int, int]:
+        if isinstance(cart_order, SessionCart):
+            return cart_order.apply(changes)
+        quantities = self._mutate(cart_order, cart_mutations.apply_changes, list(changes), prices)
+        self.refresh(cart_order)
+        return quantities
+
+    def clear(self, cart_order) -> int:
+        if isinstance(cart_order, SessionCart):
+            return cart_order.clear()
+        deleted = self._mutate(cart_order, cart_mutations.clear)
+        self.refresh(cart_order)
+        return deleted
+
+    # ------------------------------------------------------------------ merge
+
+    def merge_on_login(self, request, customer_id: int) -> Optional[Order]:
+        """
+        Fold the session's anonymous cart into the customer's cart with bulk
+        upserts (quantities of books present in both are added), then delete it.
+        """
+        if self.anonymous_backend == 'session':
+            return self._merge_session_lines(request, customer_id)
+
+        session_cart = self.for_session(request)
+        if session_cart is None:
+            return None
+
+        lines = list(
+            OrderDetail.objects.filter(OrderID=session_cart.OrderID)
+            .values_list('BookID', 'Quantity', 'Price')
+        )
+        user_cart = None
+        with transaction.atomic():
+            if lines:
+                user_cart = self.for_customer(customer_id, create=True)
+                self._mutate(
+                    user_cart, cart_mutations.apply_changes,
+                    [(book_id, 'add', quantity or 0) for book_id, quantity, _ in lines],
+                    {book_id: price for book_id, _, price in lines},
+                )
+            OrderDetail.objects.filter(OrderID=session_cart.OrderID).delete()
+            Order.objects.filter(OrderID=session_cart.OrderID).delete()
+
+        request.session.pop(SESSION_KEY, None)
+        self.forget(session_cart)
+        if user_cart is not None:
+            self.refresh(user_cart)
+            logger.info(f"Merged {len(lines)} session cart lines into cart {user_cart.OrderID}")
+        return user_cart
+
+    def _merge_session_lines(self, request, customer_id: int) -> Optional[Order]:
+        session = getattr(request, 'session', None)
+        if session is None:
+            return None
+        guest_cart = SessionCart(session)
+        lines = guest_cart.lines
+        prices = {
+            book_id: entry['price']
+            for book_id, entry in price_table.get_prices(lines).items()
+        }
+        lines = {book_id: qty for book_id, qty in lines.items() if book_id in prices}
+        if not lines:
+            guest_cart.clear()
+            return None
+
+        with transaction.atomic():
+            user_cart = self.for_customer(customer_id, create=True)
+            self._mutate(
+                user_cart, cart_mutations.apply_changes,
+                [(book_id, 'add', qty) for book_id, qty in lines.items()], prices
+            )
+        guest_cart.clear()
+        self.refresh(user_cart)
+        logger.info(f"Merged {len(lines)} guest cart lines into cart {user_cart.OrderID}")
+        return user_cart
+
+
+# Singleton instance
+cart_engine = CartEngine()
@@ -0,0 +1,170 @@
+"""
+Cart mutations applied with atomic SQL statements.
+
+Quantities change through `F()` updates instead of read-modify-write, and
+`Order.TotalAmount` is adjusted by the delta of each change in the same
+transaction, so a mutation never reloads the whole cart. Every mutation first
+locks the cart row and checks it is still Status='cart': the order id may come
+from a cache that has not seen a checkout in another process, and writing
+lines into a confirmed order would change what the customer pays. The lock
+also keeps concurrent tabs from creating duplicate lines for the same book.
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from apps.orders.models import Order, OrderDetail
+
+CART_STATUS = 'cart'
+
+AMOUNT_FIELD = DecimalField(max_digits=10, decimal_places=2)
+ZERO_AMOUNT = Value(Decimal('0.00'), output_field=AMOUNT_FIELD)
+
+
+class StaleCart(Exception):
+    """The order is no longer a cart (checked out since its id was cached)"""
+
+
+def _lines(cart_order, book_id):
+    return OrderDetail.objects.filter(OrderID=cart_order.OrderID, BookID=book_id)
+
+
+def _adjust_total(cart_order, amount):
+    """Add `amount` (Decimal or expression) to the cart total in one UPDATE"""
+    Order.objects.filter(OrderID=cart_order.OrderID, Status=CART_STATUS).update(
+        TotalAmount=ExpressionWrapper(
+            Coalesce(F('TotalAmount'), ZERO_AMOUNT) + amount, output_field=AMOUNT_FIELD
+        )
+    )
+
+
+def _lock_cart(cart_order):
+    """Lock the cart row for the transaction; raises StaleCart if it is no longer a cart"""
+    locked = (
+        Order.objects.select_for_update()
+        .filter(OrderID=cart_order.OrderID, Status=CART_STATUS)
+        .values_list('OrderID', flat=True)
+        .first()
+    )
+    if locked is None:
+        raise StaleCart(cart_order.OrderID)
+
+
+@transaction.atomic
+def add_quantity(cart_order, book_id: int, delta: int, price) -> int:
+    """
+    Add `delta` units of a book to the cart and return the new line quantity.
+    `price` is only used when the line does not exist yet.
+    """
+    _lock_cart(cart_order)
+    updated = _lines(cart_order, book_id).update(Quantity=F('Quantity') + delta)
+    if not updated:
+        OrderDetail.objects.create(
+            OrderID=cart_order.OrderID, BookID=book_id, Quantity=delta, Price=price
+        )
+        _adjust_total(cart_order, Decimal(price or 0) * delta)
+        return delta
+
+    line_price = Subquery(_lines(cart_order, book_id).values('Price')[:1])
+    _adjust_total(cart_order, ExpressionWrapper(Value(delta) * line_price, output_field=AMOUNT_FIELD))
+    return _lines(cart_order, book_id).values_list('Quantity', flat=True).first()
+
+
+@transaction.atomic
+def set_quantity(cart_order, book_id: int, quantity: int) -> Optional[int]:
+    """Set an existing line to `quantity` (0 removes it); None if the book is not in the cart"""
+    _lock_cart(cart_order)
+    line = _lines(cart_order, book_id).select_for_update().values('OrderDetailID', 'Quantity', 'Price').first()
+    if line is None:
+        return None
+    if quantity <= 0:
+        OrderDetail.objects.filter(OrderDetailID=line['OrderDetailID']).delete()
+        quantity = 0
+    else:
+        OrderDetail.objects.filter(OrderDetailID=line['OrderDetailID']).update(Quantity=quantity)
+    _adjust_total(cart_order, (line['Price'] or Decimal('0')) * (quantity - (line['Quantity'] or 0)))
+    return quantity
+
+
+def remove_line(cart_order, book_id: int) -> bool:
+    """Remove a book from the cart; False if it was not there"""
+    return set_quantity(cart_order, book_id, 0) is not None
+
+
+@transaction.atomic
+def clear(cart_order) -> int:
+    _lock_cart(cart_order)
+    deleted = OrderDetail.objects.filter(OrderID=cart_order.OrderID).delete()[0]
+    Order.objects.filter(OrderID=cart_order.OrderID).update(TotalAmount=Decimal('0.00'))
+    return deleted
+
+
+@transaction.atomic
+def apply_changes(cart_order, changes: Iterable[Tuple[int, str, int]],
+                  prices: Dict[int, Decimal]) -> Dict[int, int]:
+    """
+    Apply many line changes in one transaction.
+
+    `changes` are (book_id, mode, value) with mode 'set' (absolute quantity,
+    0 removes) or 'add' (signed delta). `prices` maps book ids to the price
+    used for new lines. Writes are one bulk INSERT, one bulk UPDATE, one
+    DELETE and one total adjustment regardless of the number of changes.
+    Returns the final quantity per touched book (0 = removed).
+    """
+    changes = list(changes)
+    _lock_cart(cart_order)
+    lines = {
+        line.BookID: line
+        for line in OrderDetail.objects.filter(
+            OrderID=cart_order.OrderID, BookID__in={book_id for book_id, _, _ in changes}
+        ).only('OrderDetailID', 'BookID', 'Quantity', 'Price')
+    }
+    original = {book_id: line.Quantity or 0 for book_id, line in lines.items()}
+
+    for book_id, mode, value in changes:
+        line = lines.get(book_id)
+        if line is None:
+            line = lines[book_id] = OrderDetail(
+                OrderID=cart_order.OrderID, BookID=book_id, Quantity=0, Price=prices.get(book_id)
+            )
+        quantity = value if mode == 'set' else (line.Quantity or 0) + value
+        line.Quantity = max(quantity, 0)
+
+    to_create, to_update, to_delete = [], [], []
+    amount = Decimal('0')
+    for book_id, line in lines.items():
+        before = original.get(book_id, 0)
+        if line.Quantity == before:
+            continue
+        amount += (line.Price or Decimal('0')) * (line.Quantity - before)
+        if line.pk is None:
+            if line.Quantity:
+                to_create.append(line)
+        elif line.Quantity:
+            to_update.append(line)
+        else:
+            to_delete.append(line.pk)
+
+    if to_create:
+        OrderDetail.objects.bulk_create(to_create)
+    if to_update:
+        OrderDetail.objects.bulk_update(to_update, ['Quantity'])
+    if to_delete:
+        OrderDetail.objects.filter(OrderDetailID__in=to_delete).delete()
+    if amount:
+        _adjust_total(cart_order, amount)
+
+    return {book_id: line.Quantity for book_id, line in lines.items()}
+
+
+def recalculate_total(cart_order):
+    """Recompute the cart total from its lines with one aggregate (repairs drift)"""
+    total = OrderDetail.objects.filter(OrderID=cart_order.OrderID).aggregate(
+        total=Sum(F('Price') * F('Quantity'), output_field=AMOUNT_FIELD)
+    )['total'] or Decimal('0.00')
+    Order.objects.filter(OrderID=cart_order.OrderID).update(TotalAmount=total)
+    cart_order.TotalAmount = total
+    return total
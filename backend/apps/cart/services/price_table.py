@@ -0,0 +1,49 @@
+"""
+Cached book price table used to validate and price carts without a query.
+
+Entries are `{'price': Decimal, 'title': str}` keyed by BookID and fetched in
+one query for every miss; book saves/deletes drop their entry (apps.cart.signals).
+"""
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.catalog.models import Book
+
+
+def _cache():
+    return caches[getattr(settings, 'CART_CACHE_ALIAS', 'default')]
+
+
+def _key(book_id) -> str:
+    return f'cart:book:{book_id}'
+
+
+def get_prices(book_ids: Iterable[int]) -> Dict[int, dict]:
+    """Price/title per existing book; unknown ids are simply absent"""
+    book_ids = {int(book_id) for book_id in book_ids}
+    if not book_ids:
+        return {}
+    cache = _cache()
+    cached = cache.get_many([_key(book_id) for book_id in book_ids])
+    table = {book_id: cached[_key(book_id)] for book_id in book_ids if _key(book_id) in cached}
+
+    missing = book_ids - table.keys()
+    if missing:
+        fetched = {
+            book_id: {'price': price, 'title': title}
+            for book_id, price, title in Book.objects.filter(BookID__in=missing)
+            .values_list('BookID', 'Price', 'Title')
+        }
+        if fetched:
+            cache.set_many(
+                {_key(book_id): entry for book_id, entry in fetched.items()},
+                getattr(settings, 'CART_PRICE_TABLE_TIMEOUT', 600),
+            )
+        table.update(fetched)
+    return table
+
+
+def invalidate(*book_ids):
+    _cache().delete_many([_key(book_id) for book_id in book_ids])
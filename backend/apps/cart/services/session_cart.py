@@ -0,0 +1,91 @@
+"""
+Guest cart kept in the signed-cookie session.
+
+Lines are stored as a compact `{book_id: quantity}` mapping and priced on read
+from the cached price table, so browsing and adding to the cart as a guest does
+not write to the database. The lines become `orderdetail` rows when the guest
+logs in (CartEngine.merge_on_login).
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from apps.cart.services import price_table
+
+SESSION_LINES_KEY = 'cart_lines'
+
+
+class SessionCart:
+    """Cart-shaped wrapper around `request.session` (no order row behind it)"""
+
+    OrderID = None
+    CustomerID = None
+    Status = 'cart'
+
+    def __init__(self, session):
+        self.session = session
+        self.max_lines = getattr(settings, 'CART_SESSION_MAX_LINES', 50)
+
+    @property
+    def lines(self) -> Dict[int, int]:
+        return {int(book_id): qty for book_id, qty in self.session.get(SESSION_LINES_KEY, {}).items()}
+
+    def _save(self, lines: Dict[int, int]):
+        lines = {str(book_id): qty for book_id, qty in lines.items() if qty > 0}
+        if len(lines) > self.max_lines:
+            raise ValueError(f"Cart cannot hold more than {self.max_lines} different books")
+        if lines:
+            self.session[SESSION_LINES_KEY] = lines
+        else:
+            self.session.pop(SESSION_LINES_KEY, None)
+
+    def add(self, book_id: int, delta: int) -> int:
+        lines = self.lines
+        lines[book_id] = max(lines.get(book_id, 0) + delta, 0)
+        self._save(lines)
+        return lines[book_id]
+
+    def set_quantity(self, book_id: int, quantity: int) -> Optional[int]:
+        lines = self.lines
+        if book_id not in lines:
+            return None
+        lines[book_id] = max(quantity, 0)
+        self._save(lines)
+        return lines[book_id]
+
+    def apply(self, changes: Iterable[Tuple[int, str, int]]) -> Dict[int, int]:
+        lines = self.lines
+        touched = {}
+        for book_id, mode, value in changes:
+            quantity = value if mode == 'set' else lines.get(book_id, 0) + value
+            lines[book_id] = touched[book_id] = max(quantity, 0)
+        self._save(lines)
+        return touched
+
+    def clear(self) -> int:
+        count = len(self.lines)
+        self.session.pop(SESSION_LINES_KEY, None)
+        return count
+
+    def summary(self) -> dict:
+        """Same payload as cart_engine.build_summary, priced from the cached table"""
+        summary = {'items': [], 'total_items': 0, 'total_amount': Decimal('0.00')}
+        lines = self.lines
+        prices = price_table.get_prices(lines)
+        for book_id, quantity in lines.items():
+            entry = prices.get(book_id)
+            if entry is None:
+                continue  # Book was removed from the catalog
+            price = entry['price'] or Decimal('0')
+            subtotal = price * quantity
+            summary['total_items'] += quantity
+            summary['total_amount'] += subtotal
+            summary['items'].append({
+                'book_id': book_id,
+                'title': entry['title'],
+                'price': price,
+                'quantity': quantity,
+                'subtotal': subtotal,
+            })
+        return summary
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.catalog.models import Book
+from apps.catalog.signals import books_updated
+from .services import price_table
+
+
+@receiver([post_save, post_delete], sender=Book)
+def drop_cached_price(sender, instance, **kwargs):
+    """Guest carts are priced from the cached table; keep it in step with the book"""
+    price_table.invalidate(instance.BookID)
+
+
+@receiver(books_updated)
+def drop_cached_prices(sender, book_ids, **kwargs):
+    price_table.invalidate(*book_ids)
@@ -0,0 +1,81 @@
+import pytest
+from unittest import mock
+from decimal import Decimal
+from rest_framework.test import APIClient
+from apps.catalog.models import Book
+from apps.orders.models import Order, OrderDetail
+from apps.orders.services.checkout import checkout_cart
+from apps.cart.services.cart_engine import CartEngine, cart_engine
+from apps.users.auth import CustomerPrincipal
+
+
+@pytest.fixture
+def shared_cart_cache():
+    # The engine only caches in a cache shared by workers; treat the test cache as one
+    with mock.patch.object(CartEngine, 'shared', new_callable=mock.PropertyMock, return_value=True):
+        yield
+
+
+@pytest.mark.django_db
+def test_mutation_through_stale_owner_entry_does_not_touch_checked_out_order(shared_cart_cache):
+    Book.objects.create(BookID=31, Title='Book 31', Price=100, Stock=10)
+    Book.objects.create(BookID=32, Title='Book 32', Price=50, Stock=10)
+    client = APIClient()
+    client.force_authenticate(CustomerPrincipal(501))
+
+    response = client.post('/api/v1/orders/cart/items/', {'book_id': 31, 'qty': 2}, format='json')
+    assert response.status_code == 200
+    cart_id = response.data['order_id']
+
+    order = checkout_cart(501)
+    assert order.OrderID == cart_id
+    # Another worker still maps the customer to the old cart
+    cart_engine.cache.set(cart_engine._owner_key(501), cart_id, 300)
+
+    response = client.post('/api/v1/orders/cart/items/', {'book_id': 32, 'qty': 1}, format='json')
+    assert response.status_code == 200
+    assert response.data['order_id'] != cart_id
+
+    confirmed = Order.objects.get(OrderID=cart_id)
+    assert confirmed.Status == 'confirmed'
+    assert confirmed.TotalAmount == Decimal('200')
+    assert list(OrderDetail.objects.filter(OrderID=cart_id).values_list('BookID', 'Quantity')) == [(31, 2)]
+
+    new_cart = Order.objects.get(CustomerID=501, Status='cart')
+    assert new_cart.OrderID != cart_id
+    assert list(OrderDetail.objects.filter(OrderID=new_cart.OrderID).values_list('BookID', 'Quantity')) == [(32, 1)]
+    assert client.get('/api/v1/orders/cart/').data['items'] == response.data['items']
+
+
+@pytest.mark.django_db
+def test_clear_through_stale_owner_entry_keeps_checked_out_lines(shared_cart_cache):
+    Book.objects.create(BookID=33, Title='Book 33', Price=40, Stock=10)
+    cart = cart_engine.for_customer(502, create=True)
+    cart_engine.add(cart, 33, 3, Decimal('40'))
+    cart_id = checkout_cart(502).OrderID
+    cart_engine.cache.set(cart_engine._owner_key(502), cart_id, 300)
+
+    stale = cart_engine.for_customer(502)
+    assert stale.OrderID == cart_id
+    cart_engine.clear(stale)
+    assert stale.OrderID != cart_id
+    assert OrderDetail.objects.filter(OrderID=cart_id).count() == 1
+    assert Order.objects.get(OrderID=cart_id).TotalAmount == Decimal('120')
+
+
+@pytest.mark.django_db
+def test_per_process_cache_is_not_trusted_for_cart_reads():
+    Book.objects.create(BookID=35, Title='Book 35', Price=20, Stock=10)
+    client = APIClient()
+    client.force_authenticate(CustomerPrincipal(503))
+    response = client.post('/api/v1/orders/cart/items/', {'book_id': 35, 'qty': 1}, format='json')
+    cart_id = response.data['order_id']
+    assert not cart_engine.shared  # LocMem in tests, as in production.py
+
+    # What another worker's LocMem could still hold after this checkout
+    cart_engine.cache.set(cart_engine._owner_key(503), cart_id, 300)
+    cart_engine.cache.set(cart_engine._summary_key(cart_id), {'items': [], 'total_items': 9, 'total_amount': 0}, 300)
+    checkout_cart(503)
+
+    assert cart_engine.for_customer(503) is None
+    assert cart_engine.summary(Order(OrderID=cart_id))['total_items'] == 1
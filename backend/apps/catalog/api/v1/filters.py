@@ -0,0 +1,71 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+
+def _int_list(raw, name):
+    if not raw:
+        return None
+    try:
+        return [int(v) for v in raw.split(',') if v.strip()]
+    except ValueError:
+        raise ValidationError({name: 'Expected a comma-separated list of integers'})
+
+
+def _decimal(raw, name):
+    if raw in (None, ''):
+        return None
+    try:
+        return Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: 'Expected a number'})
+
+
+def parse_facet_params(query_params) -> dict:
+    """
+    Parse facet filters from the query string:
+    ?category=1,2&author=3&publisher=4&year=2020,2021&min_price=0&max_price=200000&in_stock=true
+    """
+    in_stock = query_params.get('in_stock')
+    if in_stock not in (None, ''):
+        in_stock = in_stock.lower() in ('1', 'true', 'yes')
+    else:
+        in_stock = None
+
+    return {
+        'category': _int_list(query_params.get('category'), 'category'),
+        'author': _int_list(query_params.get('author'), 'author'),
+        'publisher': _int_list(query_params.get('publisher'), 'publisher'),
+        'year': _int_list(query_params.get('year'), 'year'),
+        'min_price': _decimal(query_params.get('min_price'), 'min_price'),
+        'max_price': _decimal(query_params.get('max_price'), 'max_price'),
+        'in_stock': in_stock,
+    }
+
+
+class BookFacetFilter(filters.BaseFilterBackend):
+    """Apply facet filters to the Book queryset"""
+
+    def filter_queryset(self, request, queryset, view):
+        params = parse_facet_params(request.query_params)
+
+        if params['category'] is not None:
+            queryset = queryset.filter(CategoryID__in=params['category'])
+        if params['author'] is not None:
+            queryset = queryset.filter(AuthorID__in=params['author'])
+        if params['publisher'] is not None:
+            queryset = queryset.filter(PublisherID__in=params['publisher'])
+        if params['year'] is not None:
+            queryset = queryset.filter(PublicationDate__year__in=params['year'])
+        if params['min_price'] is not None:
+            queryset = queryset.filter(Price__gte=params['min_price'])
+        if params['max_price'] is not None:
+            queryset = queryset.filter(Price__lte=params['max_price'])
+        if params['in_stock'] is True:
+            queryset = queryset.filter(Stock__gt=0)
+        elif params['in_stock'] is False:
+            queryset = queryset.filter(Q(Stock__lte=0) | Q(Stock__isnull=True))
+
+        return queryset
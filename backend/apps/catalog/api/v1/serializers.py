@@ -1,31 +1,8 @@
 from rest_framework import serializers
+from apps.common.media import get_absolute_image_url, get_image_variants
 from ...models import Book, Author, Category, Publisher
 
 
-def get_absolute_image_url(image_path, request=None):
-    """Convert relative image path to absolute URL - same as recommendation service"""
-    if not image_path:
-        return ''
-    if image_path.startswith(('http://', 'https://')):
-        return image_path
-    
-    # Try to get base URL from Django settings or request
-    from django.conf import settings
-    
-    # Use BACKEND_URL from environment if set, otherwise construct from request
-    base_url = getattr(settings, 'BACKEND_URL', None)
-    if not base_url:
-        if request:
-            base_url = f"{request.scheme}://{request.get_host()}"
-        else:
-            # Fallback for local development
-            base_url = "http://127.0.0.1:8000"
-    
-    if image_path.startswith('/'):
-        return f"{base_url}{image_path}"
-    return f"{base_url}/media/{image_path}"
-
-
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Author
@@ -46,13 +23,24 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class BookSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Book
         fields = ['BookID', 'Title', 'AuthorID', 'PublisherID', 'CategoryID', 
-                  'Price', 'Stock', 'Description', 'PublicationDate', 'image_url']
+                  'Price', 'Stock', 'Description', 'PublicationDate', 'image_url',
+                  'image_variants', 'image_srcset']
     
     def get_image_url(self, obj):
         """Use the same image URL logic as recommendation service"""
         request = self.context.get('request')
         return get_absolute_image_url(obj.ImageURL, request)
+
+    def get_image_variants(self, obj):
+        """Thumbnail URLs keyed by width (see manage.py build_thumbnails)"""
+        return get_image_variants(obj.ImageURL, self.context.get('request'))
+
+    def get_image_srcset(self, obj):
+        variants = get_image_variants(obj.ImageURL, self.context.get('request'))
+        return ', '.join(f'{url} {width}w' for width, url in variants.items())
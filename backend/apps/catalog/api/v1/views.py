@@ -1,19 +1,67 @@
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 from ...models import Book, Author, Category, Publisher
+from ...services.facet_index import facet_index, bitmap_from_ids
+from ...services.versioning import catalog_version, catalog_last_modified
+from apps.common.http import conditional_read, request_etag
+from apps.common.response_cache import cache_response
+from .filters import BookFacetFilter, parse_facet_params
 from .serializers import BookSerializer, AuthorSerializer, CategorySerializer, PublisherSerializer
 
 
+def catalog_etag(request, *args, **kwargs):
+    return request_etag(request, catalog_version())
+
+
+def catalog_modified(request, *args, **kwargs):
+    return catalog_last_modified()
+
+
+catalog_conditional = conditional_read(catalog_etag, catalog_modified)
+
+
+def catalog_cache(resource):
+    """Detail responses depend on one row, list/facet responses on the collection"""
+    def tags(request, *args, **kwargs):
+        pk = kwargs.get('pk')
+        return [f'{resource}:{pk}'] if pk is not None else [f'{resource}:list']
+    return cache_response(tags)
+
+
+@method_decorator(catalog_conditional, name='list')
+@method_decorator(catalog_conditional, name='retrieve')
+@method_decorator(catalog_cache('book'), name='list')
+@method_decorator(catalog_cache('book'), name='retrieve')
 class BookViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [AllowAny]  # Allow public access to books
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter, BookFacetFilter, filters.OrderingFilter]
     search_fields = ['Title', 'Description']
     ordering_fields = ['Title', 'Price', 'PublicationDate']
     ordering = ['Title']
 
+    @action(detail=False, methods=['get'])
+    @method_decorator(catalog_conditional)
+    @method_decorator(catalog_cache('book'))
+    def facets(self, request):
+        """Facet counts for the current filters, served from the in-memory facet index"""
+        params = parse_facet_params(request.query_params)
+        restrict = None
+        if request.query_params.get('search'):
+            # Full-text matches cannot come from the index; fetch their ids once
+            hits = filters.SearchFilter().filter_queryset(request, Book.objects.all(), self)
+            restrict = bitmap_from_ids(hits.values_list('BookID', flat=True))
+        return Response(facet_index.facet_counts(params, restrict=restrict))
+
 
+@method_decorator(catalog_conditional, name='list')
+@method_decorator(catalog_conditional, name='retrieve')
+@method_decorator(catalog_cache('author'), name='list')
+@method_decorator(catalog_cache('author'), name='retrieve')
 class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
@@ -23,6 +71,10 @@ class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['AuthorName']
 
 
+@method_decorator(catalog_conditional, name='list')
+@method_decorator(catalog_conditional, name='retrieve')
+@method_decorator(catalog_cache('category'), name='list')
+@method_decorator(catalog_cache('category'), name='retrieve')
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -32,6 +84,9 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['CategoryName']
 
 
+# Publishers require authentication, so responses must stay out of shared caches
+@method_decorator(conditional_read(catalog_etag, catalog_modified, public=False), name='list')
+@method_decorator(conditional_read(catalog_etag, catalog_modified, public=False), name='retrieve')
 class PublisherViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Publisher.objects.all()
     serializer_class = PublisherSerializer
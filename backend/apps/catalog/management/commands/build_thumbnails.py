@@ -0,0 +1,132 @@
+"""
+Management command to generate resized cover thumbnails into MEDIA_ROOT
+Usage: python manage.py build_thumbnails [--widths 160,320,640] [--workers 4] [--force]
+       python manage.py build_thumbnails --loop [--interval 5] [--rescan 600]
+
+With --loop it runs as the thumbnail worker: covers queued by book saves are
+rendered every --interval seconds and every cover is rechecked every --rescan
+seconds (only covers newer than their thumbnails are decoded).
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.catalog.models import Book
+from apps.catalog.services import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate resized, recompressed cover thumbnails for every book image'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--widths',
+            type=str,
+            help='Comma-separated widths in pixels (default: IMAGE_VARIANT_WIDTHS or 160,320,640)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--quality',
+            type=int,
+            default=thumbnails.DEFAULT_QUALITY,
+            help='JPEG/WebP quality (1-95)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate thumbnails even if they are up to date',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a background worker',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls of the queued covers with --loop',
+        )
+        parser.add_argument(
+            '--rescan',
+            type=float,
+            default=600,
+            help='Seconds between full rescans of every cover with --loop',
+        )
+
+    def handle(self, *args, **options):
+        if thumbnails.Image is None:
+            raise CommandError('Pillow is not installed: pip install Pillow')
+
+        widths = thumbnails.configured_widths()
+        if options['widths']:
+            try:
+                widths = tuple(int(w) for w in options['widths'].split(',') if w.strip())
+            except ValueError:
+                raise CommandError('--widths must be a comma-separated list of integers')
+
+        if not options['loop']:
+            self._build_all(widths, options)
+            return
+
+        next_rescan = time.monotonic()
+        while True:
+            if time.monotonic() >= next_rescan:
+                try:
+                    self._build_all(widths, options)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f'⚠️  Thumbnail rescan failed, retrying: {e}'))
+                next_rescan = time.monotonic() + options['rescan']
+            self._build_pending(widths, options)
+            time.sleep(options['interval'])
+
+    def _build_pending(self, widths, options):
+        """Render covers queued by book saves, in this process"""
+        for image_path in thumbnails.take_pending():
+            try:
+                paths = thumbnails.generate_variants(
+                    image_path, widths=widths, quality=options['quality'], force=options['force']
+                )
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'  ⚠️  {image_path}: {e}'))
+                continue
+            if paths:
+                self.stdout.write(self.style.SUCCESS(f'✅ {image_path}: {len(paths)} thumbnails written'))
+
+    def _build_all(self, widths, options):
+        image_paths = (
+            Book.objects.exclude(ImageURL__isnull=True).exclude(ImageURL='')
+            .values_list('ImageURL', flat=True).distinct()
+        )
+
+        self.stdout.write(f'Generating widths {widths} with {options["workers"]} workers...')
+        start_time = timezone.now()
+        processed = written = failed = 0
+
+        for source, paths, error in thumbnails.generate_many(
+            image_paths, widths=widths, quality=options['quality'],
+            force=options['force'], workers=options['workers'],
+        ):
+            processed += 1
+            written += len(paths)
+            if error:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  ⚠️  {source}: {error}'))
+
+        elapsed = (timezone.now() - start_time).total_seconds()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {processed} covers processed, {written} thumbnails written, '
+                f'{failed} failed in {elapsed:.2f}s'
+            )
+        )
+        if written and not getattr(settings, 'IMAGE_VARIANT_WIDTHS', ()):
+            self.stdout.write('💡 Set IMAGE_VARIANT_WIDTHS so the API exposes the new thumbnails')
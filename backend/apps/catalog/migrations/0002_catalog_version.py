@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('Name', models.CharField(db_column='Name', max_length=50, primary_key=True, serialize=False)),
+                ('Version', models.BigIntegerField(db_column='Version', default=0)),
+                ('ModifiedAt', models.DateTimeField(db_column='ModifiedAt')),
+            ],
+            options={
+                'db_table': 'catalog_version',
+            },
+        ),
+    ]
@@ -60,3 +60,13 @@ class Book(models.Model):
 
     def __str__(self):
         return self.Title
+
+
+class CatalogVersion(models.Model):
+    """Catalog-wide change counter behind catalog ETags and Last-Modified, see services.versioning"""
+    Name = models.CharField(primary_key=True, max_length=50, db_column='Name')
+    Version = models.BigIntegerField(default=0, db_column='Version')
+    ModifiedAt = models.DateTimeField(db_column='ModifiedAt')
+
+    class Meta:
+        db_table = 'catalog_version'
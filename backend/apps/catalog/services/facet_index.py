@@ -0,0 +1,231 @@
+"""
+In-memory facet index for the book catalog.
+
+Every facet value (category, author, publisher, publication year, price bucket,
+in-stock flag) maps to a bitmap of BookIDs stored as a Python int. Facet counts
+for any filter combination are computed with bitwise AND + popcount instead of
+running one GROUP BY per facet against the database.
+"""
+import bisect
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+from apps.catalog.models import Book
+
+logger = logging.getLogger(__name__)
+
+FACETS = ('category', 'author', 'publisher', 'year', 'price', 'in_stock')
+
+# Lower bounds of the price buckets shown as facet values (same unit as Book.Price)
+DEFAULT_PRICE_BUCKETS = (0, 100000, 200000, 300000, 500000)
+
+
+def bitmap_from_ids(book_ids: Iterable[int]) -> int:
+    """Build a bitmap with one bit set per BookID"""
+    bitmap = 0
+    for book_id in book_ids:
+        if book_id is not None and book_id >= 0:
+            bitmap |= 1 << book_id
+    return bitmap
+
+
+class FacetIndex:
+    """Bitmap index over the facet columns of the `book` table"""
+
+    def __init__(self, price_buckets=None, ttl=None):
+        self.price_buckets = tuple(
+            Decimal(str(b)) for b in (
+                price_buckets
+                or getattr(settings, 'CATALOG_FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+            )
+        )
+        # Safety net for writes that bypass model signals (e.g. QuerySet.update)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'CATALOG_FACET_INDEX_TTL', 600)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._bitmaps = {facet: {} for facet in FACETS}  # facet -> value -> bitmap
+        self._rows = {}  # book_id -> (facet values dict, price)
+        self._prices = []  # sorted (price, book_id) for arbitrary price ranges
+        self._all = 0
+        self.built_at = None
+
+    # ------------------------------------------------------------------ build
+
+    def build(self):
+        """Rebuild the whole index with a single query"""
+        rows = Book.objects.values_list(
+            'BookID', 'CategoryID', 'AuthorID', 'PublisherID',
+            'Price', 'Stock', 'PublicationDate'
+        )
+        start = time.monotonic()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(*row)
+            self.built_at = time.monotonic()
+        logger.info(
+            f"Facet index built: {len(self._rows)} books in {time.monotonic() - start:.3f}s"
+        )
+
+    def ensure_built(self):
+        with self._lock:
+            stale = self.built_at is None or (
+                self.ttl and time.monotonic() - self.built_at > self.ttl
+            )
+            if stale:
+                self.build()
+
+    def invalidate(self):
+        with self._lock:
+            self.built_at = None
+
+    # ---------------------------------------------------- incremental updates
+
+    def update_book(self, book: Book):
+        """Re-index a single book after it was created or changed"""
+        with self._lock:
+            if self.built_at is None:
+                return  # Built lazily on the next read
+            self._remove(book.BookID)
+            self._add(
+                book.BookID, book.CategoryID, book.AuthorID, book.PublisherID,
+                book.Price, book.Stock, book.PublicationDate
+            )
+
+    def remove_book(self, book_id: int):
+        with self._lock:
+            if self.built_at is None:
+                return
+            self._remove(book_id)
+
+    def _values_for(self, category_id, author_id, publisher_id, price, stock, publication_date):
+        return {
+            'category': category_id,
+            'author': author_id,
+            'publisher': publisher_id,
+            'year': publication_date.year if publication_date else None,
+            'price': self._price_bucket(price),
+            'in_stock': bool(stock and stock > 0),
+        }
+
+    def _add(self, book_id, category_id, author_id, publisher_id, price, stock, publication_date):
+        values = self._values_for(category_id, author_id, publisher_id, price, stock, publication_date)
+        bit = 1 << book_id
+        for facet, value in values.items():
+            if value is None:
+                continue
+            bucket = self._bitmaps[facet]
+            bucket[value] = bucket.get(value, 0) | bit
+        if price is not None:
+            bisect.insort(self._prices, (price, book_id))
+        self._rows[book_id] = (values, price)
+        self._all |= bit
+
+    def _remove(self, book_id):
+        entry = self._rows.pop(book_id, None)
+        if entry is None:
+            return
+        values, price = entry
+        mask = ~(1 << book_id)
+        for facet, value in values.items():
+            if value is None:
+                continue
+            bucket = self._bitmaps[facet]
+            remaining = bucket.get(value, 0) & mask
+            if remaining:
+                bucket[value] = remaining
+            else:
+                bucket.pop(value, None)
+        if price is not None:
+            idx = bisect.bisect_left(self._prices, (price, book_id))
+            if idx < len(self._prices) and self._prices[idx] == (price, book_id):
+                del self._prices[idx]
+        self._all &= mask
+
+    # ---------------------------------------------------------------- queries
+
+    def _price_bucket(self, price):
+        if price is None:
+            return None
+        idx = bisect.bisect_right(self.price_buckets, price) - 1
+        return max(idx, 0)
+
+    def price_bucket_label(self, idx: int) -> str:
+        low = self.price_buckets[idx]
+        if idx + 1 < len(self.price_buckets):
+            return f"{low}-{self.price_buckets[idx + 1]}"
+        return f"{low}+"
+
+    def _price_range_mask(self, min_price, max_price):
+        lo = 0 if min_price is None else bisect.bisect_left(self._prices, (min_price, -1))
+        hi = len(self._prices) if max_price is None else bisect.bisect_right(
+            self._prices, (max_price, float('inf'))
+        )
+        return bitmap_from_ids(book_id for _, book_id in self._prices[lo:hi])
+
+    def _filter_masks(self, filters: dict) -> Dict[str, int]:
+        """Bitmap per active filter; values inside one facet are OR-ed"""
+        masks = {}
+        for facet in ('category', 'author', 'publisher', 'year', 'in_stock'):
+            values = filters.get(facet)
+            if values is None:
+                continue
+            if facet == 'in_stock':
+                values = [values]
+            bucket = self._bitmaps[facet]
+            mask = 0
+            for value in values:
+                mask |= bucket.get(value, 0)
+            masks[facet] = mask
+        if filters.get('min_price') is not None or filters.get('max_price') is not None:
+            masks['price'] = self._price_range_mask(filters.get('min_price'), filters.get('max_price'))
+        return masks
+
+    def facet_counts(self, filters: dict, restrict: Optional[int] = None) -> dict:
+        """
+        Count matching books per facet value.
+
+        Each facet is counted against every *other* active filter so the
+        client can still widen a selection within the same facet.
+        `restrict` is an optional bitmap (e.g. full-text search hits).
+        """
+        self.ensure_built()
+        with self._lock:
+            universe = self._all if restrict is None else self._all & restrict
+            masks = self._filter_masks(filters)
+
+            total = universe
+            for mask in masks.values():
+                total &= mask
+
+            facets = {}
+            for facet in FACETS:
+                base = universe
+                for other, mask in masks.items():
+                    if other != facet:
+                        base &= mask
+                counts = []
+                for value, bitmap in self._bitmaps[facet].items():
+                    count = (bitmap & base).bit_count()
+                    if count:
+                        counts.append({'value': value, 'count': count})
+                if facet == 'price':
+                    counts.sort(key=lambda c: c['value'])
+                    for c in counts:
+                        c['label'] = self.price_bucket_label(c['value'])
+                else:
+                    counts.sort(key=lambda c: (-c['count'], str(c['value'])))
+                facets[facet] = counts
+
+            return {'total': total.bit_count(), 'facets': facets}
+
+
+# Singleton instance
+facet_index = FacetIndex()
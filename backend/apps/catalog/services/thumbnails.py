@@ -0,0 +1,152 @@
+"""
+Derivative image pipeline for book covers.
+
+Resized, recompressed copies of each cover are written next to the original in
+MEDIA_ROOT using `apps.common.media.variant_path` naming, so serializers can
+build srcset URLs without touching the filesystem.
+
+Rendering never runs in a request: saving a book with a new local cover only
+queues the path (`enqueue`), and `manage.py build_thumbnails --loop` renders
+queued covers and periodically rescans every cover for anything missed.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.common.media import variant_path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed where thumbnails are generated
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (160, 320, 640)
+DEFAULT_QUALITY = 80
+PENDING_KEY = 'thumbnails:pending'
+
+
+def configured_widths() -> Tuple[int, ...]:
+    return tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', ())) or DEFAULT_WIDTHS
+
+
+def local_media_path(image_path: Optional[str]) -> Optional[str]:
+    """Relative path under MEDIA_ROOT for a Book.ImageURL value, or None if not local"""
+    if not image_path or image_path.startswith(('http://', 'https://')):
+        return None
+    media_url = getattr(settings, 'MEDIA_URL', '/media/')
+    if image_path.startswith('/'):
+        if not image_path.startswith(media_url):
+            return None
+        image_path = image_path[len(media_url):]
+    return image_path.lstrip('/')
+
+
+def _cache():
+    return caches[getattr(settings, 'THUMBNAIL_CACHE_ALIAS', 'default')]
+
+
+def enqueue(image_path: str):
+    """
+    Ask the `build_thumbnails --loop` worker to render a cover soon.
+    Best effort: a path lost to a concurrent enqueue is found by the worker's rescan.
+    """
+    cache = _cache()
+    pending = cache.get(PENDING_KEY) or []
+    if image_path not in pending:
+        cache.set(PENDING_KEY, pending + [image_path], None)
+
+
+def take_pending() -> List[str]:
+    """Queued cover paths, removed from the queue"""
+    cache = _cache()
+    pending = cache.get(PENDING_KEY) or []
+    if pending:
+        cache.delete(PENDING_KEY)
+    return pending
+
+
+def _is_fresh(target: str, src_mtime: float) -> bool:
+    try:
+        return os.path.getmtime(target) >= src_mtime
+    except OSError:
+        return False
+
+
+def _render_variants(source: str, widths: Iterable[int], quality: int, force: bool) -> List[str]:
+    """Process-pool worker: write one resized copy per stale width, return written paths"""
+    src_mtime = os.path.getmtime(source)
+    # Decide from mtimes alone so up-to-date covers are never opened and decoded
+    stale = [w for w in widths if force or not _is_fresh(variant_path(source, w), src_mtime)]
+    if not stale:
+        return []
+
+    written = []
+    with Image.open(source) as img:
+        img.load()
+        fmt = img.format or 'JPEG'
+        for width in stale:
+            target = variant_path(source, width)
+            if img.width <= width:
+                resized = img.copy()  # Never upscale, still recompress
+            else:
+                height = round(img.height * width / img.width)
+                resized = img.resize((width, height), Image.LANCZOS)
+            save_kwargs = {'optimize': True}
+            if fmt in ('JPEG', 'WEBP'):
+                if resized.mode not in ('RGB', 'L'):
+                    resized = resized.convert('RGB')
+                save_kwargs.update(quality=quality, progressive=True)
+            resized.save(target, format=fmt, **save_kwargs)
+            written.append(target)
+    return written
+
+
+def generate_variants(image_path: str, widths: Optional[Iterable[int]] = None,
+                      quality: int = DEFAULT_QUALITY, force: bool = False) -> List[str]:
+    """Generate derivatives for a single cover in the current process"""
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate thumbnails")
+    relative = local_media_path(image_path)
+    if relative is None:
+        return []
+    source = os.path.join(settings.MEDIA_ROOT, relative)
+    if not os.path.isfile(source):
+        return []
+    return _render_variants(source, tuple(widths or configured_widths()), quality, force)
+
+
+def generate_many(image_paths: Iterable[str], widths: Optional[Iterable[int]] = None,
+                  quality: int = DEFAULT_QUALITY, force: bool = False, workers: Optional[int] = None):
+    """
+    Generate derivatives for many covers in parallel.
+    Yields (source, written_paths, error) per image as workers finish.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate thumbnails")
+    widths = tuple(widths or configured_widths())
+    sources = []
+    for image_path in image_paths:
+        relative = local_media_path(image_path)
+        if relative is None:
+            continue
+        source = os.path.join(settings.MEDIA_ROOT, relative)
+        if os.path.isfile(source):
+            sources.append(source)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_render_variants, source, widths, quality, force): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                yield source, future.result(), None
+            except Exception as e:
+                yield source, [], e
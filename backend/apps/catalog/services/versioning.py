@@ -0,0 +1,53 @@
+"""
+Catalog version counter used as a cheap HTTP validator.
+
+The counter is a single `catalog_version` row, bumped in the writing
+transaction whenever a Book, Author, Category or Publisher row is saved or
+deleted (and on `books_updated` for queryset updates), so every worker and
+process serves the same ETag and Last-Modified (one primary-key read per
+request). Writes that reach no signal (raw SQL, imports, admin bulk updates)
+should call `bump_catalog_version()`; as a bound for the ones that don't, the
+version also rolls over every CATALOG_VERSION_TTL seconds.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import CatalogVersion
+
+STATE_NAME = 'catalog'
+
+
+def _current() -> Tuple[int, datetime]:
+    row = CatalogVersion.objects.filter(Name=STATE_NAME).values_list('Version', 'ModifiedAt').first()
+    if row is None:
+        state, _ = CatalogVersion.objects.get_or_create(
+            Name=STATE_NAME, defaults={'Version': 1, 'ModifiedAt': timezone.now()}
+        )
+        row = (state.Version, state.ModifiedAt)
+    return row
+
+
+def _bucket() -> int:
+    """Start (epoch seconds) of the current CATALOG_VERSION_TTL window, 0 if disabled"""
+    ttl = getattr(settings, 'CATALOG_VERSION_TTL', 600)
+    return int(time.time() // ttl * ttl) if ttl else 0
+
+
+def catalog_version() -> str:
+    return f'{_current()[0]}.{_bucket()}'
+
+
+def catalog_last_modified() -> datetime:
+    return max(_current()[1], datetime.fromtimestamp(_bucket(), tz=dt_timezone.utc))
+
+
+def bump_catalog_version():
+    now = timezone.now()
+    updated = CatalogVersion.objects.filter(Name=STATE_NAME).update(Version=F('Version') + 1, ModifiedAt=now)
+    if not updated:
+        CatalogVersion.objects.get_or_create(Name=STATE_NAME, defaults={'Version': 1, 'ModifiedAt': now})
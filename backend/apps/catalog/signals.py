@@ -0,0 +1,78 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Book, Author, Category, Publisher
+from .services.facet_index import facet_index
+from .services import thumbnails
+from .services.versioning import bump_catalog_version
+from apps.common.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Sent with `book_ids` after Book rows were changed without save() (QuerySet.update),
+# so the caches below that normally follow post_save stay in step
+books_updated = Signal()
+
+
+@receiver(post_save, sender=Book)
+def reindex_book(sender, instance, **kwargs):
+    """Keep the facet index in sync with a single changed book"""
+    facet_index.update_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    facet_index.remove_book(instance.BookID)
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Publisher)
+def catalog_changed(sender, instance, **kwargs):
+    """Invalidate ETags of catalog responses"""
+    bump_catalog_version()
+
+
+@receiver([post_save, post_delete], sender=Book)
+def book_changed(sender, instance, **kwargs):
+    response_cache.invalidate(f'book:{instance.BookID}', 'book:list')
+
+
+@receiver(books_updated)
+def books_bulk_changed(sender, book_ids, **kwargs):
+    bump_catalog_version()
+    response_cache.invalidate(*[f'book:{book_id}' for book_id in book_ids], 'book:list')
+    for book in Book.objects.filter(BookID__in=book_ids):
+        facet_index.update_book(book)
+
+
+@receiver([post_save, post_delete], sender=Author)
+def author_changed(sender, instance, **kwargs):
+    response_cache.invalidate(f'author:{instance.AuthorID}', 'author:list')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    response_cache.invalidate(f'category:{instance.CategoryID}', 'category:list')
+
+
+@receiver(post_init, sender=Book)
+def remember_image_url(sender, instance, **kwargs):
+    # Read from __dict__: touching a deferred field here would query per row
+    instance._loaded_image_url = instance.__dict__.get('ImageURL')
+
+
+@receiver(post_save, sender=Book)
+def queue_book_thumbnails(sender, instance, created, **kwargs):
+    """Queue thumbnails for the build_thumbnails worker when the cover changed"""
+    image_url = instance.__dict__.get('ImageURL')
+    if not created and image_url == getattr(instance, '_loaded_image_url', None):
+        return
+    instance._loaded_image_url = image_url
+    if thumbnails.local_media_path(image_url) is None:
+        return
+    transaction.on_commit(lambda: thumbnails.enqueue(image_url))
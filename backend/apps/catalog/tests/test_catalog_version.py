@@ -0,0 +1,34 @@
+import time
+
+import pytest
+from unittest import mock
+from django.test import override_settings
+from apps.catalog.models import Book
+from apps.catalog.services import versioning
+from apps.catalog.signals import books_updated
+
+
+@pytest.mark.django_db
+def test_version_follows_saves_and_queryset_updates():
+    Book.objects.create(BookID=51, Title='Book 51', Price=10, Stock=5)
+    before = versioning.catalog_version()
+
+    Book.objects.filter(BookID=51).update(Stock=4)
+    books_updated.send(sender=Book, book_ids=[51])
+
+    assert versioning.catalog_version() != before
+
+
+@pytest.mark.django_db
+@override_settings(CATALOG_VERSION_TTL=600)
+def test_version_rolls_over_after_out_of_band_writes():
+    Book.objects.create(BookID=52, Title='Book 52', Price=10, Stock=5)
+    later = (int(time.time()) // 600 + 2) * 600
+    with mock.patch.object(versioning.time, 'time', return_value=later):
+        before = versioning.catalog_version()
+        modified = versioning.catalog_last_modified()
+    # Raw SQL style write: no signal at all
+    Book.objects.filter(BookID=52).update(Stock=1)
+    with mock.patch.object(versioning.time, 'time', return_value=later + 600):
+        assert versioning.catalog_version() != before
+        assert versioning.catalog_last_modified() > modified
@@ -0,0 +1,47 @@
+"""
+HTTP caching helpers shared by read-mostly endpoints.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def request_etag(request, *parts) -> str:
+    """Hash version markers together with the URL and negotiated representation"""
+    raw = ':'.join(str(p) for p in parts)
+    raw += f":{request.get_full_path()}:{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def conditional_read(etag_func, last_modified_func=None, max_age=None, public=True):
+    """
+    Answer `304 Not Modified` from cheap validators before the view runs, and
+    emit `Cache-Control` so browsers and CDNs can reuse the response.
+
+    Works on function views and, via `method_decorator`, on viewset actions.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'CATALOG_CACHE_MAX_AGE', 60)
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view_func)
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if public:
+                    patch_cache_control(response, public=True, max_age=max_age)
+                else:
+                    patch_cache_control(response, private=True, max_age=max_age)
+                patch_vary_headers(response, ['Accept'])
+            return response
+
+        return _wrapped
+
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Idempotency-Key support for non-idempotent POST endpoints.
+
+The first request carrying a key (per scope and customer) claims a row in
+`idempotency_record`; its response is stored there and in the cache, so a
+retry returns the original result without running the view again. Replays are
+a single cache lookup, falling back to the unique (scope, owner, key) index.
+Records expire after IDEMPOTENCY_KEY_TTL seconds and are deleted by
+`manage.py purge_idempotency_keys`.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.common.models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl() -> int:
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+
+
+def _processing_timeout() -> int:
+    return getattr(settings, 'IDEMPOTENCY_PROCESSING_TIMEOUT', 300)
+
+
+def _cache():
+    return caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def _cache_key(scope: str, owner_id: int, key: str) -> str:
+    # Client keys may contain characters some cache backends reject
+    return 'idem:' + hashlib.sha256(f'{scope}:{owner_id}:{key}'.encode()).hexdigest()
+
+
+def _fingerprint(request) -> str:
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def _stored_response(entry: dict, fingerprint: str) -> Response:
+    if entry['fingerprint'] != fingerprint:
+        return Response(
+            {"error": f"{HEADER} was already used with a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(entry['body'], status=entry['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _in_progress() -> Response:
+    response = Response(
+        {"error": f"A request with this {HEADER} is still being processed"},
+        status=status.HTTP_409_CONFLICT
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+def _claim(scope, owner_id, key, fingerprint):
+    """Insert the processing record; returns (record, None) or (None, existing values)"""
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    Scope=scope, OwnerID=owner_id, Key=key, Fingerprint=fingerprint,
+                    ExpiresAt=now + timedelta(seconds=_ttl())
+                )
+            return record, None
+        except IntegrityError:
+            existing = (
+                IdempotencyRecord.objects.filter(Scope=scope, OwnerID=owner_id, Key=key)
+                .values('RecordID', 'Fingerprint', 'Status', 'ResponseStatus', 'ResponseBody',
+                        'CreatedAt', 'ExpiresAt')
+                .first()
+            )
+            if existing is None:
+                continue  # Swept meanwhile: the key is free again
+            abandoned = (
+                existing['Status'] == IdempotencyRecord.PROCESSING
+                and existing['CreatedAt'] <= now - timedelta(seconds=_processing_timeout())
+            )
+            if existing['ExpiresAt'] <= now or abandoned:
+                # Expired but not swept yet, or the worker handling it died
+                IdempotencyRecord.objects.filter(RecordID=existing['RecordID']).delete()
+                continue
+            return None, existing
+    return None, None
+
+
+def idempotent(scope: str):
+    """
+    Make a DRF function view replay its first response for a repeated
+    Idempotency-Key. Apply it below @api_view/@permission_classes so the
+    request is authenticated. Requests without the header run unchanged;
+    5xx responses and exceptions are not stored, so those can be retried.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            owner_id = getattr(request.user, 'id', None) or 0
+            fingerprint = _fingerprint(request)
+            cache = _cache()
+            cache_key = _cache_key(scope, owner_id, key)
+
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return _stored_response(entry, fingerprint)
+
+            record, existing = _claim(scope, owner_id, key, fingerprint)
+            if record is None:
+                if existing is None or existing['Status'] != IdempotencyRecord.COMPLETED:
+                    return _in_progress()
+                entry = {
+                    'fingerprint': existing['Fingerprint'],
+                    'status': existing['ResponseStatus'],
+                    'body': existing['ResponseBody'],
+                }
+                remaining = (existing['ExpiresAt'] - timezone.now()).total_seconds()
+                cache.set(cache_key, entry, max(int(remaining), 1))
+                return _stored_response(entry, fingerprint)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                IdempotencyRecord.objects.filter(RecordID=record.RecordID).delete()
+                raise
+
+            if response.status_code >= 500 or not hasattr(response, 'data'):
+                IdempotencyRecord.objects.filter(RecordID=record.RecordID).delete()
+                return response
+
+            body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+            IdempotencyRecord.objects.filter(RecordID=record.RecordID).update(
+                Status=IdempotencyRecord.COMPLETED,
+                ResponseStatus=response.status_code,
+                ResponseBody=body,
+            )
+            cache.set(cache_key, {'fingerprint': fingerprint, 'status': response.status_code, 'body': body}, _ttl())
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired(batch_size: int = 1000, now=None) -> int:
+    """Delete expired records in batches; returns the number deleted"""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyRecord.objects.filter(ExpiresAt__lte=now)
+            .order_by('RecordID')
+            .values_list('RecordID', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += IdempotencyRecord.objects.filter(RecordID__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return deleted
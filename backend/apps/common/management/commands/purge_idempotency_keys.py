@@ -0,0 +1,23 @@
+"""
+Management command to delete expired Idempotency-Key records
+Usage: python manage.py purge_idempotency_keys [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.common.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses past their retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Records deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Purged {deleted} expired idempotency records'))
@@ -0,0 +1,88 @@
+"""
+Shared media URL resolver used by catalog serializers and recommendation payloads.
+
+The base URL is computed once per process (or once per request host when
+BACKEND_URL is not configured) and resolved URLs are memoized, so serializing
+a page of books does not rebuild the same strings for every row.
+"""
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_BASE_URL = 'http://127.0.0.1:8000'
+
+
+@lru_cache(maxsize=1)
+def _configured_base() -> Optional[str]:
+    # A CDN in front of MEDIA_URL takes precedence over the backend itself
+    cdn = getattr(settings, 'MEDIA_CDN_URL', None)
+    if cdn:
+        return cdn.rstrip('/')
+    base = getattr(settings, 'BACKEND_URL', None)
+    return base.rstrip('/') if base else None
+
+
+@lru_cache(maxsize=1)
+def _media_prefix() -> str:
+    media_url = getattr(settings, 'MEDIA_URL', '/media/') or '/media/'
+    if not media_url.startswith('/'):
+        media_url = '/' + media_url
+    return media_url if media_url.endswith('/') else media_url + '/'
+
+
+@lru_cache(maxsize=64)
+def _host_base(scheme: str, host: str) -> str:
+    return f"{scheme}://{host}"
+
+
+def base_url(request=None) -> str:
+    configured = _configured_base()
+    if configured:
+        return configured
+    if request is not None:
+        return _host_base(request.scheme, request.get_host())
+    return DEFAULT_BASE_URL
+
+
+@lru_cache(maxsize=4096)
+def _join(base: str, image_path: str) -> str:
+    if image_path.startswith('/'):
+        return f"{base}{image_path}"
+    return f"{base}{_media_prefix()}{image_path}"
+
+
+def get_absolute_image_url(image_path, request=None) -> str:
+    """Convert relative image path to absolute URL"""
+    if not image_path:
+        return ''
+    if image_path.startswith(('http://', 'https://')):
+        return image_path
+    return _join(base_url(request), image_path)
+
+
+def variant_path(image_path: str, width: int) -> str:
+    """Path of the resized derivative of `image_path` (covers/a.jpg -> covers/a-320w.jpg)"""
+    stem, ext = os.path.splitext(image_path)
+    return f"{stem}-{width}w{ext}"
+
+
+def get_image_variants(image_path, request=None, widths: Optional[Iterable[int]] = None) -> Dict[int, str]:
+    """Absolute URLs of responsive variants keyed by width; empty for external images"""
+    if not image_path or image_path.startswith(('http://', 'https://')):
+        return {}
+    if widths is None:
+        widths = getattr(settings, 'IMAGE_VARIANT_WIDTHS', ())
+    base = base_url(request)
+    return {w: _join(base, variant_path(image_path, w)) for w in widths}
+
+
+@receiver(setting_changed)
+def _reset_media_caches(setting, **kwargs):
+    if setting in ('BACKEND_URL', 'MEDIA_URL', 'MEDIA_CDN_URL'):
+        _configured_base.cache_clear()
+        _media_prefix.cache_clear()
+        _join.cache_clear()
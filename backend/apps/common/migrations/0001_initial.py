@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('RecordID', models.BigAutoField(db_column='RecordID', primary_key=True, serialize=False)),
+                ('Scope', models.CharField(db_column='Scope', max_length=64)),
+                ('OwnerID', models.IntegerField(db_column='OwnerID')),
+                ('Key', models.CharField(db_column='IdempotencyKey', max_length=255)),
+                ('Fingerprint', models.CharField(db_column='Fingerprint', max_length=64)),
+                ('Status', models.CharField(db_column='Status', default='processing', max_length=20)),
+                ('ResponseStatus', models.IntegerField(blank=True, db_column='ResponseStatus', null=True)),
+                ('ResponseBody', models.JSONField(blank=True, db_column='ResponseBody', null=True)),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True, db_column='CreatedAt')),
+                ('ExpiresAt', models.DateTimeField(db_column='ExpiresAt', db_index=True)),
+            ],
+            options={
+                'db_table': 'idempotency_record',
+                'constraints': [models.UniqueConstraint(fields=('Scope', 'OwnerID', 'Key'), name='idempotency_scope_owner_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class IdempotencyRecord(models.Model):
+    """Stored outcome of a request made with an Idempotency-Key header"""
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+
+    RecordID = models.BigAutoField(primary_key=True, db_column='RecordID')
+    Scope = models.CharField(max_length=64, db_column='Scope')
+    OwnerID = models.IntegerField(db_column='OwnerID')
+    Key = models.CharField(max_length=255, db_column='IdempotencyKey')
+    Fingerprint = models.CharField(max_length=64, db_column='Fingerprint')
+    Status = models.CharField(max_length=20, default=PROCESSING, db_column='Status')
+    ResponseStatus = models.IntegerField(null=True, blank=True, db_column='ResponseStatus')
+    ResponseBody = models.JSONField(null=True, blank=True, db_column='ResponseBody')
+    CreatedAt = models.DateTimeField(auto_now_add=True, db_column='CreatedAt')
+    ExpiresAt = models.DateTimeField(db_column='ExpiresAt', db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_record'
+        constraints = [
+            models.UniqueConstraint(fields=['Scope', 'OwnerID', 'Key'], name='idempotency_scope_owner_key_uniq'),
+        ]
@@ -0,0 +1,124 @@
+"""
+Tagged server-side response cache.
+
+Entries are stored in a configurable Django cache alias (locmem by default,
+switch RESPONSE_CACHE_ALIAS to a redis/memcached alias when running several
+gunicorn workers). Each entry records the version of every tag it depends on;
+invalidating a tag bumps its version, so only dependent entries miss.
+"""
+import hashlib
+import logging
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .media import base_url
+
+logger = logging.getLogger(__name__)
+
+
+class TaggedResponseCache:
+    key_prefix = 'resp'
+    tag_prefix = 'resp-tag'
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+
+    @property
+    def backend(self):
+        return caches[self._alias or getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+    def _tag_key(self, tag):
+        return f'{self.tag_prefix}:{tag}'
+
+    def _tag_versions(self, tags):
+        keys = [self._tag_key(t) for t in tags]
+        versions = self.backend.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Time-based seed so an evicted tag never revalidates old entries
+                self.backend.add(key, time.time_ns(), None)
+                versions[key] = self.backend.get(key)
+        return {tag: versions[self._tag_key(tag)] for tag in tags}
+
+    def request_key(self, request) -> str:
+        params = urlencode(sorted(
+            (k, v) for k, values in request.query_params.lists() for v in values
+        ))
+        # Payloads hold absolute media URLs, built from the request host unless
+        # BACKEND_URL/MEDIA_CDN_URL is set, so entries are per base URL
+        raw = f'{base_url(request)}{request.path}?{params}'
+        return f"{self.key_prefix}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        if self._tag_versions(list(entry['tags'])) != entry['tags']:
+            return None
+        return entry['data']
+
+    def set(self, key, data, tags):
+        entry = {'tags': self._tag_versions(tags), 'data': data}
+        self.backend.set(key, entry, self.timeout)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            key = self._tag_key(tag)
+            try:
+                self.backend.incr(key)
+            except ValueError:
+                self.backend.set(key, time.time_ns(), None)
+
+
+response_cache = TaggedResponseCache()
+
+
+def cache_response(tags_func, cache=None):
+    """
+    Cache `response.data` of anonymous GET requests.
+
+    `tags_func(request, *args, **kwargs)` returns the tags the response
+    depends on. Rendering still happens per request, so one entry serves
+    every negotiated format.
+    """
+    cache = cache or response_cache
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            user = getattr(request, 'user', None)
+            if request.method != 'GET' or (user is not None and user.is_authenticated):
+                return view_func(request, *args, **kwargs)
+
+            key = cache.request_key(request)
+            try:
+                data = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache read failed: {e}")
+                return view_func(request, *args, **kwargs)
+            if data is not None:
+                return Response(data)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and hasattr(response, 'data'):
+                try:
+                    cache.set(key, response.data, tags_func(request, *args, **kwargs))
+                except Exception as e:
+                    logger.warning(f"Response cache write failed: {e}")
+            return response
+
+        return _wrapped
+
+    return decorator
@@ -0,0 +1,121 @@
+import pytest
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.common.idempotency import idempotent, purge_expired
+from apps.common.models import IdempotencyRecord
+from apps.users.auth import CustomerPrincipal
+
+SCOPE = 'tests.create'
+CUSTOMER_ID = 501
+factory = APIRequestFactory()
+calls = []
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@idempotent(SCOPE)
+def create_view(request):
+    calls.append(request.data)
+    return Response({'id': len(calls)}, status=status.HTTP_201_CREATED)
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def _post(data, key='key-1'):
+    request = factory.post('/tests/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    force_authenticate(request, user=CustomerPrincipal(CUSTOMER_ID))
+    return create_view(request)
+
+
+def _record(key='key-1', **fields):
+    return IdempotencyRecord.objects.create(
+        Scope=SCOPE, OwnerID=CUSTOMER_ID, Key=key, Fingerprint='x', ExpiresAt=timezone.now() + timedelta(days=1), **fields
+    )
+
+
+@pytest.mark.django_db
+def test_repeated_key_replays_the_stored_201_without_running_the_view():
+    first = _post({'qty': 1})
+    second = _post({'qty': 1})
+
+    assert first.status_code == second.status_code == 201
+    assert second.data == {'id': 1}
+    assert second['Idempotent-Replayed'] == 'true'
+    assert len(calls) == 1
+    assert IdempotencyRecord.objects.get(Key='key-1').Status == IdempotencyRecord.COMPLETED
+
+
+@pytest.mark.django_db
+def test_replay_falls_back_to_the_record_when_the_cache_is_empty():
+    _post({'qty': 1})
+    cache.clear()
+
+    replay = _post({'qty': 1})
+
+    assert replay.status_code == 201
+    assert replay.data == {'id': 1}
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_reused_key_with_a_different_body_is_rejected():
+    _post({'qty': 1})
+
+    response = _post({'qty': 2})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_key_still_processing_answers_409():
+    _record(Status=IdempotencyRecord.PROCESSING)
+
+    response = _post({'qty': 1})
+
+    assert response.status_code == 409
+    assert response['Retry-After'] == '1'
+    assert not calls
+
+
+@pytest.mark.django_db
+def test_abandoned_key_is_reclaimed():
+    record = _record(Status=IdempotencyRecord.PROCESSING)
+    IdempotencyRecord.objects.filter(pk=record.pk).update(CreatedAt=timezone.now() - timedelta(hours=1))
+
+    response = _post({'qty': 1})
+
+    assert response.status_code == 201
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_expired_key_is_reclaimed():
+    record = _record(Status=IdempotencyRecord.COMPLETED, ResponseStatus=201, ResponseBody={'id': 99})
+    IdempotencyRecord.objects.filter(pk=record.pk).update(ExpiresAt=timezone.now() - timedelta(seconds=1))
+
+    response = _post({'qty': 1})
+
+    assert response.status_code == 201
+    assert response.data == {'id': 1}
+    assert IdempotencyRecord.objects.get(Key='key-1').ResponseBody == {'id': 1}
+
+
+@pytest.mark.django_db
+def test_purge_deletes_only_expired_records():
+    now = timezone.now()
+    for key, expires_at in [('old-1', now - timedelta(hours=1)), ('old-2', now), ('live', now + timedelta(hours=1))]:
+        record = _record(key=key)
+        IdempotencyRecord.objects.filter(pk=record.pk).update(ExpiresAt=expires_at)
+
+    assert purge_expired(batch_size=1, now=now) == 2
+    assert list(IdempotencyRecord.objects.values_list('Key', flat=True)) == ['live']
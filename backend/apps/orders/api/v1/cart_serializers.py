@@ -15,6 +15,10 @@ class AddItemIn(serializers.Serializer):
         return attrs
 
 
+class AddItemsIn(serializers.Serializer):
+    items = AddItemIn(many=True, allow_empty=False, max_length=100)
+
+
 class UpdateQtyIn(serializers.Serializer):
     book_id = serializers.IntegerField()
     qty = serializers.IntegerField(min_value=0)
@@ -2,36 +2,41 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import F
 
-from .cart_serializers import AddItemIn, UpdateQtyIn, OrderOut
-from apps.orders.models import Order, OrderDetail
-from apps.orders.services.cart_as_order import get_or_create_open_order, add_item, update_qty
+from .cart_serializers import AddItemIn, AddItemsIn, UpdateQtyIn, OrderOut
+from apps.orders.models import Order
+from apps.catalog.models import Book
+from apps.cart.services.cart_engine import cart_engine, CART_STATUS
+from apps.orders.services.cart_as_order import (
+    get_or_create_open_order, get_open_order, add_item, add_items, update_qty
+)
 
 
 def _serialize(order: Order):
-    items = (
-        OrderDetail.objects.filter(OrderID=order.OrderID)
-        .values("BookID", "Quantity", "Price")
-        .annotate(line_total=F("Quantity") * F("Price"))
-        .order_by("OrderDetailID")
-    )
+    # Served from the cart engine's write-through cache
+    summary = cart_engine.summary(order)
     return {
         "order_id": order.OrderID,
         "status": order.Status,
-        "total": str(order.TotalAmount or 0),
-        "items": list(items),
+        "total": str(summary["total_amount"]),
+        "items": [
+            {
+                "BookID": item["book_id"],
+                "Quantity": item["quantity"],
+                "Price": item["price"],
+                "line_total": item["subtotal"],
+            }
+            for item in summary["items"]
+        ],
     }
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_cart(request):
-    order = (
-        Order.objects.filter(CustomerID=request.user.id, Status="Pending").order_by("OrderID").first()
-    )
+    order = get_open_order(request.user.id)
     if not order:
-        return Response({"order_id": None, "status": "Pending", "total": "0.00", "items": []})
+        return Response({"order_id": None, "status": CART_STATUS, "total": "0.00", "items": []})
     return Response(_serialize(order))
 
 
@@ -41,7 +46,24 @@ def add_to_cart(request):
     s = AddItemIn(data=request.data)
     s.is_valid(raise_exception=True)
     order = get_or_create_open_order(request.user.id)
-    add_item(order, s.validated_data["book_id"], s.validated_data["qty"])
+    try:
+        add_item(order, s.validated_data["book_id"], s.validated_data["qty"])
+    except Book.DoesNotExist as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(_serialize(order), status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def add_many_to_cart(request):
+    """POST {"items": [{"book_id": 1, "qty": 2}, ...]} - one round-trip for series/reorder"""
+    s = AddItemsIn(data=request.data)
+    s.is_valid(raise_exception=True)
+    order = get_or_create_open_order(request.user.id)
+    try:
+        add_items(order, [(item["book_id"], item["qty"]) for item in s.validated_data["items"]])
+    except Book.DoesNotExist as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(_serialize(order), status=status.HTTP_200_OK)
 
 
@@ -50,14 +72,16 @@ def add_to_cart(request):
 def update_item_qty(request):
     s = UpdateQtyIn(data=request.data)
     s.is_valid(raise_exception=True)
-    order = get_or_create_open_order(request.user.id)
-    update_qty(order, s.validated_data["book_id"], s.validated_data["qty"])
+    order = get_open_order(request.user.id)
+    if order is None or update_qty(order, s.validated_data["book_id"], s.validated_data["qty"]) is None:
+        return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
     return Response(_serialize(order))
 
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def remove_item(request, book_id: int):
-    order = get_or_create_open_order(request.user.id)
-    update_qty(order, book_id, 0)
+    order = get_open_order(request.user.id)
+    if order is None or update_qty(order, book_id, 0) is None:
+        return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
     return Response(_serialize(order))
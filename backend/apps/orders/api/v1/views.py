@@ -1,13 +1,20 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_spectacular.utils import extend_schema
 from django.utils import timezone
 from decimal import Decimal
 
+from apps.common.idempotency import idempotent
 from apps.orders.models import Order, OrderDetail
+from apps.orders.services import reservations
+from apps.orders.services.checkout import (
+    checkout_cart, place_order, EmptyCart, BookNotFound, OutOfStock
+)
+from apps.orders.services.order_history import item_counts, book_titles, order_summary
 from apps.catalog.models import Book
+from .pagination import OrderCursorPagination
 from .serializers import (
     CreateOrderSerializer,
     OrderResponseSerializer,
@@ -26,6 +33,7 @@ from .serializers import (
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('orders.create')
 def create_order(request):
     """Create order from cart by changing status from 'cart' to 'confirmed'"""
     customer_id = getattr(request.user, 'id', None)
@@ -36,84 +44,27 @@ def create_order(request):
     if serializer.is_valid():
         data = serializer.validated_data
         
-        if data.get('from_cart', True):
-            # Find cart order for user
-            try:
-                cart_order = Order.objects.get(CustomerID=customer_id, Status='cart')
-                
-                # Check if cart has items
-                cart_items = OrderDetail.objects.filter(OrderID=cart_order.OrderID)
-                if not cart_items.exists():
+        try:
+            if data.get('from_cart', True):
+                # Lock stock, decrement it and confirm the cart in one transaction
+                order = checkout_cart(customer_id)
+            else:
+                # Create order from explicit items
+                items_data = data['items']
+                if not items_data:
                     return Response(
-                        {"error": "Cart is empty"},
+                        {"error": "No valid items to order"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                
-                # Update status to confirmed and order date
-                cart_order.Status = 'confirmed'
-                cart_order.OrderDate = timezone.now()
-                cart_order.save()
-                
-                return Response({"order_id": cart_order.OrderID}, status=status.HTTP_201_CREATED)
-                
-            except Order.DoesNotExist:
-                return Response(
-                    {"error": "Cart is empty"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Create order from explicit items (existing logic)
-            items_data = data['items']
-            if not items_data:
-                return Response(
-                    {"error": "No valid items to order"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Calculate total and validate stock
-            total_amount = Decimal('0.00')
-            validated_items = []
+                order = place_order(customer_id, items_data)
+        except EmptyCart as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except BookNotFound as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except OutOfStock as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            for item in items_data:
-                book_data = Book.objects.filter(BookID=item['book_id']).values('BookID', 'Title', 'Price', 'Stock').first()
-                if not book_data:
-                    return Response(
-                        {"error": f"Book with ID {item['book_id']} not found"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-
-                if book_data['Stock'] < item['quantity']:
-                    return Response(
-                        {"error": f"Not enough stock for {book_data['Title']}. Available: {book_data['Stock']}"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                price = item.get('price', book_data['Price'])
-                subtotal = price * item['quantity']
-                total_amount += subtotal
-                validated_items.append({
-                    'book_id': item['book_id'],
-                    'quantity': item['quantity'],
-                    'price': price,
-                    'subtotal': subtotal
-                })
-
-            # Create the order
-            order = Order.objects.create(
-                CustomerID=customer_id, 
-                TotalAmount=total_amount,
-                Status='confirmed',
-                OrderDate=timezone.now()
-            )
-            for item in validated_items:
-                OrderDetail.objects.create(
-                    OrderID=order.OrderID,
-                    BookID=item['book_id'],
-                    Quantity=item['quantity'],
-                    Price=item['price']
-                )
-
-            return Response({"order_id": order.OrderID}, status=status.HTTP_201_CREATED)
+        return Response({"order_id": order.OrderID}, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -125,27 +76,47 @@ def create_order(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_orders(request):
-    """List user's orders"""
+    """List user's orders
+
+    - ?summary=1: per-status counts only (account page)
+    - ?cursor=... or ?page_size=N: keyset-paginated, newest first
+    - otherwise: the newest orders (same ordering), at most max_page_size of them
+    """
     customer_id = getattr(request.user, 'id', None)
     if not customer_id:
         return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
 
-    orders = Order.objects.filter(CustomerID=customer_id).order_by('-OrderDate')
-    
-    orders_data = []
-    for order in orders:
-        # Count total items
-        total_items = OrderDetail.objects.filter(OrderID=order.OrderID).count()
-        
-        orders_data.append({
+    if request.query_params.get('summary') in ('1', 'true'):
+        return Response(order_summary(customer_id))
+
+    orders = Order.objects.filter(CustomerID=customer_id).only(
+        'OrderID', 'OrderDate', 'TotalAmount', 'Status'
+    )
+
+    paginator = None
+    if 'cursor' in request.query_params or 'page_size' in request.query_params:
+        paginator = OrderCursorPagination()
+        orders = paginator.paginate_queryset(orders, request)
+    else:
+        orders = list(orders.order_by(OrderCursorPagination.ordering)[:OrderCursorPagination.max_page_size])
+
+    # One grouped COUNT for every order on the page
+    counts = item_counts(order.OrderID for order in orders)
+
+    orders_data = [
+        {
             'order_id': order.OrderID,
             'order_date': order.OrderDate,
             'total_amount': order.TotalAmount,
             'status': order.Status,
-            'total_items': total_items
-        })
+            'total_items': counts.get(order.OrderID, 0)
+        }
+        for order in orders
+    ]
     
     serializer = OrderListSerializer(orders_data, many=True)
+    if paginator is not None:
+        return paginator.get_paginated_response(serializer.data)
     return Response(serializer.data)
 
 
@@ -169,14 +140,13 @@ def get_order(request, order_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get order details
-    details = OrderDetail.objects.filter(OrderID=order.OrderID)
+    # Get order details; titles for every line come from one bulk lookup
+    details = list(OrderDetail.objects.filter(OrderID=order.OrderID).order_by('OrderDetailID'))
+    titles = book_titles(detail.BookID for detail in details)
     order_items = []
     
     for detail in details:
-        # Use values() to get only Title field and avoid missing columns
-        book_data = Book.objects.filter(BookID=detail.BookID).values('Title').first()
-        book_title = book_data['Title'] if book_data else f"Book ID {detail.BookID}"
+        book_title = titles.get(detail.BookID, f"Book ID {detail.BookID}")
         
         order_items.append({
             'order_detail_id': detail.OrderDetailID,
@@ -229,6 +199,7 @@ def cancel_order(request, order_id):
     
     order.Status = 'cancelled'
     order.save()
+    reservations.release(order.OrderID)
     
     return Response({"message": "Order cancelled successfully"})
 
@@ -242,25 +213,15 @@ def cancel_order(request, order_id):
 def create_order_from_cart(request):
     """Create order from current cart using cart service (Orders table with status='cart')"""
     try:
-        from apps.cart.services.cart_service import get_or_create_cart_order
-        from django.db import transaction
-        
-        # Get cart order (status='cart')
-        cart_order = get_or_create_cart_order(request)
-        cart_items = OrderDetail.objects.filter(OrderID=cart_order)
-        
-        if not cart_items.exists():
+        # Change status from 'cart' to 'confirmed', taking stock for every line
+        try:
+            cart_order = checkout_cart(request.user.id)
+        except (EmptyCart, BookNotFound, OutOfStock) as e:
             return Response({
                 'status': 'error',
-                'message': 'Cart is empty'
+                'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        with transaction.atomic():
-            # Simply change status from 'cart' to 'confirmed'
-            cart_order.Status = 'confirmed'
-            cart_order.OrderDate = timezone.now()
-            cart_order.save()
-        
         return Response({
             'status': 'success',
             'message': 'Order created successfully from cart',
@@ -273,3 +234,19 @@ def create_order_from_cart(request):
             'status': 'error',
             'message': f'Failed to create order from cart: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@extend_schema(tags=["orders"])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def stock_availability(request):
+    """Available stock (stock minus active checkout holds): GET ?book_ids=1,2,3"""
+    try:
+        book_ids = [int(b) for b in request.query_params.get('book_ids', '').split(',') if b.strip()]
+    except ValueError:
+        return Response({"error": "book_ids must be a comma-separated list of integers"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not book_ids or len(book_ids) > 100:
+        return Response({"error": "Provide between 1 and 100 book_ids"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({"stock": reservations.available_stock(book_ids)})
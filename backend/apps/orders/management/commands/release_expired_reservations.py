@@ -0,0 +1,45 @@
+"""
+Management command to release expired stock reservations
+Usage: python manage.py release_expired_reservations [--batch-size 1000] [--loop --interval 30]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.services import reservations
+
+
+class Command(BaseCommand):
+    help = 'Release stock holds whose reservation TTL has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Reservations released per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a background sweeper',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='Seconds between sweeps with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            released = reservations.release_expired(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - start
+            if released or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ Released {released} expired reservations in {elapsed:.2f}s')
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
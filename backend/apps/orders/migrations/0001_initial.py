@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('ReservationID', models.BigAutoField(db_column='ReservationID', primary_key=True, serialize=False)),
+                ('BookID', models.IntegerField(db_column='BookID')),
+                ('OrderID', models.IntegerField(blank=True, db_column='OrderID', db_index=True, null=True)),
+                ('CustomerID', models.IntegerField(blank=True, db_column='CustomerID', null=True)),
+                ('Quantity', models.IntegerField(db_column='Quantity')),
+                ('Status', models.CharField(choices=[('held', 'Held'), ('committed', 'Committed'), ('released', 'Released')], db_column='Status', default='held', max_length=20)),
+                ('ExpiresAt', models.DateTimeField(db_column='ExpiresAt')),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True, db_column='CreatedAt')),
+            ],
+            options={
+                'db_table': 'stock_reservation',
+                'indexes': [models.Index(fields=['BookID', 'Status'], name='stockres_book_status_idx'), models.Index(fields=['Status', 'ExpiresAt'], name='stockres_status_expiry_idx')],
+            },
+        ),
+    ]
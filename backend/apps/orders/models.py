@@ -23,3 +23,28 @@ class OrderDetail(models.Model):
     class Meta:
         managed = False
         db_table = 'orderdetail'
+
+
+class StockReservation(models.Model):
+    """Time-boxed hold on book stock taken at checkout, committed when the order is paid"""
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [(HELD, 'Held'), (COMMITTED, 'Committed'), (RELEASED, 'Released')]
+
+    ReservationID = models.BigAutoField(primary_key=True, db_column='ReservationID')
+    BookID = models.IntegerField(db_column='BookID')
+    OrderID = models.IntegerField(null=True, blank=True, db_column='OrderID', db_index=True)
+    CustomerID = models.IntegerField(null=True, blank=True, db_column='CustomerID')
+    Quantity = models.IntegerField(db_column='Quantity')
+    Status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD, db_column='Status')
+    ExpiresAt = models.DateTimeField(db_column='ExpiresAt')
+    CreatedAt = models.DateTimeField(auto_now_add=True, db_column='CreatedAt')
+
+    class Meta:
+        db_table = 'stock_reservation'
+        indexes = [
+            # Active holds per book (availability) and expired holds (sweeper)
+            models.Index(fields=['BookID', 'Status'], name='stockres_book_status_idx'),
+            models.Index(fields=['Status', 'ExpiresAt'], name='stockres_status_expiry_idx'),
+        ]
@@ -1,64 +1,56 @@
-from django.db import transaction
-from django.db.models import Sum, F
-from apps.orders.models import Order, OrderDetail
+"""
+Order-backed cart helpers used by the orders/cart/ endpoints.
+
+These are thin wrappers over the shared cart engine (apps.cart.services.cart_engine)
+so both cart APIs read and write the same Status='cart' order and cache.
+"""
+from apps.orders.models import Order
 from apps.catalog.models import Book
+from apps.cart.services import cart_mutations, price_table
+from apps.cart.services.cart_engine import cart_engine
 
 
 def get_or_create_open_order(customer_id: int) -> Order:
-    """Return existing Pending order for customer or create one."""
-    order = (
-        Order.objects.filter(CustomerID=customer_id, Status="Pending")
-        .order_by("OrderID")
-        .first()
-    )
-    if order:
-        return order
-    return Order.objects.create(CustomerID=customer_id, TotalAmount=0, Status="Pending")
+    """Return the customer's cart order or create one."""
+    return cart_engine.for_customer(customer_id, create=True)
+
+
+def get_open_order(customer_id: int):
+    return cart_engine.for_customer(customer_id)
 
 
-@transaction.atomic
 def add_item(order: Order, book_id: int, qty: int = 1) -> Order:
-    # product lookup from book table
-    product = Book.objects.get(BookID=book_id)
-    # use select_for_update to prevent races on the same order details row
-    qs = OrderDetail.objects.select_for_update()
-    od, created = qs.get_or_create(
-        OrderID=order.OrderID,
-        BookID=book_id,
-        defaults={"Quantity": 0, "Price": product.Price},
-    )
+    entry = price_table.get_prices([book_id]).get(int(book_id))
+    if entry is None:
+        raise Book.DoesNotExist(f"Books not found: [{book_id}]")
+    cart_engine.add(order, int(book_id), int(qty), entry["price"])
+    return order
 
-    # always set current price
-    od.Price = product.Price
-    od.Quantity = max(0, int(od.Quantity) + int(qty))
-    if od.Quantity == 0:
-        od.delete()
-    else:
-        od.save(update_fields=["Price", "Quantity"])
 
-    recalc_order_total(order)
+def add_items(order: Order, items) -> Order:
+    """
+    Add many (book_id, qty) pairs at once: one cached price lookup, then one batch of
+    bulk insert/update and a single incremental total update.
+    Raises Book.DoesNotExist if any book is unknown (nothing is written).
+    """
+    items = [(int(book_id), int(qty)) for book_id, qty in items]
+    wanted = {book_id for book_id, _ in items}
+
+    prices = {book_id: entry["price"] for book_id, entry in price_table.get_prices(wanted).items()}
+    missing = sorted(wanted - prices.keys())
+    if missing:
+        raise Book.DoesNotExist(f"Books not found: {missing}")
+
+    cart_engine.apply(order, [(book_id, "add", qty) for book_id, qty in items], prices)
     return order
 
 
 def recalc_order_total(order: Order):
-    total = (
-        OrderDetail.objects.filter(OrderID=order.OrderID)
-        .aggregate(s=Sum(F("Quantity") * F("Price")))
-        .get("s")
-        or 0
-    )
-    Order.objects.filter(pk=order.OrderID).update(TotalAmount=total)
-    order.TotalAmount = total
+    total = cart_mutations.recalculate_total(order)
+    cart_engine.refresh(order)
     return total
 
 
-@transaction.atomic
 def update_qty(order: Order, book_id: int, qty: int):
-    if int(qty) <= 0:
-        OrderDetail.objects.filter(OrderID=order.OrderID, BookID=book_id).delete()
-    else:
-        od = OrderDetail.objects.get(OrderID=order.OrderID, BookID=book_id)
-        od.Quantity = int(qty)
-        od.save(update_fields=["Quantity"])
-    recalc_order_total(order)
-    return order
+    """Set a line quantity (0 removes it); returns None if the book is not in the cart"""
+    return cart_engine.set_quantity(order, book_id, int(qty))
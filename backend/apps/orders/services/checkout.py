@@ -0,0 +1,136 @@
+"""
+Checkout pipeline: turn a cart (or an explicit item list) into a confirmed
+order in a single transaction.
+
+The stock rows of every ordered book are locked with one SELECT ... FOR UPDATE
+ordered by BookID, so concurrent checkouts always acquire locks in the same
+order and cannot deadlock on each other, and only the books being bought are
+locked. Stock is held with time-boxed reservations (see reservations.py) that
+payment commits, details are written with bulk_create and the order total is
+computed in SQL. Lock timeouts and deadlocks roll the transaction back and are
+retried with jittered backoff.
+"""
+import functools
+import logging
+import random
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.cart.services.cart_engine import cart_engine, CART_STATUS
+from apps.orders.models import Order, OrderDetail
+from apps.orders.services import reservations
+from apps.orders.services.reservations import BookNotFound, OutOfStock  # noqa: F401 (re-exported)
+
+logger = logging.getLogger(__name__)
+
+# Postgres deadlock / lock_timeout / serialization failure, MySQL lock wait timeout / deadlock
+LOCK_CONTENTION_CODES = {'40P01', '55P03', '40001', 1205, 1213}
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    def __init__(self):
+        super().__init__("Cart is empty")
+
+
+def _is_lock_contention(exc: OperationalError) -> bool:
+    cause = exc.__cause__ or exc
+    code = getattr(cause, 'pgcode', None) or (cause.args[0] if cause.args else None)
+    if code in LOCK_CONTENTION_CODES:
+        return True
+    return 'database is locked' in str(exc).lower()  # SQLite (development)
+
+
+def retry_on_lock_contention(func):
+    """Re-run a whole transactional unit when it lost a lock race"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, 'CHECKOUT_LOCK_RETRIES', 3)
+        base_delay = getattr(settings, 'CHECKOUT_RETRY_BASE_DELAY', 0.05)
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                # Inside an outer transaction the rollback is not ours to retry
+                if attempt >= retries or connection.in_atomic_block or not _is_lock_contention(e):
+                    raise
+                attempt += 1
+                delay = base_delay * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.warning(f"Checkout lock contention, retry {attempt}/{retries} in {delay:.3f}s: {e}")
+                time.sleep(delay)
+    return wrapper
+
+
+def _quantities(lines: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    quantities = {}
+    for book_id, quantity in lines:
+        quantities[book_id] = quantities.get(book_id, 0) + (quantity or 0)
+    return quantities
+
+
+def _order_total(order_id) -> Decimal:
+    return OrderDetail.objects.filter(OrderID=order_id).aggregate(
+        total=Sum(F('Price') * F('Quantity'))
+    )['total'] or Decimal('0.00')
+
+
+@retry_on_lock_contention
+def place_order(customer_id: int, items) -> Order:
+    """Create a confirmed order from explicit items ({book_id, quantity[, price]})"""
+    with transaction.atomic():
+        order = Order.objects.create(
+            CustomerID=customer_id, TotalAmount=0, Status='confirmed', OrderDate=timezone.now()
+        )
+        books = reservations.hold(
+            order.OrderID, customer_id,
+            _quantities((item['book_id'], item['quantity']) for item in items)
+        )
+        OrderDetail.objects.bulk_create([
+            OrderDetail(
+                OrderID=order.OrderID,
+                BookID=item['book_id'],
+                Quantity=item['quantity'],
+                Price=item.get('price', books[item['book_id']]['Price']),
+            )
+            for item in items
+        ])
+        order.TotalAmount = _order_total(order.OrderID)
+        Order.objects.filter(OrderID=order.OrderID).update(TotalAmount=order.TotalAmount)
+    return order
+
+
+@retry_on_lock_contention
+def checkout_cart(customer_id: int) -> Order:
+    """Confirm the customer's cart order, holding stock for its lines"""
+    with transaction.atomic():
+        # Locking the cart row first also stops two tabs checking out the same cart
+        order = (
+            Order.objects.select_for_update()
+            .filter(CustomerID=customer_id, Status=CART_STATUS)
+            .order_by('OrderID')
+            .first()
+        )
+        if order is None:
+            raise EmptyCart()
+        lines = list(OrderDetail.objects.filter(OrderID=order.OrderID).values_list('BookID', 'Quantity'))
+        if not lines:
+            raise EmptyCart()
+
+        reservations.hold(order.OrderID, customer_id, _quantities(lines))
+        order.Status = 'confirmed'
+        order.OrderDate = timezone.now()
+        order.TotalAmount = _order_total(order.OrderID)
+        order.save(update_fields=['Status', 'OrderDate', 'TotalAmount'])
+
+    cart_engine.forget(order)
+    return order
@@ -0,0 +1,53 @@
+"""
+Read helpers for order history.
+Every helper runs a single query regardless of how many orders/lines it covers.
+"""
+from decimal import Decimal
+from typing import Dict, Iterable
+
+from django.db.models import Count, Max, Sum
+
+from apps.catalog.models import Book
+from apps.orders.models import Order, OrderDetail
+
+
+def item_counts(order_ids: Iterable[int]) -> Dict[int, int]:
+    """Number of order lines per order, from one grouped query"""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return {}
+    rows = (
+        OrderDetail.objects.filter(OrderID__in=order_ids)
+        .values('OrderID')
+        .annotate(n=Count('OrderDetailID'))
+        .values_list('OrderID', 'n')
+    )
+    return dict(rows)
+
+
+def book_titles(book_ids: Iterable[int]) -> Dict[int, str]:
+    """BookID -> Title for many books; values_list avoids selecting missing columns"""
+    book_ids = set(book_ids)
+    if not book_ids:
+        return {}
+    return dict(Book.objects.filter(BookID__in=book_ids).values_list('BookID', 'Title'))
+
+
+def order_summary(customer_id: int) -> dict:
+    """Per-status order counts and totals for the account page"""
+    rows = (
+        Order.objects.filter(CustomerID=customer_id)
+        .values('Status')
+        .annotate(n=Count('OrderID'), amount=Sum('TotalAmount'), last=Max('OrderDate'))
+        .order_by()
+    )
+    summary = {'total_orders': 0, 'last_order_date': None, 'by_status': {}}
+    for row in rows:
+        summary['total_orders'] += row['n']
+        summary['by_status'][row['Status']] = {
+            'count': row['n'],
+            'total_amount': row['amount'] or Decimal('0.00'),
+        }
+        if row['last'] and (summary['last_order_date'] is None or row['last'] > summary['last_order_date']):
+            summary['last_order_date'] = row['last']
+    return summary
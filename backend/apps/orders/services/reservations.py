@@ -0,0 +1,297 @@
+"""
+Time-boxed stock reservations.
+
+Checkout places a hold (StockReservation, status 'held') for every ordered book
+instead of decrementing Book.Stock; paying the order commits the holds, which
+is when Book.Stock goes down. Holds that are neither paid nor cancelled expire
+after STOCK_RESERVATION_TTL seconds and are released in bulk by the
+`release_expired_reservations` command. A payment that arrives after its hold
+lapsed only sells the stock if it is still available; otherwise the order is
+flagged 'backordered'.
+
+Available stock (Stock minus active holds) is kept per book as a cache counter
+adjusted on hold/release/commit, so reads never SUM over reservations; a
+missing counter is recomputed for all missing books with one grouped query.
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, When
+from django.utils import timezone
+
+from apps.catalog.models import Book
+from apps.catalog.signals import books_updated
+from apps.orders.models import Order, StockReservation
+
+logger = logging.getLogger(__name__)
+
+HELD = StockReservation.HELD
+COMMITTED = StockReservation.COMMITTED
+RELEASED = StockReservation.RELEASED
+
+# Order.Status of a paid order whose lapsed hold could not be sold again
+BACKORDERED = 'backordered'
+
+
+class BookNotFound(Exception):
+    def __init__(self, book_id):
+        self.book_id = book_id
+        super().__init__(f"Book with ID {book_id} not found")
+
+
+class OutOfStock(Exception):
+    def __init__(self, book_id, title, available):
+        self.book_id = book_id
+        self.available = available
+        super().__init__(f"Not enough stock for {title}. Available: {available}")
+
+
+def _cache():
+    return caches[getattr(settings, 'STOCK_CACHE_ALIAS', 'default')]
+
+
+def _counter_key(book_id) -> str:
+    return f'stock:available:{book_id}'
+
+
+def _adjust_counters(deltas: Dict[int, int]):
+    """Shift cached counters; missing ones are recomputed on the next read"""
+    cache = _cache()
+    for book_id, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(_counter_key(book_id), delta)
+        except ValueError:
+            pass
+
+
+def forget_counters(book_ids: Iterable[int]):
+    _cache().delete_many([_counter_key(book_id) for book_id in book_ids])
+
+
+def _active_holds(book_ids) -> Dict[int, int]:
+    rows = (
+        StockReservation.objects.filter(
+            BookID__in=book_ids, Status=HELD, ExpiresAt__gt=timezone.now()
+        )
+        .values('BookID')
+        .annotate(held=Sum('Quantity'))
+        .values_list('BookID', 'held')
+    )
+    return dict(rows)
+
+
+def available_stock(book_ids: Iterable[int]) -> Dict[int, int]:
+    """Stock minus active holds per existing book, served from the cached counters"""
+    book_ids = {int(book_id) for book_id in book_ids}
+    if not book_ids:
+        return {}
+    cache = _cache()
+    cached = cache.get_many([_counter_key(book_id) for book_id in book_ids])
+    available = {
+        book_id: cached[_counter_key(book_id)]
+        for book_id in book_ids if _counter_key(book_id) in cached
+    }
+
+    missing = book_ids - available.keys()
+    if missing:
+        stock = dict(Book.objects.filter(BookID__in=missing).values_list('BookID', 'Stock'))
+        held = _active_holds(stock.keys())
+        computed = {
+            book_id: max((quantity or 0) - held.get(book_id, 0), 0)
+            for book_id, quantity in stock.items()
+        }
+        if computed:
+            cache.set_many(
+                {_counter_key(book_id): value for book_id, value in computed.items()},
+                getattr(settings, 'STOCK_COUNTER_TIMEOUT', 300),
+            )
+        available.update(computed)
+    return available
+
+
+def hold(order_id: int, customer_id, quantities: Dict[int, int]) -> Dict[int, dict]:
+    """
+    Reserve stock for an order (call inside a transaction).
+
+    The book rows are locked with one SELECT ... FOR UPDATE ordered by BookID so
+    concurrent checkouts take locks in the same order; availability is checked
+    against Stock minus active holds for just these books.
+    Returns the locked book rows keyed by BookID.
+    """
+    books = {
+        row['BookID']: row
+        for row in Book.objects.select_for_update()
+        .filter(BookID__in=quantities)
+        .order_by('BookID')
+        .values('BookID', 'Title', 'Price', 'Stock')
+    }
+    held = _active_holds(books.keys())
+    for book_id, quantity in sorted(quantities.items()):
+        book = books.get(book_id)
+        if book is None:
+            raise BookNotFound(book_id)
+        available = (book['Stock'] or 0) - held.get(book_id, 0)
+        if available < quantity:
+            raise OutOfStock(book_id, book['Title'], max(available, 0))
+
+    expires_at = timezone.now() + timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 900))
+    StockReservation.objects.bulk_create([
+        StockReservation(
+            BookID=book_id, OrderID=order_id, CustomerID=customer_id,
+            Quantity=quantity, Status=HELD, ExpiresAt=expires_at
+        )
+        for book_id, quantity in quantities.items()
+    ])
+    deltas = {book_id: -quantity for book_id, quantity in quantities.items()}
+    transaction.on_commit(lambda: _adjust_counters(deltas))
+    return books
+
+
+def commit(order_id: int) -> int:
+    """
+    Turn an order's holds into sold stock (payment captured).
+    Idempotent: already committed reservations are skipped.
+    """
+    return commit_orders([order_id])
+
+
+@transaction.atomic
+def commit_orders(order_ids: Iterable[int]) -> int:
+    """
+    commit() for many orders with one lock query and one stock UPDATE.
+
+    Only live holds are sold as they are. Holds that expired or were released
+    before the payment arrived are re-checked against current availability
+    under the book row locks: an order whose stock is still there is sold,
+    one whose stock was taken meanwhile is flagged BACKORDERED and sells nothing.
+    Returns the number of committed reservations.
+    """
+    now = timezone.now()
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(OrderID__in=list(order_ids), Status__in=[HELD, RELEASED])
+        .order_by('BookID')
+        .values('ReservationID', 'OrderID', 'BookID', 'Quantity', 'Status', 'ExpiresAt')
+    )
+    if not rows:
+        return 0
+
+    sold, committed, late = {}, [], {}
+    for row in rows:
+        if row['Status'] == HELD and row['ExpiresAt'] > now:
+            sold[row['BookID']] = sold.get(row['BookID'], 0) + row['Quantity']
+            committed.append(row['ReservationID'])
+        else:
+            late.setdefault(row['OrderID'], []).append(row)
+
+    late_books = sorted({row['BookID'] for order_rows in late.values() for row in order_rows})
+    if late:
+        # Live holds of other orders (and of this batch) are still counted, so
+        # a late payment never takes stock somebody else is holding
+        stock = dict(
+            Book.objects.select_for_update()
+            .filter(BookID__in=late_books)
+            .order_by('BookID')
+            .values_list('BookID', 'Stock')
+        )
+        held = _active_holds(late_books)
+        available = {book_id: (stock.get(book_id) or 0) - held.get(book_id, 0) for book_id in late_books}
+
+        short = []
+        for order_id, order_rows in sorted(late.items()):
+            wanted = {}
+            for row in order_rows:
+                wanted[row['BookID']] = wanted.get(row['BookID'], 0) + row['Quantity']
+            if any(available[book_id] < quantity for book_id, quantity in wanted.items()):
+                short.append(order_id)
+                continue
+            for book_id, quantity in wanted.items():
+                available[book_id] -= quantity
+                sold[book_id] = sold.get(book_id, 0) + quantity
+            committed.extend(row['ReservationID'] for row in order_rows)
+
+        rehold = sorted(late.keys() - set(short))
+        if rehold:
+            logger.warning(f"Orders {rehold} paid after their stock hold lapsed; stock was still available")
+        if short:
+            logger.error(f"Orders {short} paid after their stock hold lapsed and the stock is gone, flagged {BACKORDERED}")
+            Order.objects.filter(OrderID__in=short).update(Status=BACKORDERED)
+            StockReservation.objects.filter(
+                ReservationID__in=[row['ReservationID'] for order_id in short for row in late[order_id]],
+                Status=HELD,
+            ).update(Status=RELEASED)
+
+    if sold:
+        Book.objects.filter(BookID__in=sold).update(
+            Stock=Case(
+                *[When(BookID=book_id, then=F('Stock') - quantity) for book_id, quantity in sold.items()],
+                default=F('Stock'),
+                output_field=IntegerField(),
+            )
+        )
+        StockReservation.objects.filter(ReservationID__in=committed).update(Status=COMMITTED)
+        # A queryset update sends no post_save: refresh the catalog caches explicitly
+        sold_ids = sorted(sold)
+        transaction.on_commit(lambda: books_updated.send(sender=Book, book_ids=sold_ids))
+
+    # Live held units were already subtracted from the counters; lapsed ones are recomputed
+    if late_books:
+        transaction.on_commit(lambda: forget_counters(late_books))
+    return len(committed)
+
+
+def release(order_id: int) -> int:
+    """Give back an order's active holds (payment failed, order cancelled)"""
+    return release_orders([order_id])
+
+
+@transaction.atomic
+def release_orders(order_ids: Iterable[int]) -> int:
+    """release() for many orders at once"""
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(OrderID__in=list(order_ids), Status=HELD)
+        .values_list('ReservationID', 'BookID', 'Quantity')
+    )
+    if not rows:
+        return 0
+    StockReservation.objects.filter(ReservationID__in=[r[0] for r in rows]).update(Status=RELEASED)
+    deltas = {}
+    for _, book_id, quantity in rows:
+        deltas[book_id] = deltas.get(book_id, 0) + quantity
+    transaction.on_commit(lambda: _adjust_counters(deltas))
+    return len(rows)
+
+
+def release_expired(batch_size: int = 1000, now=None) -> int:
+    """
+    Release expired holds in batches of `batch_size` and drop the cached
+    counters of the affected books (they are recomputed on the next read).
+    Returns the number of released reservations.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.filter(Status=HELD, ExpiresAt__lte=now)
+                .order_by('ReservationID')
+                .values_list('ReservationID', 'BookID')[:batch_size]
+            )
+            if not batch:
+                break
+            # Re-check the status so a concurrent commit is never undone
+            count = StockReservation.objects.filter(
+                ReservationID__in=[r[0] for r in batch], Status=HELD
+            ).update(Status=RELEASED)
+        released += count
+        forget_counters({book_id for _, book_id in batch})
+        if len(batch) < batch_size:
+            break
+    return released
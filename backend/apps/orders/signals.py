@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.catalog.models import Book
+from .services import reservations
+
+
+@receiver([post_save, post_delete], sender=Book)
+def drop_stock_counter(sender, instance, **kwargs):
+    """Restocks and edits change Book.Stock; recompute the cached available counter"""
+    reservations.forget_counters([instance.BookID])
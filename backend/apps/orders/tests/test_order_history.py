@@ -0,0 +1,28 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.orders.api.v1.pagination import OrderCursorPagination
+from apps.orders.models import Order
+from apps.users.auth import CustomerPrincipal
+
+
+@pytest.mark.django_db
+def test_unpaginated_history_uses_the_cursor_ordering_and_is_limited():
+    now = timezone.now()
+    # Ids and dates disagree (e.g. an imported order), so the ordering key shows
+    ids = [
+        Order.objects.create(CustomerID=611, TotalAmount=10, Status='confirmed', OrderDate=now - timedelta(days=days)).OrderID
+        for days in (0, 5, 1)
+    ]
+    client = APIClient()
+    client.force_authenticate(CustomerPrincipal(611))
+
+    with mock.patch.object(OrderCursorPagination, 'max_page_size', 2):
+        plain = client.get('/api/v1/orders/list/')
+    paged = client.get('/api/v1/orders/list/', {'page_size': 2})
+
+    assert plain.status_code == paged.status_code == 200
+    assert [o['order_id'] for o in plain.data] == [ids[2], ids[1]]
+    assert [o['order_id'] for o in paged.data['results']] == [ids[2], ids[1]]
@@ -0,0 +1,62 @@
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.catalog.models import Book
+from apps.orders.models import Order, StockReservation
+from apps.orders.services import reservations
+
+
+def _order(customer_id):
+    return Order.objects.create(CustomerID=customer_id, TotalAmount=0, Status='confirmed', OrderDate=timezone.now())
+
+
+@pytest.mark.django_db
+def test_late_payment_does_not_sell_stock_held_by_another_order():
+    Book.objects.create(BookID=41, Title='Book 41', Price=10, Stock=2)
+    late, other = _order(601), _order(602)
+    reservations.hold(late.OrderID, 601, {41: 2})
+    reservations.release(late.OrderID)
+    reservations.hold(other.OrderID, 602, {41: 2})
+
+    assert reservations.commit(late.OrderID) == 0
+    assert Book.objects.get(BookID=41).Stock == 2
+    assert Order.objects.get(OrderID=late.OrderID).Status == reservations.BACKORDERED
+    assert StockReservation.objects.get(OrderID=late.OrderID).Status == StockReservation.RELEASED
+
+    assert reservations.commit(other.OrderID) == 1
+    assert Book.objects.get(BookID=41).Stock == 0
+
+
+@pytest.mark.django_db
+def test_late_payment_sells_stock_still_available():
+    Book.objects.create(BookID=42, Title='Book 42', Price=10, Stock=5)
+    order = _order(603)
+    reservations.hold(order.OrderID, 603, {42: 2})
+    reservations.release(order.OrderID)
+
+    assert reservations.commit(order.OrderID) == 1
+    assert Book.objects.get(BookID=42).Stock == 3
+    assert Order.objects.get(OrderID=order.OrderID).Status == 'confirmed'
+    assert StockReservation.objects.get(OrderID=order.OrderID).Status == StockReservation.COMMITTED
+    # Committing again is a no-op
+    assert reservations.commit(order.OrderID) == 0
+    assert Book.objects.get(BookID=42).Stock == 3
+
+
+@pytest.mark.django_db
+def test_sale_refreshes_cached_book_detail(django_capture_on_commit_callbacks):
+    Book.objects.create(BookID=43, Title='Book 43', Price=10, Stock=5)
+    order = _order(604)
+    reservations.hold(order.OrderID, 604, {43: 2})
+    client = APIClient()
+    before = client.get('/api/v1/catalog/books/43/')
+    assert before.status_code == 200
+    assert before.data['Stock'] == 5
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservations.commit(order.OrderID)
+
+    after = client.get('/api/v1/catalog/books/43/', HTTP_IF_NONE_MATCH=before['ETag'])
+    assert after.status_code == 200
+    assert after.data['Stock'] == 3
+    assert after['ETag'] != before['ETag']
@@ -77,6 +77,7 @@ class PaymentResponseSerializer(serializers.Serializer):
     # Sandbox-specific fields
     sandbox_mode = serializers.BooleanField(default=True)
     processing_time = serializers.IntegerField(required=False)
+    status_url = serializers.CharField(required=False)
     
     # Card-specific fields
     card_type = serializers.CharField(required=False)
@@ -100,6 +101,8 @@ class PaymentStatusSerializer(serializers.Serializer):
     message = serializers.CharField()
     
     # Additional status info
+    order_id = serializers.IntegerField(required=False, allow_null=True)
+    order_status = serializers.CharField(required=False, allow_null=True)
     processing_time = serializers.IntegerField(required=False)
     error_code = serializers.CharField(required=False)
     decline_code = serializers.CharField(required=False)
@@ -5,14 +5,19 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_spectacular.utils import extend_schema
 from django.utils import timezone
 from django.conf import settings
-import time
+from django.db import transaction
+from django.urls import reverse
 import logging
 from decimal import Decimal
 
+from apps.common.idempotency import idempotent
 from apps.orders.models import Order
+from apps.orders.services import reservations
 from apps.payments.models import Payment
 from apps.payments.sandbox import PaymentSandbox
-from apps.payments.paypal_service import PayPalService
+from apps.payments.paypal_service import get_paypal_service
+from apps.payments import status_reads, webhook_queue
+from apps.payments.processor import payment_processor
 from .serializers import (
     ChargePaymentSerializer, PaymentResponseSerializer, 
     PaymentStatusSerializer, SandboxInfoSerializer, WebhookEventSerializer
@@ -21,6 +26,15 @@ from .serializers import (
 
 logger = logging.getLogger(__name__)
 
+STATUS_MESSAGES = {
+    'pending': 'Payment is being processed',
+    'processing': 'Payment is in progress',
+    'completed': 'Payment completed successfully',
+    'failed': 'Payment failed',
+    'refunded': 'Payment has been refunded',
+    'requires_action': 'Payment requires additional action'
+}
+
 
 # PayPal Integration Views
 @extend_schema(
@@ -30,6 +44,7 @@ logger = logging.getLogger(__name__)
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('payments.paypal_create')
 def create_paypal_order(request):
     """Create PayPal order for payment"""
     customer_id = getattr(request.user, 'id', None)
@@ -45,7 +60,7 @@ def create_paypal_order(request):
         order = Order.objects.get(OrderID=order_id, CustomerID=customer_id)
         
         # Create PayPal order
-        paypal_service = PayPalService()
+        paypal_service = get_paypal_service()
         result = paypal_service.create_order(
             amount=order.TotalAmount,
             currency='USD',
@@ -115,7 +130,7 @@ def capture_paypal_payment(request):
         order = Order.objects.get(OrderID=payment.OrderID, CustomerID=customer_id)
         
         # Capture payment
-        paypal_service = PayPalService()
+        paypal_service = get_paypal_service()
         result = paypal_service.capture_order(paypal_order_id)
         
         if result.get('success'):
@@ -133,11 +148,15 @@ def capture_paypal_payment(request):
             payment.PaypalPayerID = result.get('payer', {}).get('payer_id')
             payment.PaypalPaymentID = capture_info.get('id')
             payment.save()
+            status_reads.forget([(payment.PaymentID, payment.SandboxPaymentID)])
             
             # Update order status
             order.Status = 'paid'
             order.save()
             
+            # Held stock becomes sold stock
+            reservations.commit(order.OrderID)
+            
             return Response({
                 'success': True,
                 'status': 'completed',
@@ -148,6 +167,7 @@ def capture_paypal_payment(request):
             logger.error(f"PayPal capture failed: {result}")
             payment.Status = 'failed'
             payment.save()
+            status_reads.forget([(payment.PaymentID, payment.SandboxPaymentID)])
             
             return Response({
                 'success': False,
@@ -166,59 +186,26 @@ def capture_paypal_payment(request):
 @extend_schema(
     tags=["payments"],
     summary="PayPal webhook handler",
-    description="Handle PayPal webhook events for payment notifications"
+    description="Queue PayPal webhook events (deduplicated by event id) for batch processing"
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])  # PayPal webhooks don't use authentication
 def paypal_webhook(request):
-    """Handle PayPal webhook events"""
+    """Queue a PayPal webhook event and acknowledge it; a worker applies it in batches"""
     try:
-        # Get webhook data
         webhook_data = request.data
         event_type = webhook_data.get('event_type', '')
-        resource = webhook_data.get('resource', {})
-        
-        logger.info(f"PayPal webhook received: {event_type}")
         
-        # Handle different event types
-        if event_type == 'PAYMENT.CAPTURE.COMPLETED':
-            # Payment was successfully captured
-            paypal_order_id = resource.get('supplementary_data', {}).get('related_ids', {}).get('order_id')
-            capture_id = resource.get('id')
-            
-            if paypal_order_id:
-                try:
-                    payment = Payment.objects.get(PaypalOrderID=paypal_order_id)
-                    payment.Status = 'completed'
-                    payment.TransactionID = capture_id
-                    payment.save()
-                    
-                    # Update order status
-                    if payment.OrderID:
-                        try:
-                            order = Order.objects.get(OrderID=payment.OrderID)
-                            order.Status = 'paid'
-                            order.save()
-                        except Order.DoesNotExist:
-                            pass
-                    
-                    logger.info(f"Payment updated via webhook: {payment.PaymentID}")
-                except Payment.DoesNotExist:
-                    logger.warning(f"Payment not found for PayPal order: {paypal_order_id}")
+        if event_type not in webhook_queue.HANDLED_EVENTS:
+            # Acknowledged so PayPal stops redelivering, but nothing is stored
+            logger.info(f"PayPal webhook ignored: {event_type} {webhook_data.get('id')}")
+            return Response({'status': 'ignored'})
         
-        elif event_type == 'PAYMENT.CAPTURE.DENIED':
-            # Payment was denied
-            paypal_order_id = resource.get('supplementary_data', {}).get('related_ids', {}).get('order_id')
-            
-            if paypal_order_id:
-                try:
-                    payment = Payment.objects.get(PaypalOrderID=paypal_order_id)
-                    payment.Status = 'failed'
-                    payment.save()
-                    
-                    logger.info(f"Payment marked as failed via webhook: {payment.PaymentID}")
-                except Payment.DoesNotExist:
-                    logger.warning(f"Payment not found for PayPal order: {paypal_order_id}")
+        if webhook_queue.enqueue(webhook_data):
+            logger.info(f"PayPal webhook queued: {event_type} {webhook_data.get('id')}")
+            webhook_queue.schedule_drain()
+        else:
+            logger.info(f"PayPal webhook redelivered, already queued: {webhook_data.get('id')}")
         
         return Response({'status': 'success'})
         
@@ -233,13 +220,18 @@ def paypal_webhook(request):
 @extend_schema(
     tags=["payments"],
     request=ChargePaymentSerializer,
-    responses={200: PaymentResponseSerializer}
+    responses={202: PaymentResponseSerializer}
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('payments.charge')
 def charge_payment(request):
     """
-    Process payment for an order using sandbox gateway
+    Start a sandbox payment for an order
+    
+    Returns 202 with the payment in 'processing'; a background worker
+    completes it. Poll /payments/{payment_id}/status/ (or receive the
+    PAYMENT_NOTIFY_URL webhook) for the outcome.
     
     Supports multiple payment methods with realistic sandbox behavior:
     - Credit/Debit cards with test card numbers
@@ -263,35 +255,9 @@ def charge_payment(request):
     order_id = data['order_id']
     payment_method = data['payment_method']
     
-    # Verify order exists and belongs to customer
-    try:
-        order = Order.objects.get(OrderID=order_id, CustomerID=customer_id)
-    except Order.DoesNotExist:
-        return Response(
-            {"error": "Order not found"},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    # Check if order is payable
-    if order.Status not in ['pending', 'confirmed']:
-        return Response(
-            {"error": f"Cannot process payment for order with status: {order.Status}"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Check for existing successful payment
-    existing_payment = Payment.objects.filter(
-        OrderID=order_id, 
-        Status__in=['completed', 'processing']
-    ).first()
-    if existing_payment:
-        return Response(
-            {"error": "Payment already processed for this order"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Process payment through sandbox
+    # Gateway arguments, kept in memory for the worker only (card data is never stored)
     sandbox_kwargs = {
+        'card_number': data.get('card_number'),
         'currency': data.get('currency', 'VND'),
         'description': data.get('description', f'Order #{order_id} payment'),
         'customer_id': customer_id,
@@ -312,70 +278,79 @@ def charge_payment(request):
     elif payment_method == 'e_wallet':
         sandbox_kwargs['wallet_phone'] = data.get('wallet_phone')
     
-    # Simulate processing delay if configured
-    if getattr(settings, 'PAYMENT_GATEWAY', {}).get('SIMULATE_DELAYS', False):
-        processing_time = PaymentSandbox.PAYMENT_METHODS.get(payment_method, {}).get('processing_time', (1, 3))
-        delay = min(processing_time) if payment_method == 'cash_on_delivery' else 1
-        if delay > 0:
-            time.sleep(delay)
+    # The order row lock serializes charges of one order, so the duplicate check
+    # and the insert below cannot interleave with another request's
+    with transaction.atomic():
+        # Verify order exists and belongs to customer
+        try:
+            order = Order.objects.select_for_update().get(OrderID=order_id, CustomerID=customer_id)
+        except Order.DoesNotExist:
+            return Response(
+                {"error": "Order not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
     
-    # Process the payment
-    try:
-        payment_result = PaymentSandbox.process_payment(
-            amount=order.TotalAmount,
-            payment_method=payment_method,
-            card_number=data.get('card_number'),
-            **sandbox_kwargs
-        )
-    except Exception as e:
-        return Response(
-            {"error": f"Payment processing failed: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        # Check if order is payable
+        if order.Status not in ['pending', 'confirmed']:
+            return Response(
+                {"error": f"Cannot process payment for order with status: {order.Status}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
     
-    # Create payment record
-    payment = Payment(
-        OrderID=order_id,
-        Amount=order.TotalAmount,
-        PaymentMethod=payment_method,
-        Status=payment_result['status'],
-        TransactionID=payment_result.get('transaction_id', ''),
-        SandboxPaymentID=payment_result.get('payment_id', ''),
-        PaymentDate=payment_result['processed_at']
-    )
-    payment.save()
+        # Check for existing successful payment
+        existing_payment = Payment.objects.filter(
+            OrderID=order_id, 
+            Status__in=['completed', 'processing']
+        ).first()
+        if existing_payment:
+            return Response(
+                {"error": "Payment already processed for this order"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
     
-    # Update order status based on payment result
-    if payment_result.get('success') is True:
-        order.Status = 'confirmed'
-        order.save()
-    elif payment_result.get('success') is False:
-        order.Status = 'payment_failed'
-        order.save()
+        # Seeded sandbox runs derive the payment id (and so its outcome) from the order and request
+        payment_key = (order_id, sandbox_kwargs['description'], payment_method, data.get('card_number') or '')
+        if PaymentSandbox.current_seed() is not None:
+            payment_key += (Payment.objects.filter(OrderID=order_id).count(),)
+    
+        # Record the payment as processing and hand the gateway call to the worker pool
+        payment = Payment.objects.create(
+            OrderID=order_id,
+            Amount=order.TotalAmount,
+            PaymentMethod=payment_method,
+            Status='processing',
+            TransactionID='',
+            SandboxPaymentID=PaymentSandbox.new_payment_id(*payment_key),
+            PaymentDate=timezone.now()
+        )
+        payment_processor.submit(payment.PaymentID, sandbox_kwargs)
     
-    # Prepare response data
     response_data = {
-        'payment_id': payment_result['payment_id'],
+        'payment_id': payment.SandboxPaymentID,
         'order_id': order_id,
         'amount': payment.Amount,
-        'currency': payment_result.get('currency', 'VND'),
+        'currency': data.get('currency', 'VND'),
         'payment_method': payment.PaymentMethod,
         'status': payment.Status,
         'transaction_id': payment.TransactionID,
         'payment_date': payment.PaymentDate,
-        'message': payment_result.get('message', 'Payment processed'),
+        'message': 'Payment is being processed',
         'sandbox_mode': True,
-        'processing_time': payment_result.get('processing_time', 0)
+        'status_url': reverse('payment-status', args=[payment.SandboxPaymentID])
     }
     
-    # Add payment method specific response fields
-    for field in ['card_type', 'card_last4', 'error_code', 'decline_code', 
-                  'paypal_transaction_id', 'bank_reference', 'wallet_transaction_id']:
-        if field in payment_result:
-            response_data[field] = payment_result[field]
+    # Inline processing (PAYMENT_WORKERS=0) has already settled the payment
+    if not payment_processor.max_workers:
+        payment.refresh_from_db()
+        response_data.update({
+            'status': payment.Status,
+            'transaction_id': payment.TransactionID or '',
+            'payment_date': payment.PaymentDate,
+            'message': STATUS_MESSAGES.get(payment.Status, 'Unknown status')
+        })
     
     response_serializer = PaymentResponseSerializer(response_data)
-    return Response(response_serializer.data)
+    return Response(response_serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
 @extend_schema(
@@ -385,45 +360,27 @@ def charge_payment(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_payment_status(request, payment_id):
-    """Get payment status by payment ID"""
+    """Get payment status (with its order status) by sandbox or numeric payment ID"""
     customer_id = getattr(request.user, 'id', None)
     if not customer_id:
         return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
     
-    try:
-        # Try to find by sandbox payment ID first, then by database ID
-        if payment_id.startswith('pay_'):
-            payment = Payment.objects.filter(SandboxPaymentID=payment_id).first()
-        else:
-            # Numeric ID, search by PaymentID
-            payment = Payment.objects.filter(PaymentID=int(payment_id)).first()
-        
-        if not payment:
-            raise Payment.DoesNotExist()
-            
-        # Verify payment belongs to customer's order
-        order = Order.objects.get(OrderID=payment.OrderID, CustomerID=customer_id)
-    except (Payment.DoesNotExist, Order.DoesNotExist):
+    # One query (cached briefly for polling); also checks the order belongs to the customer
+    payment = status_reads.lookup(payment_id, customer_id)
+    if payment is None:
         return Response(
             {"error": "Payment not found"},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    status_messages = {
-        'pending': 'Payment is being processed',
-        'processing': 'Payment is in progress',
-        'completed': 'Payment completed successfully',
-        'failed': 'Payment failed',
-        'refunded': 'Payment has been refunded',
-        'requires_action': 'Payment requires additional action'
-    }
-    
     response_data = {
-        'payment_id': str(payment.PaymentID),
-        'status': payment.Status,
-        'transaction_id': payment.TransactionID or '',
-        'payment_date': payment.PaymentDate,
-        'message': status_messages.get(payment.Status, 'Unknown status')
+        'payment_id': str(payment['PaymentID']),
+        'status': payment['Status'],
+        'transaction_id': payment['TransactionID'] or '',
+        'payment_date': payment['PaymentDate'],
+        'message': STATUS_MESSAGES.get(payment['Status'], 'Unknown status'),
+        'order_id': payment['OrderID'],
+        'order_status': payment['order_status']
     }
     
     serializer = PaymentStatusSerializer(response_data)
@@ -457,21 +414,12 @@ def get_order_payment(request, order_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    status_messages = {
-        'pending': 'Payment is being processed',
-        'processing': 'Payment is in progress',
-        'completed': 'Payment completed successfully',
-        'failed': 'Payment failed',
-        'refunded': 'Payment has been refunded',
-        'requires_action': 'Payment requires additional action'
-    }
-    
     response_data = {
         'payment_id': str(payment.PaymentID),
         'status': payment.Status,
         'transaction_id': payment.TransactionID or '',
         'payment_date': payment.PaymentDate,
-        'message': status_messages.get(payment.Status, 'Unknown status')
+        'message': STATUS_MESSAGES.get(payment.Status, 'Unknown status')
     }
     
     serializer = PaymentStatusSerializer(response_data)
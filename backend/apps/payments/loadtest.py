@@ -0,0 +1,69 @@
+"""
+Helpers shared by the payment load-test commands (paypal_loadtest, sandbox_loadtest).
+
+Views are called in-process through APIRequestFactory, so the numbers cover
+view, database and gateway time without an HTTP front end.
+"""
+import time
+from decimal import Decimal
+from typing import List, Sequence
+
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.orders.models import Order
+from apps.payments.models import Payment
+
+factory = APIRequestFactory()
+
+TABLE_HEADER = f'{"calls":>8}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_row(samples) -> str:
+    """Table row for [(seconds, ok), ...] matching TABLE_HEADER"""
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return (
+        f'{len(samples):>8}{errors:>8}'
+        f'{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}'
+        f'{percentile(latencies, 99):>10.1f}{(latencies[-1] if latencies else 0):>10.1f}'
+    )
+
+
+def create_orders(customer_id: int, amounts: Sequence[Decimal]) -> List[int]:
+    """Bulk-create confirmed orders (one per amount); returns their ids in the same order"""
+    marker = timezone.now()
+    Order.objects.bulk_create(
+        [Order(CustomerID=customer_id, Status='confirmed', TotalAmount=amount, OrderDate=marker)
+         for amount in amounts],
+        batch_size=1000,
+    )
+    # Re-read the ids: not every backend returns them from bulk_create
+    return list(
+        Order.objects.filter(CustomerID=customer_id, OrderDate=marker)
+        .order_by('OrderID').values_list('OrderID', flat=True)
+    )
+
+
+def delete_orders(order_ids: Sequence[int]):
+    Payment.objects.filter(OrderID__in=order_ids).delete()
+    Order.objects.filter(OrderID__in=order_ids).delete()
+
+
+def call_view(view, path: str, data: dict, principal=None):
+    """POST to a function view; returns (seconds, response)"""
+    request = factory.post(path, data, format='json')
+    request.session = {}  # Session authentication runs even for unauthenticated views
+    if principal is not None:
+        force_authenticate(request, user=principal)
+    start = time.perf_counter()
+    response = view(request)
+    return time.perf_counter() - start, response
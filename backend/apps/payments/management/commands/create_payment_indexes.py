@@ -0,0 +1,98 @@
+"""
+Management command to create the indexes payment reads rely on
+Usage: python manage.py create_payment_indexes [--dry-run] [--concurrently]
+
+`payment` is an unmanaged table, so migrations never add indexes to it. The
+plan below lists every index, the queries it serves and why; the command
+creates the ones whose columns are not already the leading columns of an
+existing index, so it is safe to re-run.
+
+  payment_sandbox_id_idx   (SandboxPaymentID)
+      GET /payments/<pay_sandbox_...>/status/ and the status cache refill.
+  payment_paypal_order_idx (PaypalOrderID)
+      capture_paypal_payment, the webhook batch `PaypalOrderID IN (...)`
+      and paypal_loadtest; previously a scan of a 255-char column per call.
+  payment_order_idx        (OrderID)
+      get_order_payment, the duplicate-charge check in charge_payment,
+      seeded sandbox attempt counts and load-test cleanup.
+  payment_open_status_idx  (Status, PaymentID) WHERE Status IN open states
+      reconcile_payments keyset scan; partial on PostgreSQL/SQLite so it
+      only holds the handful of unsettled rows.
+
+--concurrently builds PostgreSQL indexes without blocking writes (each index
+outside a transaction).
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# (table, index name, columns, partial-index condition, purpose)
+INDEX_PLAN = [
+    ('payment', 'payment_sandbox_id_idx', ['SandboxPaymentID'], None,
+     'status lookups by sandbox payment id'),
+    ('payment', 'payment_paypal_order_idx', ['PaypalOrderID'], None,
+     'PayPal capture, webhook batches, reconciliation'),
+    ('payment', 'payment_order_idx', ['OrderID'], None,
+     'order payment lookups and duplicate-charge checks'),
+    ('payment', 'payment_open_status_idx', ['Status', 'PaymentID'], ('Status', ['pending', 'processing']),
+     'reconciliation scan of unsettled payments'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Create the indexes planned for payment lookups on the existing schema'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the SQL without running it')
+        parser.add_argument(
+            '--concurrently', action='store_true',
+            help='PostgreSQL: CREATE INDEX CONCURRENTLY (no write lock)',
+        )
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        created = skipped = 0
+        with connection.cursor() as cursor:
+            tables = set(connection.introspection.table_names(cursor))
+            for table, name, columns, condition, purpose in INDEX_PLAN:
+                if table not in tables:
+                    self.stdout.write(self.style.WARNING(f'⚠️  Table {table} not found, skipping {name}'))
+                    skipped += 1
+                    continue
+                existing = self._covering_index(cursor, table, columns)
+                if existing:
+                    self.stdout.write(f'   {name}: covered by {existing}')
+                    skipped += 1
+                    continue
+
+                concurrently = ' CONCURRENTLY' if options['concurrently'] and connection.vendor == 'postgresql' else ''
+                sql = (
+                    f'CREATE INDEX{concurrently} {quote(name)} ON {quote(table)} '
+                    f'({", ".join(quote(column) for column in columns)})'
+                )
+                if condition and connection.vendor in ('postgresql', 'sqlite'):
+                    column, values = condition
+                    literals = ', '.join("'%s'" % value for value in values)  # constants from INDEX_PLAN
+                    sql += f' WHERE {quote(column)} IN ({literals})'
+
+                if options['dry_run']:
+                    self.stdout.write(f'{sql};  -- {purpose}')
+                    continue
+                cursor.execute(sql)
+                created += 1
+                self.stdout.write(self.style.SUCCESS(f'✅ Created {name} ({purpose})'))
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'✅ {created} indexes created, {skipped} already present'))
+
+    @staticmethod
+    def _covering_index(cursor, table, columns):
+        """Name of an index whose leading columns are `columns`, if any"""
+        wanted = [column.lower() for column in columns]
+        constraints = connection.introspection.get_constraints(cursor, table)
+        for name, info in constraints.items():
+            if not (info.get('index') or info.get('unique') or info.get('primary_key')):
+                continue
+            leading = [column.lower() for column in (info.get('columns') or [])[:len(wanted)]]
+            if leading == wanted:
+                return name
+        return None
@@ -0,0 +1,127 @@
+"""
+Management command to load-test the PayPal checkout flow against the stand-in
+Usage: python manage.py paypal_loadtest [--checkouts 1000] [--concurrency 50]
+                                        [--latency 0.15 --jitter 0.05 --error-rate 0.01]
+
+Each checkout calls create_paypal_order -> capture_paypal_payment ->
+paypal_webhook in-process (views, database and PayPal client, no HTTP
+front end) for its own confirmed order. The PayPal API is the in-process
+stand-in unless --base-url points at another one. Orders and payments created
+for the run are deleted afterwards unless --keep is given.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.payments.api.v1.views import capture_paypal_payment, create_paypal_order, paypal_webhook
+from apps.payments.loadtest import TABLE_HEADER, call_view, create_orders, delete_orders, latency_row
+from apps.payments.paypal_service import PayPalService, get_paypal_service, set_paypal_service
+from apps.payments.paypal_standin import PayPalStandIn, build_capture_event
+from apps.users.auth import CustomerPrincipal
+
+STEPS = ['create', 'capture', 'webhook']
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent PayPal checkouts against a stand-in API and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=1000, help='Number of checkout flows')
+        parser.add_argument('--concurrency', type=int, default=50, help='Flows running at once')
+        parser.add_argument('--customer-id', type=int, default=999999, help='Customer owning the test orders')
+        parser.add_argument('--amount', default='25.00', help='Order total')
+        parser.add_argument('--base-url', default='', help='Use a running stand-in instead of an in-process one')
+        parser.add_argument('--latency', type=float, default=0.0, help='Stand-in mean response delay (s)')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Stand-in delay spread (s)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Stand-in share of 503 answers')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for stand-in injection')
+        parser.add_argument('--keep', action='store_true', help='Keep the orders and payments created')
+
+    def handle(self, *args, **options):
+        standin = None
+        base_url = options['base_url']
+        if not base_url:
+            standin = PayPalStandIn(
+                latency=options['latency'], jitter=options['jitter'],
+                error_rate=options['error_rate'], seed=options['seed'],
+            ).start()
+            base_url = standin.url
+
+        set_paypal_service(PayPalService(
+            client_id='loadtest', client_secret='loadtest', base_url=base_url,
+            pool_size=options['concurrency']
+        ))
+
+        customer_id = options['customer_id']
+        order_ids = create_orders(customer_id, [Decimal(options['amount'])] * options['checkouts'])
+        self.stdout.write(
+            self.style.HTTP_INFO(
+                f'🚀 {len(order_ids)} checkouts, concurrency {options["concurrency"]}, PayPal at {base_url}'
+            )
+        )
+
+        principal = CustomerPrincipal(customer_id)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(lambda oid: self._checkout(principal, oid), order_ids))
+            elapsed = time.perf_counter() - started
+        finally:
+            set_paypal_service(None)
+            if standin is not None:
+                standin.stop()
+            if not options['keep']:
+                delete_orders(order_ids)
+
+        self._report(results, elapsed, standin)
+
+    def _checkout(self, principal, order_id):
+        """One flow; returns {step: (seconds, ok)} for the steps that ran"""
+        timings = {}
+        try:
+            seconds, response = call_view(
+                create_paypal_order, '/api/v1/payments/paypal/create-order/',
+                {'order_id': order_id}, principal
+            )
+            timings['create'] = (seconds, response.status_code == 200)
+            if not timings['create'][1]:
+                return timings
+            paypal_order_id = response.data['paypal_order_id']
+
+            seconds, response = call_view(
+                capture_paypal_payment, '/api/v1/payments/paypal/capture/',
+                {'paypal_order_id': paypal_order_id}, principal
+            )
+            timings['capture'] = (seconds, response.status_code == 200)
+            if not timings['capture'][1]:
+                return timings
+
+            # Outside the timed steps: fetch the captured order to build its webhook event
+            details = get_paypal_service().get_order_details(paypal_order_id)
+            if not details.get('success'):
+                return timings
+            seconds, response = call_view(
+                paypal_webhook, '/api/v1/payments/paypal/webhook/',
+                build_capture_event(details['order_data'])
+            )
+            timings['webhook'] = (seconds, 200 <= response.status_code < 300)
+            return timings
+        finally:
+            close_old_connections()
+
+    def _report(self, results, elapsed, standin):
+        completed = sum(1 for r in results if r.get('webhook', (0, False))[1])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {completed}/{len(results)} checkouts completed in {elapsed:.2f}s '
+                f'({completed / elapsed if elapsed else 0:.1f} checkouts/s)'
+            )
+        )
+        self.stdout.write(f'   {"step":<10}{TABLE_HEADER}')
+        for step in STEPS:
+            self.stdout.write(f'   {step:<10}{latency_row([r[step] for r in results if step in r])}')
+        if standin is not None:
+            self.stdout.write(f'   📊 Stand-in requests: {standin.stats}')
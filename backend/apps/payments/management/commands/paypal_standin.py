@@ -0,0 +1,43 @@
+"""
+Management command to run the local PayPal API stand-in
+Usage: python manage.py paypal_standin [--port 8765] [--latency 0.2 --jitter 0.05] [--error-rate 0.01]
+                                       [--webhook-url http://127.0.0.1:8000/api/v1/payments/paypal/webhook/]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.payments.paypal_standin import PayPalStandIn
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the PayPal OAuth and v2 orders API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0.0, help='Mean response delay in seconds')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- delay spread in seconds')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls answered with 503')
+        parser.add_argument('--token-ttl', type=int, default=32400, help='expires_in of issued tokens')
+        parser.add_argument('--webhook-url', default='', help='POST PAYMENT.CAPTURE.COMPLETED events here')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for latency/error injection')
+
+    def handle(self, *args, **options):
+        standin = PayPalStandIn(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            token_ttl=options['token_ttl'],
+            webhook_url=options['webhook_url'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ PayPal stand-in listening on {standin.url}'))
+        self.stdout.write(f'   Set PAYPAL_BASE_URL={standin.url} (any PAYPAL_CLIENT_ID/SECRET) and restart the API')
+        try:
+            standin.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            standin.stop()
+            self.stdout.write(f'📊 Requests served: {standin.stats}')
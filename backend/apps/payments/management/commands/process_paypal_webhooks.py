@@ -0,0 +1,45 @@
+"""
+Management command to apply queued PayPal webhook events
+Usage: python manage.py process_paypal_webhooks [--batch-size 200] [--loop --interval 2]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments import webhook_queue
+
+
+class Command(BaseCommand):
+    help = 'Apply queued PayPal webhook events to payments and orders in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Events applied per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a background worker',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Seconds between polls with --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.monotonic()
+            processed = webhook_queue.drain(batch_size=options['batch_size'])
+            elapsed = time.monotonic() - start
+            if processed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ Processed {processed} PayPal webhook events in {elapsed:.2f}s')
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+"""
+Management command to delete settled PayPal webhook events
+Usage: python manage.py purge_paypal_webhooks [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.payments.webhook_queue import purge_processed
+
+
+class Command(BaseCommand):
+    help = 'Delete applied, ignored and failed PayPal webhook events past their retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Events deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_processed(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Purged {deleted} settled PayPal webhook events'))
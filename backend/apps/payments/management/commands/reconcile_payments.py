@@ -0,0 +1,92 @@
+"""
+Management command to reconcile payments stuck in pending/processing
+Usage: python manage.py reconcile_payments [--batch-size 500] [--concurrency 8] [--min-age 300]
+                                           [--stale-after 900] [--restart] [--dry-run]
+
+Progress (last reconciled PaymentID) is checkpointed to a file after every
+batch, so an interrupted run resumes where it stopped; a finished pass removes
+the checkpoint.
+"""
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.payments import reconciliation
+
+
+class Command(BaseCommand):
+    help = 'Settle pending/processing payments from PayPal order state, in checkpointed batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Payments per batch')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent PayPal lookups')
+        parser.add_argument(
+            '--min-age', type=int, default=300,
+            help='Skip payments younger than this many seconds (still in checkout)',
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=900,
+            help='Fail sandbox charges still processing after this many seconds',
+        )
+        parser.add_argument(
+            '--checkpoint-file',
+            default=str(Path(settings.BASE_DIR) / '.reconcile_payments.checkpoint'),
+            help='Where progress is recorded',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+        parser.add_argument('--dry-run', action='store_true', help='Report outcomes without writing them')
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['checkpoint_file'])
+        after_id = 0 if options['restart'] else self._read_checkpoint(checkpoint)
+        if after_id:
+            self.stdout.write(f'↪️  Resuming after payment {after_id}')
+
+        totals = Counter()
+        scanned = 0
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='reconcile') as pool:
+            for batch in reconciliation.open_payments(
+                after_id=after_id, min_age=options['min_age'], batch_size=options['batch_size']
+            ):
+                counts = reconciliation.reconcile_batch(
+                    batch, pool, stale_after=options['stale_after'], dry_run=options['dry_run']
+                )
+                totals.update(counts)
+                scanned += len(batch)
+                if not options['dry_run']:
+                    self._write_checkpoint(checkpoint, batch[-1]['PaymentID'])
+                self.stdout.write(
+                    f'   batch up to payment {batch[-1]["PaymentID"]}: '
+                    + ', '.join(f'{status} {count}' for status, count in sorted(counts.items()))
+                )
+
+        if not options['dry_run'] and checkpoint.exists():
+            checkpoint.unlink()
+        elapsed = time.monotonic() - start
+        prefix = '🔍 [dry run] ' if options['dry_run'] else '✅ '
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix}Reconciled {scanned} payments in {elapsed:.2f}s: '
+                f'{totals["completed"]} completed, {totals["failed"]} failed, {totals["unchanged"]} unchanged'
+            )
+        )
+
+    @staticmethod
+    def _read_checkpoint(path: Path) -> int:
+        try:
+            return int(json.loads(path.read_text())['last_payment_id'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    @staticmethod
+    def _write_checkpoint(path: Path, last_payment_id: int):
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'last_payment_id': last_payment_id, 'updated_at': timezone.now().isoformat()}))
+        tmp.replace(path)  # Atomic on POSIX: never leaves a half-written checkpoint
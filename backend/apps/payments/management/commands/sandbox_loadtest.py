@@ -0,0 +1,205 @@
+"""
+Management command to load-test charge_payment with the seeded PaymentSandbox
+Usage: python manage.py sandbox_loadtest [--charges 5000] [--concurrency 100] [--seed 42]
+                                         [--methods credit_card,paypal] [--record scenario.json]
+       python manage.py sandbox_loadtest --replay scenario.json
+
+A scenario is a seeded mix of PAYMENT_METHODS and TEST_CARDS (plus unlisted
+cards, which follow the method's success rate). Each entry gets its own
+confirmed order and is charged through the charge_payment view in-process;
+payment ids (and so outcomes) are keyed by the entry index, not the order id,
+which differs between runs.
+The sandbox runs in deterministic mode, so --record saves the scenario with
+its outcomes and --replay runs the same charges again and reports every
+outcome that differs.
+
+By default payments settle inline (the measured latency is the full charge);
+--async keeps the worker pool, measures the 202 path and then waits for
+settlement. Simulated gateway delays are off unless --simulate-delays.
+"""
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from apps.payments.api.v1.views import charge_payment
+from apps.payments.loadtest import TABLE_HEADER, call_view, create_orders, delete_orders, latency_row
+from apps.payments.models import Payment
+from apps.payments.processor import payment_processor
+from apps.payments.sandbox import PaymentSandbox
+from apps.users.auth import CustomerPrincipal
+
+CARD_METHODS = ['credit_card', 'debit_card']
+# Valid-looking cards outside TEST_CARDS exercise the success-rate path
+UNLISTED_CARDS = ['4012888888881881', '5105105105105100']
+
+
+def build_scenario(seed: int, count: int, methods) -> list:
+    """Deterministic list of charge requests for `seed`"""
+    rng = random.Random(seed)
+    cards = sorted(PaymentSandbox.TEST_CARDS) + UNLISTED_CARDS
+    entries = []
+    for index in range(count):
+        method = rng.choice(methods)
+        entry = {
+            'index': index,
+            'payment_method': method,
+            'amount': str(Decimal(rng.randint(50, 5000)) * 1000),
+            'description': f'Sandbox load test #{seed}-{index}',
+        }
+        if method in CARD_METHODS:
+            entry.update({'card_number': rng.choice(cards), 'card_holder': 'Load Test',
+                          'card_expiry': '12/2030', 'card_cvv': '123'})
+        elif method == 'paypal':
+            entry['paypal_email'] = f'buyer{index}@example.com'
+        elif method == 'bank_transfer':
+            entry['bank_account'] = f'{rng.randint(10 ** 9, 10 ** 10 - 1)}'
+        elif method == 'e_wallet':
+            entry['wallet_phone'] = f'09{rng.randint(10 ** 7, 10 ** 8 - 1)}'
+        entries.append(entry)
+    return entries
+
+
+class Command(BaseCommand):
+    help = 'Drive charge_payment with a seeded sandbox scenario; record or replay it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--charges', type=int, default=1000, help='Number of charges')
+        parser.add_argument('--concurrency', type=int, default=50, help='Charges running at once')
+        parser.add_argument('--seed', type=int, default=42, help='Scenario and sandbox seed')
+        parser.add_argument(
+            '--methods', default=','.join(PaymentSandbox.PAYMENT_METHODS),
+            help='Comma-separated payment methods to mix',
+        )
+        parser.add_argument('--customer-id', type=int, default=999999, help='Customer owning the test orders')
+        parser.add_argument('--record', default='', help='Write the scenario and its outcomes to this file')
+        parser.add_argument('--replay', default='', help='Re-run a recorded scenario and compare outcomes')
+        parser.add_argument('--async', dest='use_async', action='store_true',
+                            help='Use the background worker pool (measures the 202 path)')
+        parser.add_argument('--simulate-delays', action='store_true', help='Keep the sandbox processing delays')
+        parser.add_argument('--timeout', type=float, default=300, help='Max seconds to wait for --async settlement')
+        parser.add_argument('--keep', action='store_true', help='Keep the orders and payments created')
+
+    def handle(self, *args, **options):
+        recorded = None
+        if options['replay']:
+            recorded = json.loads(Path(options['replay']).read_text())
+            seed, entries = recorded['seed'], recorded['entries']
+        else:
+            methods = [m.strip() for m in options['methods'].split(',') if m.strip()]
+            unknown = set(methods) - set(PaymentSandbox.PAYMENT_METHODS)
+            if unknown:
+                raise CommandError(f'Unknown payment methods: {", ".join(sorted(unknown))}')
+            seed = options['seed']
+            entries = build_scenario(seed, options['charges'], methods)
+
+        gateway = getattr(settings, 'PAYMENT_GATEWAY', {})
+        saved = (PaymentSandbox.seed, payment_processor.max_workers, gateway.get('SIMULATE_DELAYS'))
+        PaymentSandbox.configure(seed=seed)
+        if not options['use_async']:
+            payment_processor.max_workers = 0
+        gateway['SIMULATE_DELAYS'] = options['simulate_delays']
+
+        order_ids = create_orders(options['customer_id'], [Decimal(e['amount']) for e in entries])
+        self.stdout.write(
+            self.style.HTTP_INFO(
+                f'🚀 {len(entries)} charges, concurrency {options["concurrency"]}, seed {seed}'
+                f'{", async" if options["use_async"] else ""}'
+            )
+        )
+        principal = CustomerPrincipal(options['customer_id'])
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                timings = list(pool.map(
+                    lambda pair: self._charge(principal, *pair), zip(order_ids, entries)
+                ))
+            elapsed = time.perf_counter() - started
+            settled_in = self._wait_for_settlement(order_ids, options['timeout']) if options['use_async'] else None
+
+            outcomes = self._outcomes(order_ids)
+            self._report(entries, timings, outcomes, elapsed, settled_in)
+            if options['record']:
+                self._record(options['record'], seed, entries, outcomes)
+            if recorded is not None:
+                self._compare(recorded, outcomes)
+        finally:
+            PaymentSandbox.seed, payment_processor.max_workers, gateway['SIMULATE_DELAYS'] = saved
+            if not options['keep']:
+                delete_orders(order_ids)
+
+    @staticmethod
+    def _charge(principal, order_id, entry):
+        payload = {k: v for k, v in entry.items() if k not in ('index', 'amount')}
+        payload['order_id'] = order_id
+        try:
+            with PaymentSandbox.scenario_entry(entry['index']):
+                seconds, response = call_view(charge_payment, '/api/v1/payments/charge/', payload, principal)
+            return seconds, response.status_code == 202
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _wait_for_settlement(order_ids, timeout):
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if not Payment.objects.filter(OrderID__in=order_ids, Status='processing').exists():
+                break
+            time.sleep(0.5)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _outcomes(order_ids):
+        """[status, sandbox payment id] per scenario entry"""
+        by_order = {
+            order_id: [status, payment_id]
+            for order_id, status, payment_id in Payment.objects.filter(OrderID__in=order_ids)
+            .values_list('OrderID', 'Status', 'SandboxPaymentID')
+        }
+        return [by_order.get(order_id, [None, None]) for order_id in order_ids]
+
+    def _report(self, entries, timings, outcomes, elapsed, settled_in):
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {len(entries)} charges in {elapsed:.2f}s ({len(entries) / elapsed if elapsed else 0:.1f}/s)'
+            )
+        )
+        if settled_in is not None:
+            self.stdout.write(f'   ⏱️  Settled {settled_in:.2f}s after the last 202')
+
+        per_method = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        for entry, timing, (status, _) in zip(entries, timings, outcomes):
+            per_method[entry['payment_method']].append(timing)
+            statuses[entry['payment_method']][status or 'missing'] += 1
+        self.stdout.write(f'   {"method":<18}{TABLE_HEADER}{"rate/s":>10}   outcomes')
+        for method in sorted(per_method):
+            samples = per_method[method]
+            summary = ', '.join(f'{status} {count}' for status, count in sorted(statuses[method].items()))
+            self.stdout.write(
+                f'   {method:<18}{latency_row(samples)}{len(samples) / elapsed if elapsed else 0:>10.1f}   {summary}'
+            )
+
+    def _record(self, path, seed, entries, outcomes):
+        Path(path).write_text(json.dumps({'seed': seed, 'entries': entries, 'outcomes': outcomes}, indent=1))
+        self.stdout.write(f'💾 Scenario recorded to {path}')
+
+    def _compare(self, recorded, outcomes):
+        mismatches = [
+            (entry['index'], expected, actual)
+            for entry, expected, actual in zip(recorded['entries'], recorded['outcomes'], outcomes)
+            if expected != actual
+        ]
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'✅ Replay matched all {len(outcomes)} recorded outcomes'))
+            return
+        self.stdout.write(self.style.WARNING(f'❌ {len(mismatches)} outcomes differ from the recording'))
+        for index, expected, actual in mismatches[:20]:
+            self.stdout.write(f'   #{index}: recorded {expected}, got {actual}')
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('PaymentID', models.AutoField(db_column='PaymentID', primary_key=True, serialize=False)),
+                ('OrderID', models.IntegerField(blank=True, db_column='OrderID', null=True)),
+                ('Amount', models.DecimalField(blank=True, db_column='Amount', decimal_places=2, max_digits=10, null=True)),
+                ('PaymentMethod', models.CharField(blank=True, db_column='Method', max_length=50, null=True)),
+                ('Status', models.CharField(db_column='Status', default='pending', max_length=20)),
+                ('TransactionID', models.CharField(blank=True, db_column='TransactionID', max_length=255, null=True)),
+                ('PaypalOrderID', models.CharField(blank=True, db_column='PaypalOrderID', max_length=255, null=True)),
+                ('PaypalPayerID', models.CharField(blank=True, db_column='PaypalPayerID', max_length=255, null=True)),
+                ('PaypalPaymentID', models.CharField(blank=True, db_column='PaypalPaymentID', max_length=255, null=True)),
+                ('SandboxPaymentID', models.CharField(blank=True, db_column='SandboxPaymentID', max_length=255, null=True)),
+                ('PaymentDate', models.DateTimeField(blank=True, db_column='PaymentDate', null=True)),
+            ],
+            options={
+                'db_table': 'payment',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PayPalWebhookEvent',
+            fields=[
+                ('QueueID', models.BigAutoField(db_column='QueueID', primary_key=True, serialize=False)),
+                ('EventID', models.CharField(db_column='EventID', max_length=255, unique=True)),
+                ('EventType', models.CharField(db_column='EventType', max_length=100)),
+                ('PaypalOrderID', models.CharField(blank=True, db_column='PaypalOrderID', max_length=255, null=True)),
+                ('Payload', models.JSONField(db_column='Payload')),
+                ('Status', models.CharField(choices=[('queued', 'Queued'), ('applied', 'Applied'), ('ignored', 'Ignored'), ('failed', 'Failed')], db_column='Status', default='queued', max_length=20)),
+                ('Attempts', models.IntegerField(db_column='Attempts', default=0)),
+                ('LastError', models.TextField(blank=True, db_column='LastError', null=True)),
+                ('ReceivedAt', models.DateTimeField(auto_now_add=True, db_column='ReceivedAt')),
+                ('ProcessedAt', models.DateTimeField(blank=True, db_column='ProcessedAt', null=True)),
+            ],
+            options={
+                'db_table': 'paypal_webhook_event',
+                'indexes': [models.Index(fields=['Status', 'QueueID'], name='ppwebhook_status_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paypalwebhookevent',
+            index=models.Index(fields=['Status', 'ProcessedAt'], name='ppwebhook_status_done_idx'),
+        ),
+    ]
@@ -22,3 +22,32 @@ class Payment(models.Model):
     class Meta:
         managed = False  # Don't create table, assume exists
         db_table = 'payment'
+
+
+class PayPalWebhookEvent(models.Model):
+    """PayPal webhook delivery queued for batch processing, one row per event id"""
+    QUEUED = 'queued'
+    APPLIED = 'applied'
+    IGNORED = 'ignored'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (APPLIED, 'Applied'), (IGNORED, 'Ignored'), (FAILED, 'Failed')]
+
+    QueueID = models.BigAutoField(primary_key=True, db_column='QueueID')
+    EventID = models.CharField(max_length=255, unique=True, db_column='EventID')
+    EventType = models.CharField(max_length=100, db_column='EventType')
+    PaypalOrderID = models.CharField(max_length=255, null=True, blank=True, db_column='PaypalOrderID')
+    Payload = models.JSONField(db_column='Payload')
+    Status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_column='Status')
+    Attempts = models.IntegerField(default=0, db_column='Attempts')
+    LastError = models.TextField(null=True, blank=True, db_column='LastError')
+    ReceivedAt = models.DateTimeField(auto_now_add=True, db_column='ReceivedAt')
+    ProcessedAt = models.DateTimeField(null=True, blank=True, db_column='ProcessedAt')
+
+    class Meta:
+        db_table = 'paypal_webhook_event'
+        indexes = [
+            # Worker scan: queued events in arrival order
+            models.Index(fields=['Status', 'QueueID'], name='ppwebhook_status_queue_idx'),
+            # Retention sweep: settled events by age
+            models.Index(fields=['Status', 'ProcessedAt'], name='ppwebhook_status_done_idx'),
+        ]
@@ -1,89 +1,125 @@
 """
 PayPal REST API integration service
-Handles PayPal payments using official PayPal SDK
+Handles PayPal payments through the PayPal REST API
+
+One client is shared per process (`get_paypal_service()`): it keeps a pooled
+keep-alive `requests.Session` and caches the OAuth token until shortly before
+it expires, so a checkout costs one API call instead of a TLS handshake plus
+an OAuth round-trip.
 """
-import os
-import json
 import logging
+import threading
+import time
 from decimal import Decimal
 from typing import Dict, Optional, Any
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 
 logger = logging.getLogger(__name__)
 
+BASE_URLS = {
+    'sandbox': 'https://api-m.sandbox.paypal.com',
+    'live': 'https://api-m.paypal.com',
+}
+
 
 class PayPalService:
     """PayPal REST API service for handling payments"""
-    
-    def __init__(self):
-        # PayPal configuration from environment
-        self.mode = os.environ.get('PAYPAL_MODE', 'sandbox')  # 'sandbox' or 'live'
-        self.client_id = os.environ.get('PAYPAL_CLIENT_ID')
-        self.client_secret = os.environ.get('PAYPAL_CLIENT_SECRET')
-        
+
+    def __init__(self, client_id: str = None, client_secret: str = None,
+                 mode: str = None, base_url: str = None, pool_size: int = None):
+        paypal_settings = getattr(settings, 'PAYPAL_SETTINGS', {})
+        self.mode = mode or paypal_settings.get('MODE', 'sandbox')  # 'sandbox' or 'live'
+        self.client_id = client_id or paypal_settings.get('CLIENT_ID')
+        self.client_secret = client_secret or paypal_settings.get('CLIENT_SECRET')
+
         if not self.client_id or not self.client_secret:
             raise ValueError("PayPal credentials not configured in environment variables")
-        
-        # API endpoints
-        if self.mode == 'sandbox':
-            self.base_url = 'https://api-m.sandbox.paypal.com'
-        else:
-            self.base_url = 'https://api-m.paypal.com'
-            
+
+        # API endpoints (BASE_URL points the client at a stand-in server)
+        self.base_url = (
+            base_url or paypal_settings.get('BASE_URL') or BASE_URLS.get(self.mode, BASE_URLS['live'])
+        ).rstrip('/')
+
+        # (connect, read) timeouts: fail fast on connect, allow PayPal time to answer
+        self.timeout = (
+            paypal_settings.get('CONNECT_TIMEOUT', 3.05),
+            paypal_settings.get('READ_TIMEOUT', 20),
+        )
+        self.token_refresh_margin = paypal_settings.get('TOKEN_REFRESH_MARGIN', 300)
+
+        pool_size = pool_size or paypal_settings.get('POOL_SIZE', 20)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({'Accept': 'application/json', 'Accept-Language': 'en_US'})
+
         self._access_token = None
-    
-    def _get_access_token(self) -> str:
-        """Get OAuth2 access token from PayPal"""
-        if self._access_token:
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    def _get_access_token(self, force_refresh: bool = False) -> str:
+        """Get OAuth2 access token from PayPal, reusing it until shortly before expiry"""
+        if not force_refresh and self._access_token and time.monotonic() < self._token_expires_at:
             return self._access_token
-            
-        url = f"{self.base_url}/v1/oauth2/token"
-        
-        headers = {
-            'Accept': 'application/json',
-            'Accept-Language': 'en_US',
-        }
-        
-        data = 'grant_type=client_credentials'
-        
+
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited for the lock
+            if not force_refresh and self._access_token and time.monotonic() < self._token_expires_at:
+                return self._access_token
+
+            url = f"{self.base_url}/v1/oauth2/token"
+
+            try:
+                response = self.session.post(
+                    url,
+                    data={'grant_type': 'client_credentials'},
+                    auth=(self.client_id, self.client_secret),
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+
+                token_data = response.json()
+                expires_in = int(token_data.get('expires_in', 0))
+                self._access_token = token_data.get('access_token')
+                self._token_expires_at = time.monotonic() + max(expires_in - self.token_refresh_margin, 0)
+
+                logger.info(f"PayPal access token obtained, expires in {expires_in}s")
+                return self._access_token
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Failed to get PayPal access token: {e}")
+                raise
+
+    def _request(self, method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                 **kwargs) -> requests.Response:
+        """Authorized API call; a 401 (token revoked early) refreshes the token once"""
+        url = f"{self.base_url}{path}"
+        headers = dict(headers or {})
+        for attempt in range(2):
+            headers['Authorization'] = f'Bearer {self._get_access_token(force_refresh=attempt > 0)}'
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            if response.status_code != 401:
+                break
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _error_body(e: requests.exceptions.RequestException) -> Dict[str, Any]:
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                data=data,
-                auth=(self.client_id, self.client_secret),
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            token_data = response.json()
-            self._access_token = token_data.get('access_token')
-            
-            logger.info(f"PayPal access token obtained successfully")
-            return self._access_token
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get PayPal access token: {e}")
-            raise
-    
+            return e.response.json() if e.response is not None else {}
+        except ValueError:
+            return {}
+
     def create_order(self, amount: Decimal, currency: str = 'USD', order_id: str = None) -> Dict[str, Any]:
         """Create PayPal order"""
-        access_token = self._get_access_token()
-        
-        url = f"{self.base_url}/v2/checkout/orders"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {access_token}',
-            'PayPal-Request-Id': f'order-{order_id}' if order_id else None
-        }
-        
-        # Remove None values
-        headers = {k: v for k, v in headers.items() if v is not None}
-        
+        headers = {'Content-Type': 'application/json'}
+        if order_id:
+            headers['PayPal-Request-Id'] = f'order-{order_id}'
+
         payload = {
             "intent": "CAPTURE",
             "purchase_units": [
@@ -104,14 +140,13 @@ class PayPalService:
                 "cancel_url": f"{settings.FRONTEND_URL}/payment/cancel"
             }
         }
-        
+
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
+            response = self._request('POST', '/v2/checkout/orders', headers=headers, json=payload)
+
             order_data = response.json()
             logger.info(f"PayPal order created: {order_data.get('id')}")
-            
+
             return {
                 'success': True,
                 'order_id': order_data.get('id'),
@@ -119,33 +154,27 @@ class PayPalService:
                 'links': order_data.get('links', []),
                 'raw_response': order_data
             }
-            
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to create PayPal order: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'raw_response': getattr(e.response, 'json', lambda: {})()
+                'raw_response': self._error_body(e)
             }
-    
+
     def capture_order(self, paypal_order_id: str) -> Dict[str, Any]:
         """Capture/finalize PayPal order payment"""
-        access_token = self._get_access_token()
-        
-        url = f"{self.base_url}/v2/checkout/orders/{paypal_order_id}/capture"
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {access_token}'
-        }
-        
+        headers = {'Content-Type': 'application/json'}
+
         try:
-            response = requests.post(url, headers=headers, json={}, timeout=30)
-            response.raise_for_status()
-            
+            response = self._request(
+                'POST', f'/v2/checkout/orders/{paypal_order_id}/capture', headers=headers, json={}
+            )
+
             capture_data = response.json()
             logger.info(f"PayPal order captured: {paypal_order_id}")
-            
+
             return {
                 'success': True,
                 'order_id': capture_data.get('id'),
@@ -154,39 +183,51 @@ class PayPalService:
                 'purchase_units': capture_data.get('purchase_units', []),
                 'raw_response': capture_data
             }
-            
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to capture PayPal order {paypal_order_id}: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'raw_response': getattr(e.response, 'json', lambda: {})()
+                'raw_response': self._error_body(e)
             }
-    
+
     def get_order_details(self, paypal_order_id: str) -> Dict[str, Any]:
         """Get PayPal order details"""
-        access_token = self._get_access_token()
-        
-        url = f"{self.base_url}/v2/checkout/orders/{paypal_order_id}"
-        
-        headers = {
-            'Authorization': f'Bearer {access_token}'
-        }
-        
         try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
+            response = self._request('GET', f'/v2/checkout/orders/{paypal_order_id}')
+
             order_data = response.json()
-            
+
             return {
                 'success': True,
                 'order_data': order_data
             }
-            
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to get PayPal order details {paypal_order_id}: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_paypal_service() -> PayPalService:
+    """Process-wide PayPal client (created on first use; raises ValueError if unconfigured)"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PayPalService()
+    return _service
+
+
+def set_paypal_service(service: Optional[PayPalService]):
+    """Replace the process-wide client (load tests, stand-in servers); None rebuilds it lazily"""
+    global _service
+    with _service_lock:
+        _service = service
@@ -0,0 +1,277 @@
+"""
+Local stand-in for the PayPal REST API, for development and load testing.
+
+Implements the calls PayPalService makes:
+
+- POST /v1/oauth2/token (client credentials)
+- POST /v2/checkout/orders (honours PayPal-Request-Id)
+- GET  /v2/checkout/orders/<id>
+- POST /v2/checkout/orders/<id>/capture (orders are treated as approved)
+
+Every response can be delayed (`latency` ± `jitter` seconds) and a share of
+API calls (`error_rate`) fail with PayPal's 503 error body. When `webhook_url`
+is set, each capture is followed by a PAYMENT.CAPTURE.COMPLETED event POSTed
+there. Point the app at it with PAYPAL_BASE_URL=http://127.0.0.1:<port>
+(`manage.py paypal_standin`) or use it in-process (`manage.py paypal_loadtest`).
+"""
+import base64
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ORDER_PATH = re.compile(r'^/v2/checkout/orders/(?P<order_id>[A-Z0-9]+)(?P<capture>/capture)?$')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _paypal_id(length: int = 17) -> str:
+    return uuid.uuid4().hex[:length].upper()
+
+
+def build_capture_event(order: dict) -> dict:
+    """PAYMENT.CAPTURE.COMPLETED webhook body for a captured stand-in order"""
+    capture = order['purchase_units'][0]['payments']['captures'][0]
+    return {
+        'id': f'WH-{_paypal_id(20)}',
+        'event_version': '1.0',
+        'create_time': _now(),
+        'resource_type': 'capture',
+        'event_type': 'PAYMENT.CAPTURE.COMPLETED',
+        'summary': f"Payment completed for {capture['amount']['value']} {capture['amount']['currency_code']}",
+        'resource': {
+            **capture,
+            'supplementary_data': {'related_ids': {'order_id': order['id']}},
+        },
+    }
+
+
+class PayPalStandIn:
+    """In-memory PayPal API served by a threaded HTTP server"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, token_ttl: int = 32400,
+                 webhook_url: str = '', seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.webhook_url = webhook_url
+        self.random = random.Random(seed)
+
+        self.tokens = {}
+        self.orders = {}
+        self.request_ids = {}
+        self.stats = {'token': 0, 'create': 0, 'get': 0, 'capture': 0, 'errors': 0}
+        self.lock = threading.Lock()
+        self._webhooks = ThreadPoolExecutor(max_workers=4, thread_name_prefix='standin-webhook') \
+            if webhook_url else None
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    # -------------------------------------------------------------- lifecycle
+
+    def start(self) -> 'PayPalStandIn':
+        """Serve from a background thread (in-process use)"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='paypal-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._webhooks is not None:
+            self._webhooks.shutdown(wait=True)
+
+    # -------------------------------------------------------------- behaviour
+
+    def _delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _inject_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        return failed
+
+    def issue_token(self) -> dict:
+        token = f'A21AA{uuid.uuid4().hex}'
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.token_ttl
+            self.stats['token'] += 1
+        return {
+            'scope': 'https://uri.paypal.com/services/payments/payment',
+            'access_token': token,
+            'token_type': 'Bearer',
+            'app_id': 'APP-STANDIN',
+            'expires_in': self.token_ttl,
+            'nonce': f'{_now()}{uuid.uuid4().hex[:8]}',
+        }
+
+    def token_valid(self, token: str) -> bool:
+        expires_at = self.tokens.get(token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def create_order(self, payload: dict, request_id: str = None) -> dict:
+        with self.lock:
+            if request_id and request_id in self.request_ids:
+                return self.orders[self.request_ids[request_id]]
+            order_id = _paypal_id()
+            unit = (payload.get('purchase_units') or [{}])[0]
+            order = {
+                'id': order_id,
+                'intent': payload.get('intent', 'CAPTURE'),
+                'status': 'CREATED',
+                'create_time': _now(),
+                'purchase_units': [{
+                    'reference_id': unit.get('reference_id', 'default'),
+                    'amount': unit.get('amount', {'currency_code': 'USD', 'value': '0.00'}),
+                }],
+                'links': [
+                    {'href': f'{self.url}/v2/checkout/orders/{order_id}', 'rel': 'self', 'method': 'GET'},
+                    {'href': f'{self.url}/checkoutnow?token={order_id}', 'rel': 'approve', 'method': 'GET'},
+                    {'href': f'{self.url}/v2/checkout/orders/{order_id}/capture', 'rel': 'capture', 'method': 'POST'},
+                ],
+            }
+            self.orders[order_id] = order
+            if request_id:
+                self.request_ids[request_id] = order_id
+            self.stats['create'] += 1
+        return order
+
+    def capture_order(self, order_id: str):
+        """Returns (http_status, body)"""
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return 404, self._error('RESOURCE_NOT_FOUND', 'The specified resource does not exist.')
+            if order['status'] == 'COMPLETED':
+                return 422, self._error('UNPROCESSABLE_ENTITY', 'ORDER_ALREADY_CAPTURED')
+            unit = order['purchase_units'][0]
+            unit['payments'] = {'captures': [{
+                'id': _paypal_id(),
+                'status': 'COMPLETED',
+                'amount': unit['amount'],
+                'final_capture': True,
+                'create_time': _now(),
+            }]}
+            order.update({
+                'status': 'COMPLETED',
+                'payer': {'payer_id': _paypal_id(13), 'email_address': 'buyer@example.com'},
+            })
+            self.stats['capture'] += 1
+        if self._webhooks is not None:
+            self._webhooks.submit(self._send_webhook, build_capture_event(order))
+        return 201, order
+
+    def _send_webhook(self, event: dict):
+        try:
+            requests.post(self.webhook_url, json=event, timeout=10)
+        except requests.RequestException as e:
+            logger.warning(f"Stand-in webhook delivery failed: {e}")
+
+    @staticmethod
+    def _error(name: str, message: str) -> dict:
+        return {'name': name, 'message': message, 'debug_id': uuid.uuid4().hex[:13]}
+
+    # ---------------------------------------------------------------- HTTP
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                logger.debug(f"PayPal stand-in: {format % args}")
+
+            def _send(self, http_status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(http_status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    return json.loads(raw) if raw and raw[:1] in (b'{', b'[') else {}
+                except ValueError:
+                    return {}
+
+            def _authorized(self) -> bool:
+                auth = self.headers.get('Authorization', '')
+                if auth.startswith('Bearer ') and standin.token_valid(auth[7:]):
+                    return True
+                self._send(401, {'error': 'invalid_token', 'error_description': 'Token signature verification failed'})
+                return False
+
+            def do_POST(self):
+                body = self._body()
+                standin._delay()
+                if self.path == '/v1/oauth2/token':
+                    auth = self.headers.get('Authorization', '')
+                    try:
+                        valid = auth.startswith('Basic ') and b':' in base64.b64decode(auth[6:])
+                    except ValueError:
+                        valid = False
+                    if not valid:
+                        return self._send(401, {'error': 'invalid_client', 'error_description': 'Client Authentication failed'})
+                    return self._send(200, standin.issue_token())
+
+                if not self._authorized():
+                    return
+                if standin._inject_error():
+                    return self._send(503, standin._error('SERVICE_UNAVAILABLE', 'Service Unavailable.'))
+                if self.path == '/v2/checkout/orders':
+                    return self._send(201, standin.create_order(body, self.headers.get('PayPal-Request-Id')))
+                match = ORDER_PATH.match(self.path)
+                if match and match.group('capture'):
+                    return self._send(*standin.capture_order(match.group('order_id')))
+                self._send(404, standin._error('RESOURCE_NOT_FOUND', 'The specified resource does not exist.'))
+
+            def do_GET(self):
+                standin._delay()
+                if not self._authorized():
+                    return
+                if standin._inject_error():
+                    return self._send(503, standin._error('SERVICE_UNAVAILABLE', 'Service Unavailable.'))
+                match = ORDER_PATH.match(self.path)
+                order = standin.orders.get(match.group('order_id')) if match and not match.group('capture') else None
+                if order is None:
+                    return self._send(404, standin._error('RESOURCE_NOT_FOUND', 'The specified resource does not exist.'))
+                with standin.lock:
+                    standin.stats['get'] += 1
+                self._send(200, order)
+
+        return Handler
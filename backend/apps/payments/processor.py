@@ -0,0 +1,164 @@
+"""
+Asynchronous sandbox payment processing.
+
+`charge_payment` stores the Payment as 'processing' and returns 202; the
+gateway call (including the simulated latency of slow cards and bank
+transfers) runs on a bounded thread pool in the web process, so a request
+thread is held for milliseconds instead of seconds. The worker settles the
+Payment and its order, commits or releases the stock holds and, when
+PAYMENT_NOTIFY_URL is set, POSTs a signed `payment.<status>` event to it.
+Clients poll /payments/<payment_id>/status/ or wait for that event.
+
+Jobs live in memory: a Payment left in 'processing' by a restart is settled
+by reconciliation, never charged twice.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.orders.models import Order
+from apps.orders.services import reservations
+from apps.payments import status_reads
+from apps.payments.models import Payment
+from apps.payments.sandbox import PaymentSandbox
+
+logger = logging.getLogger(__name__)
+
+PROCESSING = 'processing'
+
+# Result fields echoed to the client next to the Payment columns
+DETAIL_FIELDS = ['card_type', 'card_last4', 'error_code', 'decline_code',
+                 'paypal_transaction_id', 'bank_reference', 'wallet_transaction_id']
+
+
+def _gateway_settings() -> dict:
+    return getattr(settings, 'PAYMENT_GATEWAY', {})
+
+
+class PaymentProcessor:
+    """Thread pool that settles 'processing' sandbox payments"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers if max_workers is not None else getattr(settings, 'PAYMENT_WORKERS', 8)
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created lazily so management commands and migrations start no threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='payment-worker'
+            )
+        return self._executor
+
+    def submit(self, payment_id: int, gateway_kwargs: dict):
+        """
+        Queue the gateway call once the surrounding transaction commits.
+        With PAYMENT_WORKERS=0 the payment is processed inline (tests, scripts).
+        """
+        if not self.max_workers:
+            transaction.on_commit(lambda: self.process(payment_id, gateway_kwargs))
+            return
+        transaction.on_commit(lambda: self.executor.submit(self._run, payment_id, gateway_kwargs))
+
+    def _run(self, payment_id: int, gateway_kwargs: dict):
+        close_old_connections()
+        try:
+            self.process(payment_id, gateway_kwargs)
+        except Exception as e:
+            logger.error(f"Payment {payment_id} processing error: {e}")
+        finally:
+            close_old_connections()
+
+    def process(self, payment_id: int, gateway_kwargs: dict) -> Optional[dict]:
+        """Run the sandbox charge and settle the Payment; returns the gateway result"""
+        payment = Payment.objects.filter(PaymentID=payment_id, Status=PROCESSING).first()
+        if payment is None:
+            return None  # Already settled (reconciliation or a duplicate job)
+
+        result = PaymentSandbox.process_payment(
+            amount=payment.Amount, payment_method=payment.PaymentMethod,
+            rng=PaymentSandbox.rng(payment.SandboxPaymentID), **gateway_kwargs
+        )
+        self._simulate_latency(result)
+        if result['status'] == PROCESSING:
+            # Slow cards and long bank transfers clear once their delay has passed
+            result.update({'status': 'completed', 'success': True, 'message': 'Payment completed successfully'})
+
+        if not self.settle(payment, result):
+            return None
+        self.notify(payment, result)
+        return result
+
+    @staticmethod
+    def _simulate_latency(result: dict):
+        gateway = _gateway_settings()
+        if not gateway.get('SIMULATE_DELAYS', False):
+            return
+        delay = min(result.get('processing_time') or 0, gateway.get('TIMEOUT_SECONDS', 30))
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def settle(payment: Payment, result: dict) -> bool:
+        """Write the outcome; only the first settle of a 'processing' payment applies"""
+        with transaction.atomic():
+            updated = Payment.objects.filter(PaymentID=payment.PaymentID, Status=PROCESSING).update(
+                Status=result['status'],
+                TransactionID=result.get('transaction_id', '') if result.get('success') else '',
+                PaymentDate=result.get('processed_at') or timezone.now(),
+            )
+            if not updated:
+                return False
+            status_reads.forget([(payment.PaymentID, payment.SandboxPaymentID)])
+
+            if result.get('success') is True:
+                Order.objects.filter(OrderID=payment.OrderID).update(Status='confirmed')
+                reservations.commit(payment.OrderID)
+            elif result.get('success') is False and result['status'] == 'failed':
+                Order.objects.filter(OrderID=payment.OrderID).update(Status='payment_failed')
+                reservations.release(payment.OrderID)
+
+        logger.info(f"Payment {payment.PaymentID} settled: {result['status']}")
+        return True
+
+    @staticmethod
+    def notify(payment: Payment, result: dict):
+        """POST a signed payment.<status> event to PAYMENT_NOTIFY_URL, if configured"""
+        url = getattr(settings, 'PAYMENT_NOTIFY_URL', '')
+        if not url:
+            return
+        event = PaymentSandbox.simulate_webhook(payment.SandboxPaymentID, f"payment.{result['status']}")
+        event['data']['object'].update({
+            'amount': payment.Amount,
+            'currency': result.get('currency', 'VND'),
+            'metadata': {
+                'order_id': payment.OrderID,
+                'message': result.get('message', ''),
+                **{field: result[field] for field in DETAIL_FIELDS if field in result},
+            },
+        })
+        body = json.dumps(event, cls=JSONEncoder)
+        secret = _gateway_settings().get('WEBHOOK_SECRET', '')
+        signature = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+        try:
+            requests.post(
+                url, data=body, timeout=5,
+                headers={'Content-Type': 'application/json', 'X-Sandbox-Signature': f'sha256={signature}'},
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Payment {payment.PaymentID} notification failed: {e}")
+
+
+# Singleton instance
+payment_processor = PaymentProcessor()
@@ -0,0 +1,150 @@
+"""
+Reconciliation of payments left in a non-final state.
+
+PayPal payments still 'pending'/'processing' (missed webhook, capture timeout)
+are looked up with get_order_details on a bounded thread pool sharing the
+process-wide PayPal client, and their outcome is written per batch with bulk
+updates. Sandbox charges stuck in 'processing' (their in-memory job was lost
+with a restart) are failed, since the card data needed to retry them was never
+stored. Driven by `manage.py reconcile_payments`.
+"""
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.orders.services import reservations
+from apps.payments import status_reads
+from apps.payments.models import Payment
+from apps.payments.paypal_service import get_paypal_service
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ['pending', 'processing']
+FIELDS = ['PaymentID', 'OrderID', 'PaypalOrderID', 'SandboxPaymentID', 'Status', 'PaymentDate']
+
+# PayPal order / capture states that settle a payment
+PAYPAL_FAILED = {'VOIDED', 'DECLINED', 'FAILED'}
+
+
+def open_payments(after_id: int = 0, min_age: int = 300, batch_size: int = 500) -> Iterator[List[dict]]:
+    """
+    Yield batches of non-final payments older than `min_age` seconds in
+    PaymentID order, starting after `after_id` (keyset pagination).
+    """
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    while True:
+        batch = list(
+            Payment.objects.filter(PaymentID__gt=after_id, Status__in=OPEN_STATUSES)
+            .filter(Q(PaymentDate__lte=cutoff) | Q(PaymentDate__isnull=True))
+            .order_by('PaymentID')
+            .values(*FIELDS)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1]['PaymentID']
+        if len(batch) < batch_size:
+            return
+
+
+def paypal_outcome(order_data: dict) -> Optional[dict]:
+    """Map a PayPal order to {'status', capture fields}; None while it is still open"""
+    captures = [
+        capture
+        for unit in order_data.get('purchase_units', [])
+        for capture in unit.get('payments', {}).get('captures', [])
+    ]
+    capture = captures[0] if captures else {}
+    capture_status = capture.get('status')
+    if order_data.get('status') == 'COMPLETED' and capture_status in (None, 'COMPLETED'):
+        return {
+            'status': 'completed',
+            'TransactionID': capture.get('id'),
+            'PaypalPaymentID': capture.get('id'),
+            'PaypalPayerID': order_data.get('payer', {}).get('payer_id'),
+        }
+    if order_data.get('status') in PAYPAL_FAILED or capture_status in PAYPAL_FAILED:
+        return {'status': 'failed'}
+    return None  # CREATED / APPROVED / PAYER_ACTION_REQUIRED / capture PENDING
+
+
+def _lookup(paypal_order_id: str) -> dict:
+    try:
+        return get_paypal_service().get_order_details(paypal_order_id)
+    finally:
+        close_old_connections()
+
+
+def fetch_outcomes(payments: List[dict], pool: ThreadPoolExecutor) -> Dict[int, Optional[dict]]:
+    """PayPal outcome per PaymentID; lookups that fail are left out"""
+    paypal = [p for p in payments if p['PaypalOrderID']]
+    results = pool.map(_lookup, [p['PaypalOrderID'] for p in paypal])
+    outcomes = {}
+    for payment, result in zip(paypal, results):
+        if result.get('success'):
+            outcomes[payment['PaymentID']] = paypal_outcome(result['order_data'])
+        else:
+            logger.warning(f"Reconcile: PayPal lookup failed for payment {payment['PaymentID']}: {result.get('error')}")
+    return outcomes
+
+
+@transaction.atomic
+def apply_outcomes(outcomes: Dict[int, dict], dry_run: bool = False) -> Counter:
+    """Bulk-write settled outcomes for payments that are still open; returns counts per status"""
+    settled = {payment_id: outcome for payment_id, outcome in outcomes.items() if outcome}
+    if not settled:
+        return Counter()
+    # Re-read under lock so a webhook or capture that landed meanwhile wins
+    payments = list(
+        Payment.objects.select_for_update()
+        .filter(PaymentID__in=settled, Status__in=OPEN_STATUSES)
+        .order_by('PaymentID')
+    )
+    counts = Counter(settled[payment.PaymentID]['status'] for payment in payments)
+    if dry_run or not payments:
+        return counts
+
+    for payment in payments:
+        outcome = settled[payment.PaymentID]
+        payment.Status = outcome['status']
+        for field in ('TransactionID', 'PaypalPaymentID', 'PaypalPayerID'):
+            if field in outcome:
+                setattr(payment, field, outcome[field])
+    Payment.objects.bulk_update(payments, ['Status', 'TransactionID', 'PaypalPaymentID', 'PaypalPayerID'])
+    status_reads.forget((p.PaymentID, p.SandboxPaymentID) for p in payments)
+
+    paid = [p.OrderID for p in payments if p.Status == 'completed' and p.OrderID]
+    # Sandbox charges fail the order; PayPal orders stay payable (and keep their
+    # holds) for a new attempt
+    failed = [p.OrderID for p in payments if p.Status == 'failed' and p.OrderID and not p.PaypalOrderID]
+    if paid:
+        Order.objects.filter(OrderID__in=paid).update(Status='paid')
+        reservations.commit_orders(paid)
+    if failed:
+        Order.objects.filter(OrderID__in=failed).update(Status='payment_failed')
+        reservations.release_orders(failed)
+    return counts
+
+
+def reconcile_batch(payments: List[dict], pool: ThreadPoolExecutor, stale_after: int,
+                    dry_run: bool = False) -> Counter:
+    """Reconcile one batch from open_payments(); returns counts per outcome"""
+    outcomes = fetch_outcomes(payments, pool)
+
+    stale_cutoff = timezone.now() - timedelta(seconds=stale_after)
+    for payment in payments:
+        if payment['PaypalOrderID'] or payment['Status'] != 'processing':
+            continue
+        if payment['PaymentDate'] is None or payment['PaymentDate'] <= stale_cutoff:
+            outcomes[payment['PaymentID']] = {'status': 'failed'}
+
+    counts = apply_outcomes(outcomes, dry_run=dry_run)
+    counts['unchanged'] = len(payments) - sum(counts.values())
+    return counts
@@ -1,11 +1,18 @@
 """
 Payment Sandbox Configuration and Utilities
 Provides realistic payment testing without real transactions
+
+With a seed (PAYMENT_SANDBOX_SEED or PaymentSandbox.configure(seed=...)) every
+outcome and generated id is drawn from a Random seeded by the seed plus the
+payment's own key, so runs replay exactly whatever the concurrency.
 """
 import uuid
 import random
+import threading
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.utils import timezone
 
 
@@ -66,15 +73,65 @@ class PaymentSandbox:
         }
     }
     
+    # Deterministic mode seed; None falls back to PAYMENT_GATEWAY['SANDBOX_SEED']
+    seed = None
+    _entry = threading.local()
+    
+    @classmethod
+    def configure(cls, seed=None):
+        """Switch deterministic mode on (seed) or back to the settings default (None)"""
+        cls.seed = seed
+    
+    @classmethod
+    def current_seed(cls):
+        if cls.seed is not None:
+            return cls.seed
+        return getattr(settings, 'PAYMENT_GATEWAY', {}).get('SANDBOX_SEED')
+    
+    @classmethod
+    def rng(cls, *key):
+        """Random source for one payment: seeded by (seed, *key), or the global one"""
+        seed = cls.current_seed()
+        if seed is None:
+            return random
+        return random.Random(':'.join(str(part) for part in (seed, *key)))
+    
+    @staticmethod
+    def _hex(rng, length):
+        if rng is random:
+            return uuid.uuid4().hex[:length]
+        return f'{rng.getrandbits(128):032x}'[:length]
+    
     @classmethod
-    def process_payment(cls, amount, payment_method, card_number=None, **kwargs):
+    @contextmanager
+    def scenario_entry(cls, index):
+        """Key payment ids created on this thread by a scenario entry instead of the request"""
+        cls._entry.index = index
+        try:
+            yield
+        finally:
+            cls._entry.index = None
+    
+    @classmethod
+    def new_payment_id(cls, *key):
+        """Sandbox payment id; deterministic for the same key (or scenario entry) when seeded"""
+        index = getattr(cls._entry, 'index', None)
+        if index is not None:
+            key = ('entry', index)
+        return f'pay_sandbox_{cls._hex(cls.rng("payment_id", *key), 16)}'
+    
+    @classmethod
+    def process_payment(cls, amount, payment_method, card_number=None, rng=None, **kwargs):
         """
         Process a sandbox payment
         Returns a payment result dictionary
+        `rng` defaults to a source keyed by the method, card and description
         """
+        if rng is None:
+            rng = cls.rng(payment_method, card_number or '', kwargs.get('description', ''))
         result = {
-            'payment_id': f'pay_sandbox_{uuid.uuid4().hex[:16]}',
-            'transaction_id': f'txn_{uuid.uuid4().hex[:12].upper()}',
+            'payment_id': f'pay_sandbox_{cls._hex(rng, 16)}',
+            'transaction_id': f'txn_{cls._hex(rng, 12).upper()}',
             'amount': amount,
             'currency': kwargs.get('currency', 'VND'),
             'payment_method': payment_method,
@@ -85,13 +142,13 @@ class PaymentSandbox:
         
         # Handle card payments with test card behaviors
         if payment_method in ['credit_card', 'debit_card'] and card_number:
-            return cls._process_card_payment(result, card_number, **kwargs)
+            return cls._process_card_payment(result, card_number, rng, **kwargs)
         
         # Handle other payment methods
-        return cls._process_other_payment(result, payment_method, **kwargs)
+        return cls._process_other_payment(result, payment_method, rng, **kwargs)
     
     @classmethod
-    def _process_card_payment(cls, result, card_number, **kwargs):
+    def _process_card_payment(cls, result, card_number, rng, **kwargs):
         """Process card payment with test card behaviors"""
         card_number = str(card_number).replace(' ', '').replace('-', '')
         
@@ -107,7 +164,7 @@ class PaymentSandbox:
                     'status': 'completed',
                     'success': True,
                     'message': 'Payment completed successfully',
-                    'processing_time': random.randint(1, 3)
+                    'processing_time': rng.randint(1, 3)
                 })
                 
             elif behavior == 'decline_generic':
@@ -128,6 +185,15 @@ class PaymentSandbox:
                     'decline_code': 'expired_card'
                 })
                 
+            elif behavior == 'decline_processing':
+                result.update({
+                    'status': 'failed',
+                    'success': False,
+                    'error_code': 'processing_error',
+                    'message': 'An error occurred while processing your card',
+                    'decline_code': 'processing_error'
+                })
+                
             elif behavior == 'decline_insufficient_funds':
                 result.update({
                     'status': 'failed',
@@ -153,19 +219,19 @@ class PaymentSandbox:
                     'status': 'processing',
                     'success': None,
                     'message': 'Payment is being processed',
-                    'processing_time': random.randint(5, 15)
+                    'processing_time': rng.randint(5, 15)
                 })
                 
         else:
             # Unknown card - simulate based on payment method success rate
             method_config = cls.PAYMENT_METHODS.get(result['payment_method'], {'success_rate': 0.9})
-            if random.random() < method_config['success_rate']:
+            if rng.random() < method_config['success_rate']:
                 result.update({
                     'status': 'completed',
                     'success': True,
                     'message': 'Payment completed successfully',
                     'card_last4': card_number[-4:],
-                    'processing_time': random.randint(*method_config.get('processing_time', (1, 3)))
+                    'processing_time': rng.randint(*method_config.get('processing_time', (1, 3)))
                 })
             else:
                 result.update({
@@ -179,18 +245,18 @@ class PaymentSandbox:
         return result
     
     @classmethod
-    def _process_other_payment(cls, result, payment_method, **kwargs):
+    def _process_other_payment(cls, result, payment_method, rng, **kwargs):
         """Process non-card payments"""
         method_config = cls.PAYMENT_METHODS.get(payment_method, {'success_rate': 0.9})
-        processing_time = random.randint(*method_config.get('processing_time', (1, 3)))
+        processing_time = rng.randint(*method_config.get('processing_time', (1, 3)))
         
-        if random.random() < method_config['success_rate']:
+        if rng.random() < method_config['success_rate']:
             if payment_method == 'paypal':
                 result.update({
                     'status': 'completed',
                     'success': True,
                     'message': 'PayPal payment completed',
-                    'paypal_transaction_id': f'PAYPAL{uuid.uuid4().hex[:16].upper()}',
+                    'paypal_transaction_id': f'PAYPAL{cls._hex(rng, 16).upper()}',
                     'processing_time': processing_time
                 })
                 
@@ -199,7 +265,7 @@ class PaymentSandbox:
                     'status': 'processing' if processing_time > 5 else 'completed',
                     'success': True if processing_time <= 5 else None,
                     'message': 'Bank transfer initiated' if processing_time > 5 else 'Bank transfer completed',
-                    'bank_reference': f'BT{uuid.uuid4().hex[:12].upper()}',
+                    'bank_reference': f'BT{cls._hex(rng, 12).upper()}',
                     'processing_time': processing_time
                 })
                 
@@ -208,7 +274,7 @@ class PaymentSandbox:
                     'status': 'completed',
                     'success': True,
                     'message': 'E-wallet payment completed',
-                    'wallet_transaction_id': f'EW{uuid.uuid4().hex[:14].upper()}',
+                    'wallet_transaction_id': f'EW{cls._hex(rng, 14).upper()}',
                     'processing_time': processing_time
                 })
                 
@@ -218,7 +284,7 @@ class PaymentSandbox:
                     'success': None,
                     'message': 'Cash on delivery order created',
                     'processing_time': 0,
-                    'expected_delivery': timezone.now() + timedelta(days=random.randint(1, 3))
+                    'expected_delivery': timezone.now() + timedelta(days=rng.randint(1, 3))
                 })
                 
         else:
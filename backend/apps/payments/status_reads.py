@@ -0,0 +1,77 @@
+"""
+Payment status read path for checkout polling.
+
+A status read is one query: the payment row (matched by sandbox id or
+PaymentID, both indexed by `create_payment_indexes`) with its order's status
+and owner joined in through subqueries. Results are cached per payment
+reference: a few seconds while the payment is open, longer once it is final.
+Every writer that changes a payment status calls `forget()` after commit, so
+pollers see settlement immediately.
+"""
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from apps.orders.models import Order
+from apps.payments.models import Payment
+
+OPEN_STATUSES = {'pending', 'processing', 'requires_action'}
+FIELDS = ['PaymentID', 'SandboxPaymentID', 'OrderID', 'Status', 'TransactionID', 'PaymentDate']
+
+
+def _cache():
+    return caches[getattr(settings, 'PAYMENT_STATUS_CACHE_ALIAS', 'default')]
+
+
+def _key(reference) -> str:
+    return f'payment:status:{reference}'
+
+
+def _query(reference: str) -> Optional[dict]:
+    if reference.startswith('pay_'):
+        payments = Payment.objects.filter(SandboxPaymentID=reference)
+    elif reference.isdigit():
+        payments = Payment.objects.filter(PaymentID=int(reference))
+    else:
+        return None
+    orders = Order.objects.filter(OrderID=OuterRef('OrderID'))
+    return (
+        payments.annotate(
+            order_status=Subquery(orders.values('Status')[:1]),
+            customer_id=Subquery(orders.values('CustomerID')[:1]),
+        )
+        .values(*FIELDS, 'order_status', 'customer_id')
+        .first()
+    )
+
+
+def lookup(reference: str, customer_id: int) -> Optional[dict]:
+    """Payment plus order status for the customer's payment, or None"""
+    cache = _cache()
+    row = cache.get(_key(reference))
+    if row is None:
+        row = _query(reference)
+        if row is None:
+            return None
+        timeout = (
+            getattr(settings, 'PAYMENT_STATUS_CACHE_TIMEOUT', 2) if row['Status'] in OPEN_STATUSES
+            else getattr(settings, 'PAYMENT_STATUS_FINAL_CACHE_TIMEOUT', 30)
+        )
+        cache.set(_key(reference), row, timeout)
+    if row['customer_id'] != customer_id:
+        return None
+    return row
+
+
+def forget(payments: Iterable[Tuple[int, Optional[str]]]):
+    """Drop cached status for (PaymentID, SandboxPaymentID) pairs once the transaction commits"""
+    keys = []
+    for payment_id, sandbox_id in payments:
+        keys.append(_key(payment_id))
+        if sandbox_id:
+            keys.append(_key(sandbox_id))
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
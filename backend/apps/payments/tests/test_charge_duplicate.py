@@ -0,0 +1,53 @@
+import pytest
+from unittest import mock
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.orders.models import Order
+from apps.payments.models import Payment
+from apps.payments.sandbox import PaymentSandbox
+from apps.users.auth import CustomerPrincipal
+
+
+@pytest.mark.django_db
+def test_second_charge_for_an_order_is_rejected_under_the_order_lock():
+    order = Order.objects.create(CustomerID=801, TotalAmount=50, Status='confirmed', OrderDate=timezone.now())
+    client = APIClient()
+    client.force_authenticate(CustomerPrincipal(801))
+    body = {'order_id': order.OrderID, 'payment_method': 'cash_on_delivery'}
+
+    locked = []
+    select_for_update = QuerySet.select_for_update
+
+    def spy(queryset, *args, **kwargs):
+        locked.append(queryset.model)
+        return select_for_update(queryset, *args, **kwargs)
+
+    with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=spy):
+        first = client.post('/api/v1/payments/charge/', body, format='json')
+    assert first.status_code == 202
+    # The duplicate check and the insert run while holding the order row
+    assert Order in locked
+
+    second = client.post('/api/v1/payments/charge/', body, format='json')
+    assert second.status_code == 400
+    assert Payment.objects.filter(OrderID=order.OrderID).count() == 1
+
+
+
+@pytest.mark.django_db
+def test_seeded_payment_ids_differ_between_orders_with_the_same_request():
+    client = APIClient()
+    client.force_authenticate(CustomerPrincipal(801))
+    body = {'payment_method': 'cash_on_delivery', 'description': 'Same cart'}
+    with mock.patch.object(PaymentSandbox, 'seed', 42):
+        ids = []
+        for _ in range(2):
+            order = Order.objects.create(CustomerID=801, TotalAmount=50, Status='confirmed', OrderDate=timezone.now())
+            response = client.post('/api/v1/payments/charge/', {**body, 'order_id': order.OrderID}, format='json')
+            assert response.status_code == 202
+            ids.append(response.data['payment_id'])
+        with PaymentSandbox.scenario_entry(7):
+            assert PaymentSandbox.new_payment_id(1, 'a') == PaymentSandbox.new_payment_id(2, 'b')
+
+    assert ids[0] != ids[1]
@@ -0,0 +1,94 @@
+import json
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.utils import timezone
+from apps.catalog.models import Book
+from apps.orders.models import Order, StockReservation
+from apps.orders.services import reservations
+from apps.payments import reconciliation
+from apps.payments.models import Payment
+
+
+def _payment(customer_id, paypal_order_id=None, minutes_ago=60):
+    order = Order.objects.create(CustomerID=customer_id, TotalAmount=10, Status='confirmed', OrderDate=timezone.now())
+    return Payment.objects.create(
+        OrderID=order.OrderID, Amount=10, PaymentMethod='paypal' if paypal_order_id else 'credit_card',
+        Status='processing', PaypalOrderID=paypal_order_id,
+        PaymentDate=timezone.now() - timedelta(minutes=minutes_ago),
+    )
+
+
+def _reconcile(tmp_path, *args):
+    out = StringIO()
+    call_command('reconcile_payments', '--checkpoint-file', str(tmp_path / 'checkpoint'), *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_failed_paypal_payment_keeps_the_order_payable_and_its_hold():
+    Book.objects.create(BookID=51, Title='Book 51', Price=10, Stock=5)
+    paypal, sandbox = _payment(701, paypal_order_id='PP-1'), _payment(702)
+    reservations.hold(paypal.OrderID, 701, {51: 1})
+    reservations.hold(sandbox.OrderID, 702, {51: 1})
+
+    counts = reconciliation.apply_outcomes({paypal.PaymentID: {'status': 'failed'}, sandbox.PaymentID: {'status': 'failed'}})
+
+    assert counts == {'failed': 2}
+    assert Order.objects.get(OrderID=paypal.OrderID).Status == 'confirmed'
+    assert StockReservation.objects.get(OrderID=paypal.OrderID).Status == StockReservation.HELD
+    assert Order.objects.get(OrderID=sandbox.OrderID).Status == 'payment_failed'
+    assert StockReservation.objects.get(OrderID=sandbox.OrderID).Status == StockReservation.RELEASED
+
+
+@pytest.mark.django_db
+def test_open_payments_pages_by_id_and_skips_young_payments():
+    old = [_payment(703) for _ in range(3)]
+    _payment(703, minutes_ago=0)
+
+    batches = list(reconciliation.open_payments(min_age=300, batch_size=2))
+
+    assert [[p['PaymentID'] for p in batch] for batch in batches] == [
+        [old[0].PaymentID, old[1].PaymentID], [old[2].PaymentID]
+    ]
+    assert list(reconciliation.open_payments(after_id=old[1].PaymentID, batch_size=2))[0][0]['PaymentID'] == old[2].PaymentID
+
+
+@pytest.mark.django_db
+def test_interrupted_run_resumes_after_the_checkpointed_batch(tmp_path):
+    payments = [_payment(704) for _ in range(3)]
+    reconcile_batch = reconciliation.reconcile_batch
+    calls = []
+
+    def fail_second_batch(batch, *args, **kwargs):
+        calls.append(batch)
+        if len(calls) == 2:
+            raise RuntimeError('interrupted')
+        return reconcile_batch(batch, *args, **kwargs)
+
+    with mock.patch.object(reconciliation, 'reconcile_batch', side_effect=fail_second_batch):
+        with pytest.raises(RuntimeError):
+            _reconcile(tmp_path, '--batch-size', '1')
+
+    checkpoint = tmp_path / 'checkpoint'
+    assert json.loads(checkpoint.read_text())['last_payment_id'] == payments[0].PaymentID
+    assert Payment.objects.get(PaymentID=payments[0].PaymentID).Status == 'failed'
+
+    output = _reconcile(tmp_path, '--batch-size', '1')
+
+    assert f'Resuming after payment {payments[0].PaymentID}' in output
+    assert not checkpoint.exists()  # A finished pass removes it
+    assert set(Payment.objects.filter(PaymentID__in=[p.PaymentID for p in payments]).values_list('Status', flat=True)) == {'failed'}
+
+
+@pytest.mark.django_db
+def test_dry_run_writes_neither_outcomes_nor_a_checkpoint(tmp_path):
+    payment = _payment(705)
+
+    output = _reconcile(tmp_path, '--dry-run')
+
+    assert '1 failed' in output
+    assert Payment.objects.get(PaymentID=payment.PaymentID).Status == 'processing'
+    assert not (tmp_path / 'checkpoint').exists()
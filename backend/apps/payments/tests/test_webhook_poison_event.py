@@ -0,0 +1,49 @@
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+from apps.orders.models import Order
+from apps.payments import webhook_queue
+from apps.payments.models import Payment, PayPalWebhookEvent
+
+
+def _capture(event_id, paypal_order_id):
+    return {
+        'id': event_id,
+        'event_type': webhook_queue.CAPTURE_COMPLETED,
+        'resource': {
+            'id': f'CAP-{event_id}',
+            'supplementary_data': {'related_ids': {'order_id': paypal_order_id}},
+        },
+    }
+
+
+@pytest.mark.django_db
+@override_settings(PAYPAL_WEBHOOK_MAX_ATTEMPTS=2)
+def test_poison_event_does_not_hold_back_the_rest_of_the_batch():
+    order = Order.objects.create(CustomerID=701, TotalAmount=30, Status='pending', OrderDate=timezone.now())
+    payment = Payment.objects.create(
+        OrderID=order.OrderID, Amount=30, PaymentMethod='paypal', Status='processing', PaypalOrderID='PP-GOOD'
+    )
+    webhook_queue.enqueue(_capture('WH-GOOD', 'PP-GOOD'))
+    webhook_queue.enqueue(_capture('WH-POISON', 'PP-OTHER'))
+    # A payload the batch cannot parse
+    PayPalWebhookEvent.objects.filter(EventID='WH-POISON').update(Payload='not an event')
+
+    assert webhook_queue.process_batch() == 1
+
+    good = PayPalWebhookEvent.objects.get(EventID='WH-GOOD')
+    assert good.Status == PayPalWebhookEvent.APPLIED
+    assert good.Attempts == 0
+    payment.refresh_from_db()
+    assert payment.Status == 'completed'
+    assert payment.TransactionID == 'CAP-WH-GOOD'
+    assert Order.objects.get(OrderID=order.OrderID).Status == 'paid'
+
+    poison = PayPalWebhookEvent.objects.get(EventID='WH-POISON')
+    assert poison.Status == PayPalWebhookEvent.QUEUED
+    assert poison.Attempts == 1
+
+    assert webhook_queue.process_batch() == 0
+    poison.refresh_from_db()
+    assert poison.Status == PayPalWebhookEvent.FAILED
+    assert poison.Attempts == 2
@@ -0,0 +1,36 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.payments import webhook_queue
+from apps.payments.models import PayPalWebhookEvent
+
+
+@pytest.mark.django_db
+def test_unhandled_event_types_are_acknowledged_but_not_stored():
+    client = APIClient()
+    response = client.post(
+        '/api/v1/payments/paypal/webhook/', {'id': 'WH-1', 'event_type': 'CHECKOUT.ORDER.APPROVED'}, format='json'
+    )
+    assert response.status_code == 200
+    assert not PayPalWebhookEvent.objects.exists()
+    assert webhook_queue.enqueue({'id': 'WH-2', 'event_type': 'anything'}) is False
+    assert not PayPalWebhookEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_purge_deletes_only_settled_events_past_retention():
+    now = timezone.now()
+    old = now - timedelta(days=31)
+    for event_id, status, processed_at in [
+        ('WH-OLD-APPLIED', PayPalWebhookEvent.APPLIED, old),
+        ('WH-OLD-FAILED', PayPalWebhookEvent.FAILED, old),
+        ('WH-RECENT', PayPalWebhookEvent.APPLIED, now),
+        ('WH-QUEUED', PayPalWebhookEvent.QUEUED, None),
+    ]:
+        PayPalWebhookEvent.objects.create(
+            EventID=event_id, EventType=webhook_queue.CAPTURE_COMPLETED, Payload={}, Status=status, ProcessedAt=processed_at
+        )
+
+    assert webhook_queue.purge_processed(batch_size=1, now=now) == 2
+    assert set(PayPalWebhookEvent.objects.values_list('EventID', flat=True)) == {'WH-RECENT', 'WH-QUEUED'}
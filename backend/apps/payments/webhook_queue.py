@@ -0,0 +1,247 @@
+"""
+Queued PayPal webhook ingestion.
+
+`paypal_webhook` only appends capture events (HANDLED_EVENTS) to
+`paypal_webhook_event` (the unique EventID makes PayPal's redeliveries no-ops)
+and answers 200 straight away; other event types are acknowledged unstored.
+Queued events are applied in batches: one query loads the payments of the
+whole batch, and Payment/Order statuses are written with bulk updates.
+
+Batches are drained after each delivery on a single background thread in the
+web process (PAYPAL_WEBHOOK_DRAIN_IN_PROCESS) and/or by
+`manage.py process_paypal_webhooks --loop` as a dedicated worker. Settled
+events are deleted after PAYPAL_WEBHOOK_RETENTION_DAYS by
+`manage.py purge_paypal_webhooks`.
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.orders.services import reservations
+from apps.payments import status_reads
+from apps.payments.models import Payment, PayPalWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_COMPLETED = 'PAYMENT.CAPTURE.COMPLETED'
+CAPTURE_DENIED = 'PAYMENT.CAPTURE.DENIED'
+HANDLED_EVENTS = {CAPTURE_COMPLETED, CAPTURE_DENIED}
+FINAL_STATUSES = {'completed', 'refunded'}
+
+
+def _paypal_order_id(event: dict):
+    resource = event.get('resource') or {}
+    return (resource.get('supplementary_data') or {}).get('related_ids', {}).get('order_id')
+
+
+def enqueue(event: dict) -> bool:
+    """Store a delivery; returns False when the event id was already queued or the type is not handled"""
+    if event.get('event_type') not in HANDLED_EVENTS:
+        return False
+    event_id = event.get('id')
+    if not event_id:
+        # Without an id, identical bodies still deduplicate
+        event_id = 'sha256:' + hashlib.sha256(json.dumps(event, sort_keys=True).encode()).hexdigest()
+    try:
+        with transaction.atomic():
+            PayPalWebhookEvent.objects.create(
+                EventID=event_id,
+                EventType=event.get('event_type', ''),
+                PaypalOrderID=_paypal_order_id(event),
+                Payload=event,
+            )
+    except IntegrityError:
+        return False  # Redelivery of an event we already have
+    return True
+
+
+def _outcomes(events) -> Dict[str, dict]:
+    """Final outcome per PayPal order in arrival order; a completed capture is never undone"""
+    outcomes = {}
+    for event in events:
+        order_id = event['PaypalOrderID']
+        if not order_id or event['EventType'] not in HANDLED_EVENTS:
+            continue
+        current = outcomes.get(order_id)
+        if current is not None and current['status'] == 'completed':
+            continue
+        if event['EventType'] == CAPTURE_COMPLETED:
+            outcomes[order_id] = {'status': 'completed', 'capture_id': (event['Payload'].get('resource') or {}).get('id')}
+        else:
+            outcomes[order_id] = {'status': 'failed', 'capture_id': None}
+    return outcomes
+
+
+def process_batch(batch_size: int = 200) -> int:
+    """Apply up to `batch_size` queued events; returns how many were settled (failing events stay queued)"""
+    max_attempts = getattr(settings, 'PAYPAL_WEBHOOK_MAX_ATTEMPTS', 5)
+    with transaction.atomic():
+        events = list(
+            PayPalWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(Status=PayPalWebhookEvent.QUEUED)
+            .order_by('QueueID')
+            .values('QueueID', 'EventType', 'PaypalOrderID', 'Payload')[:batch_size]
+        )
+        if not events:
+            return 0
+        queue_ids = [event['QueueID'] for event in events]
+
+        try:
+            with transaction.atomic():
+                applied, failed = _apply(events), set()
+        except Exception as e:
+            logger.warning(f"PayPal webhook batch failed ({len(events)} events), applying one by one: {e}")
+            applied, failed = _apply_each(events, max_attempts)
+
+        settled = set(queue_ids) - failed
+        now = timezone.now()
+        PayPalWebhookEvent.objects.filter(QueueID__in=applied).update(
+            Status=PayPalWebhookEvent.APPLIED, ProcessedAt=now
+        )
+        PayPalWebhookEvent.objects.filter(QueueID__in=settled - applied).update(
+            Status=PayPalWebhookEvent.IGNORED, ProcessedAt=now
+        )
+    logger.info(
+        f"PayPal webhooks processed: {len(applied)} applied, {len(settled - applied)} ignored, {len(failed)} failed"
+    )
+    # Anything short of a full batch stops drain(); failed events are retried on the next run
+    return len(settled)
+
+
+def _apply_each(events, max_attempts: int):
+    """
+    Fallback for a failed batch: apply the events one at a time so only the
+    ones that fail on their own are charged an attempt (and dead-lettered as
+    FAILED after `max_attempts`). Returns (applied QueueIDs, failed QueueIDs).
+    """
+    applied, failed = set(), set()
+    for event in events:
+        try:
+            with transaction.atomic():
+                applied |= _apply([event])
+        except Exception as e:
+            logger.error(f"PayPal webhook {event['QueueID']} failed: {e}")
+            failed.add(event['QueueID'])
+            PayPalWebhookEvent.objects.filter(QueueID=event['QueueID']).update(
+                Attempts=F('Attempts') + 1, LastError=str(e)[:2000]
+            )
+    if failed:
+        PayPalWebhookEvent.objects.filter(QueueID__in=failed, Attempts__gte=max_attempts).update(
+            Status=PayPalWebhookEvent.FAILED, ProcessedAt=timezone.now()
+        )
+    return applied, failed
+
+
+def _apply(events) -> set:
+    """Write the batch's payment and order changes; returns the QueueIDs that matched a payment"""
+    outcomes = _outcomes(events)
+    payments = list(
+        Payment.objects.filter(PaypalOrderID__in=outcomes)
+        .only('PaymentID', 'SandboxPaymentID', 'OrderID', 'PaypalOrderID', 'Status', 'TransactionID')
+    )
+    known = {payment.PaypalOrderID for payment in payments}
+
+    completed, failed = [], []
+    for payment in payments:
+        if payment.Status in FINAL_STATUSES:
+            continue  # Already settled by the capture call or an earlier event
+        outcome = outcomes[payment.PaypalOrderID]
+        payment.Status = outcome['status']
+        if outcome['status'] == 'completed':
+            payment.TransactionID = outcome['capture_id']
+            completed.append(payment)
+        else:
+            failed.append(payment)
+
+    if completed or failed:
+        Payment.objects.bulk_update(completed + failed, ['Status', 'TransactionID'])
+        status_reads.forget((p.PaymentID, p.SandboxPaymentID) for p in completed + failed)
+    paid_orders = [payment.OrderID for payment in completed if payment.OrderID]
+    if paid_orders:
+        Order.objects.filter(OrderID__in=paid_orders).update(Status='paid')
+        reservations.commit_orders(paid_orders)
+    failed_orders = [payment.OrderID for payment in failed if payment.OrderID]
+    if failed_orders:
+        reservations.release_orders(failed_orders)
+
+    return {
+        event['QueueID'] for event in events
+        if event['EventType'] in HANDLED_EVENTS and event['PaypalOrderID'] in known
+    }
+
+
+def purge_processed(batch_size: int = 1000, now=None) -> int:
+    """Delete settled events older than PAYPAL_WEBHOOK_RETENTION_DAYS in batches; returns the number deleted"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, 'PAYPAL_WEBHOOK_RETENTION_DAYS', 30))
+    settled = [PayPalWebhookEvent.APPLIED, PayPalWebhookEvent.IGNORED, PayPalWebhookEvent.FAILED]
+    deleted = 0
+    while True:
+        ids = list(
+            PayPalWebhookEvent.objects.filter(Status__in=settled, ProcessedAt__lte=cutoff)
+            .order_by('QueueID')
+            .values_list('QueueID', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += PayPalWebhookEvent.objects.filter(QueueID__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+def drain(batch_size: int = 200) -> int:
+    """Process batches until the queue is empty; returns the number of events settled"""
+    total = 0
+    while True:
+        taken = process_batch(batch_size)
+        total += taken
+        if taken < batch_size:
+            return total
+
+
+class _BackgroundDrainer:
+    """Single thread draining the queue after deliveries; bursts coalesce into one run"""
+
+    def __init__(self):
+        self._executor = None
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        if self._pending.is_set():
+            return  # A drain is already queued and will see this event
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='paypal-webhooks')
+            self._pending.set()
+            self._executor.submit(self._run)
+
+    def _run(self):
+        self._pending.clear()
+        close_old_connections()
+        try:
+            drain(getattr(settings, 'PAYPAL_WEBHOOK_BATCH_SIZE', 200))
+        except Exception as e:
+            logger.error(f"PayPal webhook drain error: {e}")
+        finally:
+            close_old_connections()
+
+
+# Singleton instance
+background_drainer = _BackgroundDrainer()
+
+
+def schedule_drain():
+    if getattr(settings, 'PAYPAL_WEBHOOK_DRAIN_IN_PROCESS', True):
+        transaction.on_commit(background_drainer.schedule)
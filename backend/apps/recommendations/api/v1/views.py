@@ -5,7 +5,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 from django.db import connection
+from django.db.models import Max
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from apps.catalog.services.versioning import catalog_version
+from apps.common.http import conditional_read, request_etag
+from apps.orders.models import OrderDetail
 from apps.recommendations.services import recommendation_engine
 import json
 import logging
@@ -21,10 +26,17 @@ def test_connection(request):
         'message': 'API connected successfully'
     })
 
+def popular_books_etag(request, *args, **kwargs):
+    # Popularity only moves when order lines are added; the max PK is an index lookup
+    last_line = OrderDetail.objects.aggregate(m=Max('OrderDetailID'))['m'] or 0
+    return request_etag(request, catalog_version(), last_line)
+
+
 class PopularBooksView(APIView):
     """API để lấy sách phổ biến"""
     permission_classes = [AllowAny]
     
+    @method_decorator(conditional_read(popular_books_etag))
     def get(self, request):
         try:
             with connection.cursor() as cursor:
@@ -5,6 +5,7 @@ Usage: python manage.py check_recommendations
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from apps.recommendations.services import recommendation_engine
+from apps.activities.services.rollups import activity_stats
 from django.db import connection
 
 
@@ -48,23 +49,15 @@ class Command(BaseCommand):
                 book_count = cursor.fetchone()[0]
                 self.stdout.write(f'   📚 Books in stock: {book_count}')
                 
-                # Check user activities
-                cursor.execute("SELECT COUNT(*) FROM useractivity")
-                activity_count = cursor.fetchone()[0]
-                self.stdout.write(f'   👥 User activities: {activity_count}')
-                
-                # Check unique users with activities
-                cursor.execute("SELECT COUNT(DISTINCT CustomerID) FROM useractivity")
-                users_with_activity = cursor.fetchone()[0]
-                self.stdout.write(f'   🙋 Active users: {users_with_activity}')
-                
-                # Recent activities (last 7 days)
-                cursor.execute("""
-                    SELECT COUNT(*) FROM useractivity 
-                    WHERE ActivityTime >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                """)
-                recent_activities = cursor.fetchone()[0]
-                self.stdout.write(f'   🔥 Recent activities (7 days): {recent_activities}')
+            # User activity totals come from the daily rollups (rollup_activity)
+            stats = activity_stats(recent_days=7)
+            self.stdout.write(f'   👥 User activities: {stats["events"]}')
+            self.stdout.write(f'   🙋 Active users: {stats["customers"]}')
+            self.stdout.write(f'   🔥 Recent activities (7 days): {stats["recent_events"]}')
+            self.stdout.write(
+                f'   📈 Rollups up to activity #{stats["high_water_mark"]} '
+                f'({stats["unrolled_rows"]} rows pending)'
+            )
                 
         except Exception as e:
             self.stdout.write(
@@ -77,15 +70,7 @@ class Command(BaseCommand):
             
             try:
                 # Find a user with activities
-                with connection.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT CustomerID, COUNT(*) as activity_count
-                        FROM useractivity 
-                        GROUP BY CustomerID 
-                        ORDER BY activity_count DESC 
-                        LIMIT 1
-                    """)
-                    test_user_data = cursor.fetchone()
+                test_user_data = activity_stats()['top_customer']
                 
                 if test_user_data:
                     test_user_id, activity_count = test_user_data
@@ -11,32 +11,11 @@ import re
 import math
 import logging
 from datetime import datetime, timedelta
+from apps.common.media import get_absolute_image_url
+from apps.activities.services.rollups import customer_activity
 
 logger = logging.getLogger(__name__)
 
-def get_absolute_image_url(image_path, request=None):
-    """Convert relative image path to absolute URL"""
-    if not image_path:
-        return ''
-    if image_path.startswith(('http://', 'https://')):
-        return image_path
-    
-    # Try to get base URL from Django settings or request
-    from django.conf import settings
-    
-    # Use BACKEND_URL from environment if set, otherwise construct from request
-    base_url = getattr(settings, 'BACKEND_URL', None)
-    if not base_url:
-        if request:
-            base_url = f"{request.scheme}://{request.get_host()}"
-        else:
-            # Fallback for local development
-            base_url = "http://127.0.0.1:8000"
-    
-    if image_path.startswith('/'):
-        return f"{base_url}{image_path}"
-    return f"{base_url}/media/{image_path}"
-
 class ContentBasedRecommendationEngine:
     """
     Content-based recommendation engine sử dụng TF-IDF và cosine similarity
@@ -186,49 +165,36 @@ class ContentBasedRecommendationEngine:
             return False
         
     def get_user_activity_with_recency(self, user_id, days=30):
-        """Lấy dữ liệu activity của user với recency decay"""
-        cutoff_date = timezone.now() - timedelta(days=days)
+        """Lấy dữ liệu activity của user với recency decay (đọc từ daily rollups)"""
+        today = timezone.localdate()
+        daily_counts = customer_activity(user_id, since=today - timedelta(days=days))
         
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT BookID, Action, ActivityTime, COUNT(*) as frequency
-                FROM useractivity
-                WHERE CustomerID = %s AND ActivityTime >= %s
-                GROUP BY BookID, Action, ActivityTime
-                ORDER BY ActivityTime DESC
-            """, [user_id, cutoff_date])
-            
-            activities = []
-            for row in cursor.fetchall():
-                book_id, action, activity_time, frequency = row
-                
-                # Tính recency decay (30 ngày = weight 1.0, giảm dần)
-                # Convert naive datetime to timezone-aware
-                if activity_time.tzinfo is None:
-                    activity_time = timezone.make_aware(activity_time)
-                days_ago = (timezone.now() - activity_time).days
-                recency_weight = max(0.1, 1.0 - (days_ago / days))
-                
-                # Trọng số hành vi: view=1, add_to_cart=3, purchase=5
-                action_weights = {
-                    'view': 1,
-                    'click': 1,
-                    'add_to_cart': 3,
-                    'add_cart': 3,  # alias
-                    'checkout': 4,
-                    'purchase': 5
-                }
-                
-                action_weight = action_weights.get(action.lower(), 1)
-                final_weight = frequency * action_weight * recency_weight
-                
-                activities.append({
-                    'book_id': book_id,
-                    'action': action,
-                    'weight': final_weight
-                })
-            
-            return activities
+        # Trọng số hành vi: view=1, add_to_cart=3, purchase=5
+        action_weights = {
+            'view': 1,
+            'click': 1,
+            'add_to_cart': 3,
+            'add_cart': 3,  # alias
+            'checkout': 4,
+            'purchase': 5
+        }
+        
+        activities = []
+        for (day, book_id, action), frequency in sorted(daily_counts.items(), reverse=True):
+            # Tính recency decay (30 ngày = weight 1.0, giảm dần)
+            days_ago = (today - day).days
+            recency_weight = max(0.1, 1.0 - (days_ago / days))
+            
+            action_weight = action_weights.get(action.lower(), 1)
+            final_weight = frequency * action_weight * recency_weight
+            
+            activities.append({
+                'book_id': book_id,
+                'action': action,
+                'weight': final_weight
+            })
+        
+        return activities
     
     def compute_user_profile_vector(self, user_id):
         """Tính user profile vector từ weighted activities và TF-IDF matrix"""
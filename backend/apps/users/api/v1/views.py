@@ -8,6 +8,11 @@ from django.contrib.auth.hashers import check_password, make_password
 from ...models import Customer
 from .serializers import RegisterInSerializer, LoginInSerializer, CustomerOutSerializer, UserSerializer
 from apps.users.services.jwt_utils import create_jwt_token, decode_jwt_token
+from apps.users.auth import CustomerPrincipal
+from apps.cart.services.cart_service import merge_carts_on_login
+import logging
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
@@ -62,6 +67,12 @@ def login_view(request):
         request.session.create()
     request.session['customer_id'] = cust.CustomerID
 
+    # fold this session's guest cart into the customer's cart
+    try:
+        merge_carts_on_login(request, CustomerPrincipal(cust.CustomerID))
+    except Exception as e:
+        logger.error(f"Error merging cart on login: {str(e)}")
+
     out = CustomerOutSerializer(cust)
     return Response({'user': out.data, 'token': token})
 
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Load environment variables from .env file
 load_dotenv()
@@ -79,6 +80,13 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Optional CDN origin in front of MEDIA_URL (scheme + host, e.g. https://cdn.example.com)
+MEDIA_CDN_URL = os.getenv('MEDIA_CDN_URL', '')
+# Cover thumbnail widths exposed by the API once `manage.py build_thumbnails` has run (e.g. 160,320,640)
+IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '').split(',') if w.strip())
+# Covers changed through the API/admin are queued here for `build_thumbnails --loop`;
+# share it with the worker (a per-process cache leaves them to its periodic rescan)
+THUMBNAIL_CACHE_ALIAS = os.getenv('THUMBNAIL_CACHE_ALIAS', 'default')
 
 JWT_SECRET = os.getenv('JWT_SECRET', SECRET_KEY)
 JWT_ACCESS_TTL_MINUTES = int(os.getenv('JWT_ACCESS_TTL_MINUTES', '15'))
@@ -119,6 +127,7 @@ CORS_ALLOWED_ORIGINS = [
   "http://127.0.0.1:8000",
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 LOGGING = {
     'version': 1,
@@ -170,6 +179,43 @@ USE_TZ = True
 # Default auto field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# HTTP caching for read-mostly catalog endpoints (seconds)
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', '60'))
+# Catalog ETags/Last-Modified also roll over this often, bounding staleness after writes
+# that bypass the catalog signals (raw SQL, bulk admin updates); 0 disables
+CATALOG_VERSION_TTL = int(os.getenv('CATALOG_VERSION_TTL', '600'))
+
+# Server-side response cache for anonymous catalog reads. Point the alias at a
+# shared backend (redis/memcached entry in CACHES) when running several workers.
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Write-through cart cache (customer -> cart id, cart summaries). Must be shared
+# between workers (redis/memcached); with a per-process LocMem alias it is not used.
+CART_CACHE_ALIAS = os.getenv('CART_CACHE_ALIAS', 'default')
+CART_CACHE_TIMEOUT = int(os.getenv('CART_CACHE_TIMEOUT', '300'))
+CART_PRICE_TABLE_TIMEOUT = int(os.getenv('CART_PRICE_TABLE_TIMEOUT', '600'))
+
+# Guest carts: 'session' keeps lines in the signed-cookie session (no DB writes
+# until login), 'database' gives each session its own cart order row.
+CART_ANONYMOUS_BACKEND = os.getenv('CART_ANONYMOUS_BACKEND', 'session')
+CART_SESSION_MAX_LINES = int(os.getenv('CART_SESSION_MAX_LINES', '50'))
+
+# Checkout retries when a stock row lock times out or deadlocks (exponential backoff with jitter)
+CHECKOUT_LOCK_RETRIES = int(os.getenv('CHECKOUT_LOCK_RETRIES', '3'))
+CHECKOUT_RETRY_BASE_DELAY = float(os.getenv('CHECKOUT_RETRY_BASE_DELAY', '0.05'))
+
+# Stock holds taken at checkout expire after this many seconds unless the order is paid
+# (released by `manage.py release_expired_reservations`). Counters need a shared cache too.
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', '900'))
+STOCK_CACHE_ALIAS = os.getenv('STOCK_CACHE_ALIAS', 'default')
+STOCK_COUNTER_TIMEOUT = int(os.getenv('STOCK_COUNTER_TIMEOUT', '300'))
+
+# Idempotency-Key retention for order/payment POSTs (purge with `manage.py purge_idempotency_keys`)
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_PROCESSING_TIMEOUT = int(os.getenv('IDEMPOTENCY_PROCESSING_TIMEOUT', '300'))
+IDEMPOTENCY_CACHE_ALIAS = os.getenv('IDEMPOTENCY_CACHE_ALIAS', 'default')
+
 # Frontend URL for PayPal redirects
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
@@ -184,6 +230,12 @@ PAYPAL_SETTINGS = {
     'CLIENT_SECRET': os.getenv('PAYPAL_CLIENT_SECRET', ''),
     'SANDBOX_EMAIL': os.getenv('PAYPAL_SANDBOX_EMAIL', ''),
     'WEBHOOK_ID': os.getenv('PAYPAL_WEBHOOK_ID', ''),
+    'BASE_URL': os.getenv('PAYPAL_BASE_URL', ''),  # Empty = derived from MODE
+    # Shared HTTP client tuning (seconds / connections per process)
+    'CONNECT_TIMEOUT': float(os.getenv('PAYPAL_CONNECT_TIMEOUT', '3.05')),
+    'READ_TIMEOUT': float(os.getenv('PAYPAL_READ_TIMEOUT', '20')),
+    'POOL_SIZE': int(os.getenv('PAYPAL_POOL_SIZE', '20')),
+    'TOKEN_REFRESH_MARGIN': int(os.getenv('PAYPAL_TOKEN_REFRESH_MARGIN', '300')),
 }
 
 # Payment Gateway Settings (Legacy)
@@ -203,5 +255,51 @@ if PAYMENT_GATEWAY['SANDBOX_MODE']:
     PAYMENT_GATEWAY.update({
         'SIMULATE_DELAYS': os.getenv('PAYMENT_SIMULATE_DELAYS', '1') == '1',
         'FORCE_SUCCESS': os.getenv('PAYMENT_FORCE_SUCCESS', '0') == '1',  # For testing
+        # Deterministic sandbox outcomes/ids for reproducible runs (empty = random)
+        'SANDBOX_SEED': os.getenv('PAYMENT_SANDBOX_SEED') or None,
         'LOG_ALL_REQUESTS': os.getenv('PAYMENT_LOG_REQUESTS', '1') == '1',
     })
+
+# Background payment processing: worker threads per web process (0 = process inline)
+# and an optional URL that receives a signed event when a payment settles
+PAYMENT_WORKERS = int(os.getenv('PAYMENT_WORKERS', '8'))
+PAYMENT_NOTIFY_URL = os.getenv('PAYMENT_NOTIFY_URL', '')
+
+# PayPal webhooks are queued and applied in batches; drain on a background thread
+# of the web process unless a `process_paypal_webhooks --loop` worker is deployed
+PAYPAL_WEBHOOK_DRAIN_IN_PROCESS = os.getenv('PAYPAL_WEBHOOK_DRAIN_IN_PROCESS', '1') == '1'
+PAYPAL_WEBHOOK_BATCH_SIZE = int(os.getenv('PAYPAL_WEBHOOK_BATCH_SIZE', '200'))
+PAYPAL_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('PAYPAL_WEBHOOK_MAX_ATTEMPTS', '5'))
+# Applied/ignored/failed events are kept this long (redelivery dedupe, debugging), then
+# deleted by `manage.py purge_paypal_webhooks`
+PAYPAL_WEBHOOK_RETENTION_DAYS = int(os.getenv('PAYPAL_WEBHOOK_RETENTION_DAYS', '30'))
+
+# Payment status polling cache (seconds while open / once settled); writers invalidate on change
+PAYMENT_STATUS_CACHE_ALIAS = os.getenv('PAYMENT_STATUS_CACHE_ALIAS', 'default')
+PAYMENT_STATUS_CACHE_TIMEOUT = int(os.getenv('PAYMENT_STATUS_CACHE_TIMEOUT', '2'))
+PAYMENT_STATUS_FINAL_CACHE_TIMEOUT = int(os.getenv('PAYMENT_STATUS_FINAL_CACHE_TIMEOUT', '30'))
+
+# Rows per INSERT statement for bulk activity ingestion
+ACTIVITY_BULK_BATCH_SIZE = int(os.getenv('ACTIVITY_BULK_BATCH_SIZE', '500'))
+
+# Write-behind activity tracking: events are buffered in memory (bounded) and flushed by a
+# background thread on size or time; overflow, failed flushes and shutdown spill to the spool
+ACTIVITY_WRITE_BEHIND = os.getenv('ACTIVITY_WRITE_BEHIND', '1') == '1'
+ACTIVITY_BUFFER_MAX_EVENTS = int(os.getenv('ACTIVITY_BUFFER_MAX_EVENTS', '10000'))
+ACTIVITY_BUFFER_FLUSH_SIZE = int(os.getenv('ACTIVITY_BUFFER_FLUSH_SIZE', '500'))
+ACTIVITY_BUFFER_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_BUFFER_FLUSH_INTERVAL', '1.0'))
+# Buffer snapshot written to the spool dir this often; a killed worker loses at most this window
+ACTIVITY_BUFFER_CHECKPOINT_INTERVAL = float(os.getenv('ACTIVITY_BUFFER_CHECKPOINT_INTERVAL', '5'))
+# Identical (customer, book, action) events within this many seconds share one row (0 = off)
+ACTIVITY_COALESCE_WINDOW = float(os.getenv('ACTIVITY_COALESCE_WINDOW', '10'))
+
+# rollup_activity keeps its high-water mark below a missing ActivityID (an insert not yet
+# committed) for this many seconds before treating it as a rolled-back id
+ACTIVITY_ROLLUP_GAP_GRACE = int(os.getenv('ACTIVITY_ROLLUP_GAP_GRACE', '300'))
+
+# Raw useractivity rows older than this are moved to ACTIVITY_ARCHIVE_DIR by archive_activity
+# (daily rollups maintained by rollup_activity keep their counts)
+ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', '180'))
+ACTIVITY_ARCHIVE_DIR = os.getenv('ACTIVITY_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'activity_archive'))
+ACTIVITY_SPOOL_DIR = os.getenv('ACTIVITY_SPOOL_DIR', str(BASE_DIR / 'var' / 'activity_spool'))
+ACTIVITY_SPOOL_MAX_BYTES = int(os.getenv('ACTIVITY_SPOOL_MAX_BYTES', str(256 * 1024 * 1024)))
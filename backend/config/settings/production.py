@@ -74,12 +74,14 @@ CACHES = {
     }
 }
 
-# PayPal Configuration
+# PayPal Configuration: the base keys (credentials, timeouts, pool size; BASE_URL
+# derived from MODE unless PAYPAL_BASE_URL is set). PAYPAL_MODE wins over the
+# older PAYPAL_SANDBOX flag still set on existing deployments.
 PAYPAL_SETTINGS = {
-    'CLIENT_ID': os.getenv('PAYPAL_CLIENT_ID'),
-    'CLIENT_SECRET': os.getenv('PAYPAL_CLIENT_SECRET'),
-    'BASE_URL': os.getenv('PAYPAL_BASE_URL', 'https://api-m.sandbox.paypal.com'),
-    'SANDBOX': os.getenv('PAYPAL_SANDBOX', 'True').lower() == 'true',
+    **PAYPAL_SETTINGS,
+    'MODE': os.getenv('PAYPAL_MODE') or (
+        'sandbox' if os.getenv('PAYPAL_SANDBOX', 'True').lower() == 'true' else 'live'
+    ),
 }
 
 # Logging configuration